@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 
 import argparse
+import sys
 from miniJavaParser import MiniJavaParser
 from miniJavaSymbolTable import GlobalSymbolTable
 from miniJavaTypeChecker import TypeChecker
+from miniJavaIRGen import IRGen, object_size
+from miniJavaASTDump import DUMPERS
+from miniJavaSummary import build_project
 import miniJavaAST as ast
 
 if __name__ == "__main__":
@@ -15,13 +19,30 @@ if __name__ == "__main__":
     # Of course, this is entirely optional and not necessary, as long as
     # the compiler functions correctly.
     argparser = argparse.ArgumentParser(description='Take in the miniJava source code and compile it')
-    argparser.add_argument('FILE', help="Input file")
+    argparser.add_argument('FILE', nargs='+', help="Input file (several with --summary-dir)")
     argparser.add_argument('-a', '--print-ast', action='store_true', help="Print AST Nodes")
+    argparser.add_argument('--ast-format', choices=sorted(DUMPERS), default='text', help="Format used by --print-ast")
+    argparser.add_argument('--ast-output', metavar='FILE', help="Write the AST printed by --print-ast to FILE instead of stdout")
     argparser.add_argument('-p', '--parse-only', action='store_true', help="Stop after scanning and parsing the input")
     argparser.add_argument('-t', '--typecheck-only', action='store_true', help="Stop after typechecking")
     argparser.add_argument('-v', '--verbose', action='store_true', help="Provides additional output")
+    argparser.add_argument('-j', '--jobs', type=int, default=1, help="Typecheck classes using this many processes")
+    argparser.add_argument('--summary-dir', metavar='DIR', help="Typecheck the input files as one project, keeping interface summaries in DIR and only rechecking what changed")
     args = argparser.parse_args()
 
+    # Multi-file project mode: each file is checked against the interface
+    # summaries of the other files, and skipped if nothing it relies on
+    # has changed since the last build
+    if args.summary_dir is not None:
+        checked = build_project(args.FILE, args.summary_dir, args.verbose)
+        if args.verbose:
+            print("* Typechecked %d of %d file(s)" % (len(checked), len(args.FILE)))
+        quit()
+
+    if len(args.FILE) != 1:
+        argparser.error("multiple input files require --summary-dir")
+    args.FILE = args.FILE[0]
+
     # Prints additional output if the flag is set
     if args.verbose:
         print("* Reading file " + args.FILE + "...")
@@ -37,11 +58,16 @@ if __name__ == "__main__":
     parser = MiniJavaParser()
     root = parser.parse(data)
 
-    # Use the default visitor (from W5) to go through the AST and print them
-    # if the user provdes '--print-ast' flag
+    # Dump the AST if the user provides '--print-ast' flag. The dumpers
+    # write through a single buffered stream rather than a print per node.
     if args.print_ast:
-        visitor = ast.NodeVisitor()
-        visitor.visit(root)
+        if args.ast_output is not None:
+            out = open(args.ast_output, 'wb')
+        else:
+            out = sys.stdout.buffer
+        DUMPERS[args.ast_format](out).dump(root)
+        if args.ast_output is not None:
+            out.close()
 
     # If user asks to quit after parsing, do so.
     if args.parse_only:
@@ -50,5 +76,21 @@ if __name__ == "__main__":
     if args.verbose:
         print("* Typechecking...")
 
-    typechecker = TypeChecker()
-    typechecker.typecheck(root)
+    typechecker = TypeChecker(jobs=args.jobs)
+    global_st = typechecker.typecheck(root)
+
+    if args.typecheck_only:
+        quit()
+
+    # Layout of the objects of every class, as the IR accesses them
+    if args.verbose:
+        for class_st in global_st.classes.values():
+            print("* %s: %d words, %d vtable slots" % (class_st.class_name, object_size(class_st),
+                                                        len(class_st.vtable)))
+            for i, (class_name, name, type) in enumerate(class_st.field_layout):
+                print("*   +%d %s.%s: %s" % (i + 1, class_name, name, type.name))
+        print("* Generating IR...")
+
+    ir_generator = IRGen(global_st)
+    ir_generator.generate(root)
+    ir_generator.print_ir()
@@ -24,6 +24,11 @@ class Node(object):
     # Set of attributes for a given node
     attr_names = ()
 
+    # Line of the type written in a declaration (DeclStmt, Formal and the
+    # return type of MethodDecl). Type nodes are shared by every use of the
+    # type (see get_type), so they carry no line of their own.
+    type_coord = None
+
 class NodeVisitor(object):
     """
     A base NodeVisitor class for visiting MiniJava nodes.
@@ -122,7 +127,7 @@ class ClassDecl(Node):
 
 class Constant(Node):
     def __init__(self, type, value, coord=None):
-        self.type = Type(type)
+        self.type = get_type(type)
         self.value = value
         self.coord = coord
 
@@ -152,6 +157,7 @@ class DeclStmt(Node):
 class Extend(Node):
     def __init__(self, name, coord=None):
         self.name = name
+        self.coord = coord
 
     def children(self):
         nodelist = []
@@ -173,11 +179,12 @@ class Formal(Node):
 
     attr_names = ('name', )
 
-def IfStmt(Node):
+class IfStmt(Node):
     def __init__(self, cond, true_body, false_body, coord=None):
         self.cond = cond
         self.true_body = true_body
         self.false_body = false_body
+        self.coord = coord
 
     def children(self):
         nodelist = []
@@ -214,6 +221,23 @@ class MethodDecl(Node):
 
     attr_names = ('name', )
 
+class MethodCall(Node):
+    def __init__(self, obj, name, args, coord=None):
+        self.obj = obj
+        self.name = name
+        self.args = args
+        self.coord = coord
+
+    def children(self):
+        nodelist = []
+        if self.obj is not None:
+            nodelist.append(('obj', self.obj))
+        for i, arg in enumerate(self.args or []):
+            nodelist.append(('args[%d]' % i, arg))
+        return tuple(nodelist)
+
+    attr_names = ('name', )
+
 class ObjInstance(Node):
     def __init__(self, obj, coord=None):
         self.obj = obj
@@ -287,8 +311,30 @@ class Type(Node):
         nodelist = []
         return tuple(nodelist)
 
+    def __reduce__(self):
+        # Copies and unpickled types must resolve back to the canonical
+        # object, otherwise identity comparison breaks
+        return (get_type, (self.name, ))
+
     attr_names = ('name', )
 
+# Registry of canonical Type nodes, keyed by the name of the type
+_type_registry = dict()
+
+def get_type(name):
+    """
+    Return the canonical Type node for the type named 'name', creating it
+    on first use. There is exactly one Type object per type name (class
+    types included), so two types are equal if and only if they are the
+    same object.
+    Canonical types have no coord, the line a type is written on is kept in
+    'type_coord' of the declaration using it.
+    """
+    t = _type_registry.get(name)
+    if t is None:
+        t = _type_registry[name] = Type(name)
+    return t
+
 class UnaryOp(Node):
     def __init__(self, op, expr, coord=None):
         self.op = op
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+
+import abc
+import inspect
+import json
+import struct
+import miniJavaAST as ast
+
+class ASTDumper(abc.ABC):
+    """
+    Base class for the AST dump writers.
+
+    Every dumper streams into a single binary file object 'out' (such as
+    sys.stdout.buffer or a file opened with 'wb'). Output is accumulated in
+    a local buffer which is handed to 'out' in large chunks, rather than
+    issuing a write (or a print) per node.
+
+    Subclasses implement dump, which writes out a whole tree.
+    """
+
+    # Number of buffered bytes after which the buffer is written out
+    chunk_size = 1 << 16
+
+    def __init__(self, out):
+        self.out = out
+        self.buf = bytearray()
+
+    def emit(self, data):
+        self.buf += data
+        if len(self.buf) >= self.chunk_size:
+            self.out.write(self.buf)
+            self.buf = bytearray()
+
+    def flush(self):
+        if self.buf:
+            self.out.write(self.buf)
+            self.buf = bytearray()
+        self.out.flush()
+
+    @abc.abstractmethod
+    def dump(self, root):
+        """
+        Write out the whole tree rooted at 'root'
+        """
+
+class PreorderDumper(ASTDumper):
+    """
+    Base class for the dump writers which write one record per node.
+    Subclasses implement dump_node, and may implement begin and end to
+    write something before and after the nodes.
+    """
+
+    def dump(self, root):
+        self.begin(root)
+        self.count = 0
+        self.walk(root, None, None, 0)
+        self.end(root)
+        self.flush()
+
+    def walk(self, node, parent_id, field, depth):
+        node_id = self.count
+        self.count += 1
+        self.dump_node(node, parent_id, field, depth)
+        for (child_name, child) in node.children():
+            if child is not None:
+                self.walk(child, node_id, child_name, depth + 1)
+
+    def begin(self, root):
+        pass
+
+    def end(self, root):
+        pass
+
+    @abc.abstractmethod
+    def dump_node(self, node, parent_id, field, depth):
+        """
+        Write out 'node', called once per node in pre-order with the id of
+        its parent, the name it has within its parent and its depth
+        """
+
+def attr_value(value):
+    """
+    Attributes referring to a Type node are written out by type name
+    """
+    if isinstance(value, ast.Type):
+        return value.name
+    return value
+
+class TextDumper(PreorderDumper):
+    """
+    Indented text format, the same as the output of ast.NodeVisitor except
+    for attributes referring to a Type node, which are written by type name
+    where NodeVisitor prints the repr of the object
+    """
+
+    def begin(self, root):
+        if isinstance(root, ast.Program):
+            self.emit(b"====== PROGRAM START ======\n")
+
+    def end(self, root):
+        if isinstance(root, ast.Program):
+            self.emit(b"====== PROGRAM END ======\n")
+
+    def walk(self, node, parent_id, field, depth):
+        # NodeVisitor.visit_Program does not print the Program node itself,
+        # and prints the classes with the same offset as its children would
+        if isinstance(node, ast.Program):
+            for (child_name, child) in node.children():
+                super().walk(child, None, child_name, depth + 1)
+        else:
+            super().walk(node, parent_id, field, depth)
+
+    def dump_node(self, node, parent_id, field, depth):
+        output = ' ' * (depth * 2) + node.__class__.__name__ + ': '
+        if node.attr_names:
+            vlist = [attr_value(getattr(node, n)) for n in node.attr_names]
+            output += ', '.join('%s' % v for v in vlist)
+        self.emit((output + '\n').encode())
+
+class JSONLinesDumper(PreorderDumper):
+    """
+    JSON Lines format with one object per node, in pre-order:
+        {"id": 3, "parent": 2, "field": "expr", "kind": "BinOp",
+         "coord": 12, "attrs": {"op": "+"}}
+    """
+
+    def dump_node(self, node, parent_id, field, depth):
+        record = {
+            'id': self.count - 1,
+            'parent': parent_id,
+            'field': field,
+            'kind': node.__class__.__name__,
+            'coord': getattr(node, 'coord', None),
+            'attrs': dict((n, attr_value(getattr(node, n))) for n in node.attr_names),
+        }
+        self.emit((json.dumps(record, separators=(',', ':')) + '\n').encode())
+
+################################
+## Binary format
+################################
+
+# The binary format starts with MAGIC, followed by a single encoded value
+# for the root node. Each value is one tag byte followed by its payload:
+#
+#   TAG_NONE, TAG_TRUE, TAG_FALSE   no payload
+#   TAG_INT                         zigzag encoded varint
+#   TAG_STR                         varint length + utf-8 bytes; the string
+#                                   is appended to the string table
+#   TAG_STR_REF                     varint index into the string table
+#   TAG_LIST                        varint length + that many values
+#   TAG_TYPE                        string value holding the type name
+#   TAG_NODE                        string value holding the class name,
+#                                   the coord value, then one value per
+#                                   constructor field (see node_fields)
+MAGIC = b'MJAST\x01'
+
+TAG_NONE = 0
+TAG_TRUE = 1
+TAG_FALSE = 2
+TAG_INT = 3
+TAG_STR = 4
+TAG_STR_REF = 5
+TAG_LIST = 6
+TAG_TYPE = 7
+TAG_NODE = 8
+
+_fields_cache = dict()
+
+def node_fields(cls):
+    """
+    Return the names of the fields that make up a node of class 'cls'.
+    These are the parameters of its constructor, other than coord.
+    """
+    fields = _fields_cache.get(cls)
+    if fields is None:
+        params = inspect.signature(cls.__init__).parameters
+        fields = tuple(p for p in params if p not in ('self', 'coord'))
+        _fields_cache[cls] = fields
+    return fields
+
+class BinaryDumper(ASTDumper):
+    """
+    Compact binary format, which can be read back with load_binary
+    """
+
+    def dump(self, root):
+        self.strings = dict()
+        self.emit(MAGIC)
+        self.write_value(root)
+        self.flush()
+
+    def write_varint(self, n):
+        out = bytearray()
+        while n >= 0x80:
+            out.append((n & 0x7f) | 0x80)
+            n >>= 7
+        out.append(n)
+        self.emit(out)
+
+    def write_str(self, s):
+        index = self.strings.get(s)
+        if index is not None:
+            self.emit(bytes((TAG_STR_REF, )))
+            self.write_varint(index)
+            return
+        self.strings[s] = len(self.strings)
+        data = s.encode()
+        self.emit(bytes((TAG_STR, )))
+        self.write_varint(len(data))
+        self.emit(data)
+
+    def write_value(self, value):
+        if value is None:
+            self.emit(bytes((TAG_NONE, )))
+        elif value is True:
+            self.emit(bytes((TAG_TRUE, )))
+        elif value is False:
+            self.emit(bytes((TAG_FALSE, )))
+        elif isinstance(value, int):
+            self.emit(bytes((TAG_INT, )))
+            self.write_varint(value << 1 if value >= 0 else ((-value) << 1) - 1)
+        elif isinstance(value, str):
+            self.write_str(value)
+        elif isinstance(value, (list, tuple)):
+            self.emit(bytes((TAG_LIST, )))
+            self.write_varint(len(value))
+            for v in value:
+                self.write_value(v)
+        elif isinstance(value, ast.Type):
+            self.emit(bytes((TAG_TYPE, )))
+            self.write_str(value.name)
+        elif isinstance(value, ast.Node):
+            self.emit(bytes((TAG_NODE, )))
+            self.write_str(value.__class__.__name__)
+            self.write_value(getattr(value, 'coord', None))
+            for field in node_fields(value.__class__):
+                self.write_value(getattr(value, field))
+        else:
+            raise ValueError("Cannot encode value of type " + type(value).__name__)
+
+class BinaryLoader(object):
+    """
+    Reads back an AST written by BinaryDumper
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.strings = []
+
+    def load(self):
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a binary miniJava AST dump")
+        self.pos = len(MAGIC)
+        return self.read_value()
+
+    def read_varint(self):
+        data = self.data
+        n = 0
+        shift = 0
+        while True:
+            b = data[self.pos]
+            self.pos += 1
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def read_str(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        return self.read_payload(tag)
+
+    def read_value(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        return self.read_payload(tag)
+
+    def read_payload(self, tag):
+        if tag == TAG_NONE:
+            return None
+        if tag == TAG_TRUE:
+            return True
+        if tag == TAG_FALSE:
+            return False
+        if tag == TAG_INT:
+            n = self.read_varint()
+            return -((n + 1) >> 1) if n & 1 else n >> 1
+        if tag == TAG_STR:
+            length = self.read_varint()
+            s = bytes(self.data[self.pos:self.pos + length]).decode()
+            self.pos += length
+            self.strings.append(s)
+            return s
+        if tag == TAG_STR_REF:
+            return self.strings[self.read_varint()]
+        if tag == TAG_LIST:
+            return [self.read_value() for i in range(self.read_varint())]
+        if tag == TAG_TYPE:
+            return ast.get_type(self.read_str())
+        if tag == TAG_NODE:
+            cls = getattr(ast, self.read_str())
+            # Bypass the constructors, since the fields are already in
+            # their final form (e.g. Constant.type is a Type node)
+            node = cls.__new__(cls)
+            node.coord = self.read_value()
+            for field in node_fields(cls):
+                setattr(node, field, self.read_value())
+            return node
+        raise ValueError("Unknown tag %d at offset %d" % (tag, self.pos - 1))
+
+def load_binary(stream):
+    """
+    Return the root node of the AST stored in binary file object 'stream'
+    """
+    return BinaryLoader(stream.read()).load()
+
+# Dump format names, as accepted by miniJava.py --ast-format
+DUMPERS = {
+    'text': TextDumper,
+    'jsonl': JSONLinesDumper,
+    'binary': BinaryDumper,
+}
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+import sys
+from enum import IntEnum
+
+class Op(IntEnum):
+    """
+    Opcodes of the IR instructions, with the fields each one uses and the
+    3AC text it is printed as:
+
+        COPY        dst := a
+        BINOP       dst := a opr b
+        UNOP        dst := opr a
+        LABEL       target:
+        GOTO        goto target
+        IF          if (a) goto target
+        IFNOT       if !(a) goto target
+        IFEQ        ifEQ a b goto target
+        IFNE        ifNE a b goto target
+        BEGINFUNC   BeginFunc           (target: method label,
+                                         a: tuple of the parameter operands,
+                                         'this' first)
+        ENDFUNC     EndFunc
+        PUSHPARAM   PushParam a
+        ICALL       FuncCall *a         (a: holds the address of the method)
+        POPPARAMS   PopParams a
+        RETURN      ret := a
+        GETRET      dst := ret
+        ALLOC       dst := Alloc a      (a: size of the object, in words)
+        LOAD        dst := *(a + b)     (b: offset, in words)
+        STORE       *(dst + b) := a     (dst: object written into, which
+                                         is read rather than assigned)
+        VTABLE      VTable target: a... (a: tuple of the method labels,
+                                         by vtable slot)
+    """
+    COPY = 0
+    BINOP = 1
+    UNOP = 2
+    LABEL = 3
+    GOTO = 4
+    IF = 5
+    IFNOT = 6
+    IFEQ = 7
+    IFNE = 8
+    BEGINFUNC = 9
+    ENDFUNC = 10
+    PUSHPARAM = 11
+    ICALL = 12
+    POPPARAMS = 13
+    RETURN = 14
+    GETRET = 15
+    ALLOC = 16
+    LOAD = 17
+    STORE = 18
+    VTABLE = 19
+
+# Conditional jumps, and all the jumps
+BRANCH_OPS = (Op.IF, Op.IFNOT, Op.IFEQ, Op.IFNE)
+JUMP_OPS = (Op.GOTO, Op.IF, Op.IFNOT, Op.IFEQ, Op.IFNE)
+
+class Kind(IntEnum):
+    """
+    Kinds of operands:
+
+        TEMP: compiler temporary, value is its number
+        VAR: parameter or local variable of a method, value is its name
+        CONST: literal, value is an int, 'true', 'false' or 'null'
+        LABEL: jump target, method or vtable, value is a label number or
+               a name
+    """
+    TEMP = 0
+    VAR = 1
+    CONST = 2
+    LABEL = 3
+
+class Operand(object):
+    """
+    Operand of an instruction
+    """
+
+    __slots__ = ('kind', 'value')
+
+    def __init__(self, kind, value):
+        self.kind = kind
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Operand) and self.kind == other.kind and self.value == other.value
+
+    def __hash__(self):
+        return hash((int(self.kind), self.value))
+
+    def __str__(self):
+        if self.kind == Kind.TEMP:
+            return '_t%d' % self.value
+        if self.kind == Kind.LABEL:
+            return '_L%s' % self.value
+        return str(self.value)
+
+    def __repr__(self):
+        return 'Operand(%s, %r)' % (self.kind.name, self.value)
+
+def temp(number):
+    return Operand(Kind.TEMP, number)
+
+def var(name):
+    return Operand(Kind.VAR, name)
+
+def const(value):
+    return Operand(Kind.CONST, value)
+
+def label(name):
+    return Operand(Kind.LABEL, name)
+
+class Instr(object):
+    """
+    A single IR instruction. Which of the fields are used depends on the
+    opcode (see Op), the others are None.
+    """
+
+    __slots__ = ('op', 'dst', 'a', 'b', 'opr', 'target')
+
+    def __init__(self, op, dst=None, a=None, b=None, opr=None, target=None):
+        self.op = op
+        self.dst = dst
+        self.a = a
+        self.b = b
+        self.opr = opr
+        self.target = target
+
+    def __str__(self):
+        return format_instr(self)
+
+    def __repr__(self):
+        return 'Instr(%s)' % format_instr(self).strip()
+
+################################
+## Printing
+################################
+
+def format_instr(instr):
+    """
+    Return the 3AC text of 'instr', indented the way IRGen prints it
+    """
+    op = instr.op
+    if op == Op.LABEL:
+        return '%s:' % instr.target
+    if op == Op.VTABLE:
+        return 'VTable %s: %s' % (instr.target, ', '.join(str(m) for m in instr.a))
+    if op == Op.COPY:
+        code = '%s := %s' % (instr.dst, instr.a)
+    elif op == Op.BINOP:
+        code = '%s := %s %s %s' % (instr.dst, instr.a, instr.opr, instr.b)
+    elif op == Op.UNOP:
+        code = '%s := %s%s' % (instr.dst, instr.opr, instr.a)
+    elif op == Op.GOTO:
+        code = 'goto %s' % instr.target
+    elif op == Op.IF:
+        code = 'if (%s) goto %s' % (instr.a, instr.target)
+    elif op == Op.IFNOT:
+        code = 'if !(%s) goto %s' % (instr.a, instr.target)
+    elif op == Op.IFEQ:
+        code = 'ifEQ %s %s goto %s' % (instr.a, instr.b, instr.target)
+    elif op == Op.IFNE:
+        code = 'ifNE %s %s goto %s' % (instr.a, instr.b, instr.target)
+    elif op == Op.BEGINFUNC:
+        code = 'BeginFunc'
+    elif op == Op.ENDFUNC:
+        code = 'EndFunc'
+    elif op == Op.PUSHPARAM:
+        code = 'PushParam %s' % instr.a
+    elif op == Op.ICALL:
+        code = 'FuncCall *%s' % instr.a
+    elif op == Op.POPPARAMS:
+        code = 'PopParams %s' % instr.a
+    elif op == Op.RETURN:
+        code = 'ret := %s' % instr.a
+    elif op == Op.GETRET:
+        code = '%s := ret' % instr.dst
+    elif op == Op.ALLOC:
+        code = '%s := Alloc %s' % (instr.dst, instr.a)
+    elif op == Op.LOAD:
+        code = '%s := *(%s + %s)' % (instr.dst, instr.a, instr.b)
+    elif op == Op.STORE:
+        code = '*(%s + %s) := %s' % (instr.dst, instr.b, instr.a)
+    else:
+        raise ValueError("Unknown opcode %r" % op)
+    return '    ' + code
+
+def print_ir(instrs, out=None):
+    """
+    Write the 3AC text of the list of instructions 'instrs' to 'out'
+    (stdout by default)
+    """
+    if out is None:
+        out = sys.stdout
+    out.write(''.join(format_instr(instr) + '\n' for instr in instrs))
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+from miniJavaIR import Op, Instr, temp, var, const, label
+import miniJavaIR as ir
+import miniJavaAST as ast
+
+# Offset of the vtable pointer in every object, in words. The fields come
+# right after it.
+VTABLE_OFFSET = 0
+
+def method_label(class_name, method_name):
+    return label('%s.%s' % (class_name, method_name))
+
+def vtable_label(class_name):
+    return label('%s.vtable' % class_name)
+
+def field_offset(class_st, name):
+    """
+    Offset of the field 'name' visible in class 'class_st' within its
+    objects, in words
+    """
+    return class_st.field_index[name] + 1
+
+def object_size(class_st):
+    """
+    Size of an object of class 'class_st', in words: its vtable pointer
+    followed by every field in the order of field_layout
+    """
+    return len(class_st.field_layout) + 1
+
+class IRGen(object):
+    """
+    Uses the same visitor pattern as TypeChecker. It is modified to
+    generate 3AC (Three Address Code) as a list of miniJavaIR.Instr
+    objects, from a tree which was typechecked successfully, using the
+    GlobalSymbolTable the TypeChecker returned for it.
+
+    Objects are laid out from the flattened tables of their class (see
+    ClassSymbolTable): a pointer to the vtable of the class, then one
+    word per field of field_layout, the inherited fields first, so that
+    a field is at the same offset in the objects of every subclass.
+    Every class gets a VTable holding the label of the method
+    implementing each of its vtable slots, and every method gets the
+    object it is called on as its first parameter, 'this'.
+
+    Field accesses become loads and stores at a constant offset from
+    'this', and method calls load the method from its slot in the vtable
+    of the object, then call it indirectly, so no name is looked up at
+    run time. Conditions of if and while statements are compiled into
+    jumps: && only evaluates its right operand if its left one holds,
+    ! swaps the jumps rather than negating a value, and == and != compare
+    their operands in the jump itself (ifEQ/ifNE).
+
+    Execution starts at the main method of the main class, whose 'this'
+    is null.
+    """
+
+    def __init__(self, global_st):
+        """
+        IR_lst: list of IR instructions (miniJavaIR.Instr)
+        register_count: integer to keep track of which register to use
+        label_count: similar to register_count, but with labels
+        class_st: ClassSymbolTable of the class being generated
+        scopes: stack of the parameters and local variables in scope, by
+                name, the innermost scope last
+        """
+        self.IR_lst = []
+        self.register_count = 0
+        self.label_count = 0
+        self.global_st = global_st
+        self.class_st = None
+        self.scopes = []
+
+    def generate(self, node):
+        """
+        Similar to 'typecheck' method from TypeChecker object
+        """
+        method = 'gen_' + node.__class__.__name__
+        return getattr(self, method)(node)
+
+    ################################
+    ## Helper functions
+    ################################
+
+    def add_code(self, op, dst=None, a=None, b=None, opr=None, target=None):
+        """
+        Add an instruction to the IR_lst
+        """
+        self.IR_lst.append(Instr(op, dst, a, b, opr, target))
+
+    def inc_register(self):
+        """
+        Increase the register count and return a temporary for use
+        """
+        self.register_count += 1
+        return temp(self.register_count)
+
+    def reset_register(self):
+        """
+        Can reset the register_count to reuse them
+        """
+        self.register_count = 0
+
+    def inc_label(self):
+        """
+        Increase the label count and return a label for use
+        """
+        self.label_count += 1
+        return label(self.label_count)
+
+    def mark_label(self, target):
+        """
+        Add label mark to IR_lst
+        """
+        self.add_code(Op.LABEL, target=target)
+
+    def local_type(self, name):
+        """
+        Return the type of the parameter or local variable 'name', or None
+        if 'name' is not one and so refers to a field of 'this'
+        """
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def static_class(self, node):
+        """
+        Return the ClassSymbolTable of the class of the object the
+        expression 'node' evaluates to, as the TypeChecker found it
+        """
+        if isinstance(node, ast.ObjInstance):
+            name = node.obj
+        elif isinstance(node, ast.MethodCall):
+            name = self.static_class(node.obj).lookup_method(node.name, node.coord).ret_type.name
+        elif node.type.name == 'this':
+            return self.class_st
+        else:
+            type = self.local_type(node.value)
+            if type is None:
+                type = self.class_st.lookup_field(node.value, node.coord)
+            name = type.name
+        return self.global_st.lookup_class(name, node.coord)
+
+    def branch(self, node, target, when):
+        """
+        Jump to 'target' if the boolean expression 'node' evaluates to
+        'when', and fall through otherwise
+        """
+        if isinstance(node, ast.BinOp) and node.op == '&&':
+            if when:
+                skip = self.inc_label()
+                self.branch(node.left, skip, False)
+                self.branch(node.right, target, True)
+                self.mark_label(skip)
+            else:
+                self.branch(node.left, target, False)
+                self.branch(node.right, target, False)
+        elif isinstance(node, ast.UnaryOp) and node.op == '!':
+            self.branch(node.expr, target, not when)
+        elif isinstance(node, ast.BinOp) and node.op in ('==', '!='):
+            left = self.generate(node.left)
+            right = self.generate(node.right)
+            op = Op.IFEQ if (node.op == '==') == when else Op.IFNE
+            self.add_code(op, a=left, b=right, target=target)
+        elif isinstance(node, ast.Constant) and node.type.name == 'boolean':
+            if (node.value == 'true') == when:
+                self.add_code(Op.GOTO, target=target)
+        else:
+            cond = self.generate(node)
+            self.add_code(Op.IF if when else Op.IFNOT, a=cond, target=target)
+
+    def print_ir(self, out=None):
+        """
+        Print the generated IR code out as text, to stdout by default
+        """
+        ir.print_ir(self.IR_lst, out)
+
+    ################################
+    ## Expressions
+    ################################
+
+    def gen_BinOp(self, node):
+        if node.op == '&&':
+            # Only evaluated for its value here, otherwise see branch
+            reg = self.inc_register()
+            end_label = self.inc_label()
+            self.add_code(Op.COPY, reg, const('false'))
+            self.branch(node, end_label, False)
+            self.add_code(Op.COPY, reg, const('true'))
+            self.mark_label(end_label)
+            return reg
+
+        # Left operand
+        left = self.generate(node.left)
+        # Right operand
+        right = self.generate(node.right)
+
+        reg = self.inc_register()
+        self.add_code(Op.BINOP, reg, left, right, node.op)
+        return reg
+
+    def gen_Constant(self, node):
+        name = node.type.name
+        if name == 'this':
+            return var('this')
+        if name != 'id':
+            return const(node.value)
+        if self.local_type(node.value) is not None:
+            return var(node.value)
+
+        # Field of 'this'
+        reg = self.inc_register()
+        self.add_code(Op.LOAD, reg, var('this'), const(field_offset(self.class_st, node.value)))
+        return reg
+
+    def gen_MethodCall(self, node):
+        slot = self.static_class(node.obj).method_index[node.name]
+
+        obj = self.generate(node.obj)
+        args = [self.generate(arg) for arg in node.args]
+
+        # Find the method in the vtable of the object
+        vtable = self.inc_register()
+        self.add_code(Op.LOAD, vtable, obj, const(VTABLE_OFFSET))
+        func = self.inc_register()
+        self.add_code(Op.LOAD, func, vtable, const(slot))
+
+        # The object is passed as 'this', before the arguments
+        self.add_code(Op.PUSHPARAM, a=obj)
+        for arg in args:
+            self.add_code(Op.PUSHPARAM, a=arg)
+        self.add_code(Op.ICALL, a=func)
+        self.add_code(Op.POPPARAMS, a=const(len(args) + 1))
+
+        reg = self.inc_register()
+        self.add_code(Op.GETRET, reg)
+        return reg
+
+    def gen_ObjInstance(self, node):
+        class_st = self.global_st.lookup_class(node.obj, node.coord)
+        reg = self.inc_register()
+        self.add_code(Op.ALLOC, reg, const(object_size(class_st)))
+        self.add_code(Op.STORE, reg, vtable_label(class_st.class_name), const(VTABLE_OFFSET))
+        return reg
+
+    def gen_UnaryOp(self, node):
+        expr = self.generate(node.expr)
+        reg = self.inc_register()
+        self.add_code(Op.UNOP, reg, expr, opr=node.op)
+        return reg
+
+    ################################
+    ## Statements
+    ################################
+
+    def gen_AssignStmt(self, node):
+        expr = self.generate(node.expr)
+        if self.local_type(node.name) is not None:
+            self.add_code(Op.COPY, var(node.name), expr)
+        else:
+            self.add_code(Op.STORE, var('this'), expr, const(field_offset(self.class_st, node.name)))
+        self.reset_register()
+
+    def gen_DeclStmt(self, node):
+        expr = self.generate(node.expr)
+        self.scopes[-1][node.name] = node.type
+        self.add_code(Op.COPY, var(node.name), expr)
+        self.reset_register()
+
+    def gen_IfStmt(self, node):
+        fbranch_label = self.inc_label()
+        tbranch_label = self.inc_label()
+
+        # Skip to the false_body if the condition is not met
+        self.branch(node.cond, fbranch_label, False)
+        self.generate(node.true_body)
+        # Make sure the statements from false_body is skipped
+        self.add_code(Op.GOTO, target=tbranch_label)
+
+        self.mark_label(fbranch_label)
+        if node.false_body is not None:
+            self.generate(node.false_body)
+        self.mark_label(tbranch_label)
+        self.reset_register()
+
+    def gen_RetStmt(self, node):
+        expr = self.generate(node.expr)
+        self.add_code(Op.RETURN, a=expr)
+        self.reset_register()
+
+    def gen_StmtList(self, node):
+        self.scopes.append(dict())
+        for stmt in node.stmt_lst or []:
+            self.generate(stmt)
+        self.scopes.pop()
+
+    def gen_WhileStmt(self, node):
+        body_label = self.inc_label()
+        test_label = self.inc_label()
+
+        # The condition is tested at the bottom of the loop, so that each
+        # iteration takes a single jump
+        self.add_code(Op.GOTO, target=test_label)
+        self.mark_label(body_label)
+        if node.body is not None:
+            self.generate(node.body)
+        self.mark_label(test_label)
+        self.branch(node.cond, body_label, True)
+        self.reset_register()
+
+    ################################
+    ## Declarations
+    ################################
+
+    def gen_ClassDecl(self, node):
+        self.class_st = self.global_st.lookup_class(node.name, node.coord)
+        if node.method_decl is not None:
+            self.generate(node.method_decl)
+        self.class_st = None
+
+    def gen_MethodDecl(self, node):
+
+        # Function label
+        func_label = method_label(self.class_st.class_name, node.name)
+        self.mark_label(func_label)
+
+        # Parameters are local to the method, the object it is called on
+        # being the first one
+        formals = node.params.params if node.params is not None else []
+        self.scopes.append(dict((p.name, p.type) for p in formals))
+        params = (var('this'), ) + tuple(var(p.name) for p in formals)
+        self.add_code(Op.BEGINFUNC, a=params, target=func_label)
+
+        # Actually generate the main body
+        if node.body is not None:
+            self.generate(node.body)
+        # The main method has no return statement
+        if isinstance(node.ret_stmt, ast.RetStmt):
+            self.generate(node.ret_stmt)
+
+        # Do any cleanup before jumping back
+        self.add_code(Op.ENDFUNC)
+        self.scopes.pop()
+        self.reset_register()
+
+    def gen_Program(self, node):
+        classes = [child for (child_name, child) in node.children()]
+
+        # The vtable of every class, by slot
+        for child in classes:
+            class_st = self.global_st.lookup_class(child.name, child.coord)
+            methods = tuple(method_label(class_name, method.name)
+                            for class_name, method in class_st.vtable)
+            self.add_code(Op.VTABLE, a=methods, target=vtable_label(class_st.class_name))
+
+        for child in classes:
+            self.generate(child)
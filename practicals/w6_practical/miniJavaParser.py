@@ -20,7 +20,8 @@ class MiniJavaParser:
         - Program can contain one or no additional class
         - There can only be one class variable
         - There can only be one method for class
-        - There is no current way to call a method
+        - Methods can only be called on an expression (obj.foo(...)),
+          not as a statement of their own
 
     As an exercise, you could try to extend this parser such that all of
     these issues are addressed.
@@ -32,7 +33,8 @@ class MiniJavaParser:
         ('left', 'LESS', 'LESSEQ', 'GREATER', 'GREATEREQ'),
         ('left', 'PLUS', 'MINUS'),
         ('left', 'TIMES', 'DIVIDE'),
-        ('right', 'UNARY')
+        ('right', 'UNARY'),
+        ('left', 'PERIOD')
     )
 
     # Let the parser know that symbol "program" is the starting point
@@ -49,9 +51,11 @@ class MiniJavaParser:
 
     def parse(self, data):
         """
-        Returns the root (Program) node of the AST, after parsing the file
+        Returns the root (Program) node of the AST, after parsing the file.
+        Line numbers start over for every file parsed.
         """
-        return self.parser.parse(data)
+        self.lexer.lexer.lineno = 1
+        return self.parser.parse(data, lexer=self.lexer.lexer)
 
     ################################
     ## Program (starting point)
@@ -77,7 +81,7 @@ class MiniJavaParser:
         '''
         main_method_decl : PUBLIC STATIC VOID MAIN main_method_param scope
         '''
-        void_type = ast.Type("void")
+        void_type = ast.get_type("void")
         p[0] = ast.MethodDecl("main", void_type, p[5], p[6], void_type, p.lineno(1))
 
     def p_main_method_param(self, p):
@@ -128,6 +132,7 @@ class MiniJavaParser:
         class_var_decl : type ID SEMICOL
         '''
         p[0] = ast.DeclStmt(p[2], p[1], coord=p.lineno(2))
+        p[0].type_coord = p.lineno(1)
 
     ################################
     ## Method Declarations
@@ -145,6 +150,7 @@ class MiniJavaParser:
         method_decl : PUBLIC type ID method_param LBRACE stmts_or_empty ret_stmt RBRACE
         '''
         p[0] = ast.MethodDecl(p[3], p[2], p[4], p[6], p[7], p.lineno(1))
+        p[0].type_coord = p.lineno(2)
 
     ################################
     ## Formals / Parameters
@@ -161,7 +167,8 @@ class MiniJavaParser:
         formals_or_empty : formal_lst
                          | empty
         '''
-        if len(p) == 1:
+        # 'empty' gives None, while methods always get a list of formals
+        if p[1] is None:
             p[0] = []
         else:
             p[0] = p[1]
@@ -181,6 +188,7 @@ class MiniJavaParser:
         formal : type ID
         '''
         p[0] = ast.Formal(p[2], p[1], p.lineno(2))
+        p[0].type_coord = p.lineno(1)
 
     ################################
     ## Statements
@@ -223,6 +231,7 @@ class MiniJavaParser:
         decl_stmt : type ID EQ expr SEMICOL
         '''
         p[0] = ast.DeclStmt(p[2], p[1], p[4], p.lineno(2))
+        p[0].type_coord = p.lineno(1)
 
     def p_assignment_statement(self, p):
         '''
@@ -259,6 +268,32 @@ class MiniJavaParser:
         '''
         p[0] = ast.ObjInstance(p[2], p.lineno(1))
 
+    def p_expr_method_call(self, p):
+        '''
+        expr : expr PERIOD ID LPAREN args_or_empty RPAREN
+        '''
+        p[0] = ast.MethodCall(p[1], p[3], p[5], p.lineno(2))
+
+    def p_args_or_empty(self, p):
+        '''
+        args_or_empty : arg_lst
+                      | empty
+        '''
+        if p[1] is None:
+            p[0] = []
+        else:
+            p[0] = p[1]
+
+    def p_arg_lst(self, p):
+        '''
+        arg_lst : arg_lst COMMA expr
+                | expr
+        '''
+        if len(p) == 2:
+            p[0] = [p[1]]
+        else:
+            p[0] = p[1] + [p[3]]
+
     def p_expr_binops(self, p):
         '''
         expr : expr PLUS expr
@@ -328,7 +363,10 @@ class MiniJavaParser:
         type : base_type
              | ID
         '''
-        p[0] = ast.Type(p[1], p.lineno(1))
+        # Types are interned, so their line goes to the declaration using
+        # them through the line of this symbol
+        p[0] = ast.get_type(p[1])
+        p.set_lineno(0, p.lineno(1))
 
     def p_base_type(self, p):
         '''
@@ -338,6 +376,7 @@ class MiniJavaParser:
                   | VOID
         '''
         p[0] = p[1]
+        p.set_lineno(0, p.lineno(1))
 
     ################################
     ## Misc
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import urllib.parse
+from miniJavaParser import MiniJavaParser
+from miniJavaSymbolTable import ClassSymbolTable, GlobalSymbolTable
+from miniJavaTypeChecker import TypeChecker
+import miniJavaAST as ast
+
+# Summaries are JSON files of the following shape, one per source file:
+#
+#   {"version": 1,
+#    "source": <sha1 of the source file>,
+#    "classes": [{"name": "B", "super": "A",
+#                 "fields": [["i", "int"]],
+#                 "methods": [{"name": "foo", "ret": "int", "line": 9,
+#                              "params": [["a", "int"]]}]}],
+#    "deps": {<imported class name>: <interface hash of that class>}}
+#
+# "classes" only holds the interface of the classes declared in the file,
+# "deps" the interfaces of the classes from other files it was checked
+# against.
+SUMMARY_VERSION = 1
+SUMMARY_SUFFIX = '.mjsum'
+
+def source_hash(data):
+    return hashlib.sha1(data.encode()).hexdigest()
+
+def interface_hash(class_summary):
+    """
+    Hash of the interface of a class, as written in its summary
+    """
+    data = json.dumps(class_summary, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(data.encode()).hexdigest()
+
+def summarize_class(class_st):
+    """
+    Return the interface of a ClassSymbolTable, without any method bodies
+    """
+    methods = []
+    for method in class_st.methods.values():
+        params = method.params.params if method.params is not None else []
+        methods.append({
+            'name': method.name,
+            'ret': method.ret_type.name,
+            'params': [[p.name, p.type.name] for p in params],
+            'line': method.coord,
+        })
+    return {
+        'name': class_st.class_name,
+        'super': class_st.super_class,
+        'fields': [[name, type.name] for name, type in class_st.fields.items()],
+        'methods': methods,
+    }
+
+def summary_name(path):
+    """
+    Name of the summary of the source file 'path' in the summary directory.
+    It is named after the path relative to the current directory, so that
+    files of the same name in different directories get their own.
+    """
+    return urllib.parse.quote(os.path.relpath(path), safe='') + SUMMARY_SUFFIX
+
+def export_summary(class_sts, source, deps):
+    """
+    Return the summary of a file declaring the classes 'class_sts', with
+    the given source hash and dependency interface hashes
+    """
+    return {
+        'version': SUMMARY_VERSION,
+        'source': source,
+        'classes': [summarize_class(st) for st in class_sts],
+        'deps': deps,
+    }
+
+def import_summary(summary, global_st):
+    """
+    Declare the classes of a summary in GlobalSymbolTable 'global_st'. The
+    methods are declared as MethodDecl nodes without a body.
+    """
+    for cls in summary['classes']:
+        class_st = ClassSymbolTable(cls['name'], cls['super'])
+        for name, type_name in cls['fields']:
+            class_st.declare_field(name, ast.get_type(type_name), None)
+        for m in cls['methods']:
+            params = ast.ParamList([ast.Formal(name, ast.get_type(type_name), m['line'])
+                                    for name, type_name in m['params']], m['line'])
+            method = ast.MethodDecl(m['name'], ast.get_type(m['ret']), params, None, None, m['line'])
+            class_st.declare_method(m['name'], method, m['line'])
+        global_st.declare_class(cls['name'], class_st, None)
+
+def read_summary(path):
+    """
+    Return the summary stored at 'path', or None if there is no usable one
+    """
+    try:
+        with open(path, 'r') as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if summary.get('version') != SUMMARY_VERSION:
+        return None
+    return summary
+
+def write_summary(path, summary):
+    with open(path, 'w') as f:
+        json.dump(summary, f, separators=(',', ':'))
+
+def referenced_classes(node, names):
+    """
+    Add to set 'names' the name of every type, superclass and instantiated
+    class referred to from the tree rooted at 'node'
+    """
+    if isinstance(node, ast.Type):
+        names.add(node.name)
+    elif isinstance(node, ast.ObjInstance):
+        names.add(node.obj)
+    elif isinstance(node, ast.ClassDecl) and node.extend is not None:
+        names.add(node.extend.name)
+    for (child_name, child) in node.children():
+        if child is not None:
+            referenced_classes(child, names)
+    return names
+
+class RecordingSymbolTable(GlobalSymbolTable):
+    """
+    GlobalSymbolTable which records the name of every class looked up in
+    it, so that the classes a file relies on are known even when they are
+    only reached through the return type of a method, which no name in the
+    file refers to. Resolving the hierarchy walks every class of the
+    project, so the lookups it makes are not recorded.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.used = set()
+        self.recording = True
+
+    def lookup_class(self, class_name, line_number):
+        if self.recording:
+            self.used.add(class_name)
+        return super().lookup_class(class_name, line_number)
+
+    def resolve_hierarchy(self):
+        self.recording = False
+        try:
+            super().resolve_hierarchy()
+        finally:
+            self.recording = True
+
+def class_decls(root):
+    return [child for (child_name, child) in root.children() if child is not None]
+
+def build_project(files, summary_dir, verbose=False):
+    """
+    Typecheck a multi-file project, using the summaries in 'summary_dir'
+    to skip every file that did not change and whose dependencies did not
+    change interface. Files are only ever checked against the summaries of
+    the other files, never against their source.
+
+    Returns the list of files that were checked.
+    """
+    os.makedirs(summary_dir, exist_ok=True)
+    parser = MiniJavaParser()
+
+    summary_paths = dict()
+    summaries = dict()
+    trees = dict()
+    for path in files:
+        summary_paths[path] = os.path.join(summary_dir, summary_name(path))
+
+        with open(path, 'r') as f:
+            data = f.read()
+        source = source_hash(data)
+
+        summary = read_summary(summary_paths[path])
+        if summary is not None and summary['source'] == source:
+            summaries[path] = summary
+            continue
+
+        # Changed file: parse it, and collect its new interface from the
+        # class declarations alone
+        if verbose:
+            print("* Parsing " + path + "...")
+        root = parser.parse(data)
+        checker = TypeChecker()
+        class_sts = [checker.declare_class(child) for child in class_decls(root)]
+        trees[path] = root
+        summaries[path] = export_summary(class_sts, source, None)
+
+    # Interface hash of every class of the project, and its file
+    interfaces = dict()
+    owners = dict()
+    for path, summary in summaries.items():
+        for cls in summary['classes']:
+            interfaces[cls['name']] = interface_hash(cls)
+            owners[cls['name']] = path
+
+    checked = []
+    for path in files:
+        summary = summaries[path]
+        if path not in trees:
+            # Unchanged source: only recheck if an interface it was checked
+            # against has changed since
+            deps = summary['deps']
+            if all(interfaces.get(name) == h for name, h in deps.items()):
+                continue
+            if verbose:
+                print("* Parsing " + path + "...")
+            with open(path, 'r') as f:
+                trees[path] = parser.parse(f.read())
+
+        if verbose:
+            print("* Typechecking " + path + "...")
+        root = trees[path]
+        global_st = RecordingSymbolTable()
+        for other, other_summary in summaries.items():
+            if other != path:
+                import_summary(other_summary, global_st)
+        global_st = TypeChecker().typecheck(root, global_st)
+
+        # Record the interfaces of the other files this one relies on: the
+        # classes it names or looked up while being checked, and their
+        # superclasses
+        deps = dict()
+        pending = list(referenced_classes(root, set(global_st.used)))
+        while pending:
+            name = pending.pop()
+            if name in deps or name not in owners or owners[name] == path:
+                continue
+            deps[name] = interfaces[name]
+            super_class = global_st.classes[name].super_class
+            if super_class is not None:
+                pending.append(super_class)
+
+        local = [global_st.lookup_class(child.name, child.coord) for child in class_decls(root)]
+        summary = export_summary(local, summary['source'], deps)
+        write_summary(summary_paths[path], summary)
+        checked.append(path)
+
+    return checked
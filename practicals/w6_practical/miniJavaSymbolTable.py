@@ -5,50 +5,102 @@ class ParseError(Exception): pass
 class SymbolTable(object):
     """
     Base symbol table class
+
+    Besides the stack of scopes, every name currently in scope maps to the
+    stack of its bindings (innermost last), so a lookup is a single dict
+    probe regardless of how deeply scopes are nested. Each scope dict on
+    the scope stack doubles as the undo log of the names it declared, so
+    popping a scope only touches those names.
     """
 
     def __init__(self):
         self.scope_stack = [dict()]
+        self.bindings = dict()
 
     def push_scope(self):
         self.scope_stack.append(dict())
 
     def pop_scope(self):
         assert len(self.scope_stack) > 1
-        self.scope_stack.pop()
+        bindings = self.bindings
+        for name in self.scope_stack.pop():
+            stack = bindings[name]
+            stack.pop()
+            if not stack:
+                del bindings[name]
 
     def declare_variable(self, name, type, line_number):
         """
         Add a new variable.
         Need to do duplicate variable declaration error checking.
         """
-        if name in self.scope_stack[-1]:
+        scope = self.scope_stack[-1]
+        if name in scope:
             raise ParseError("Redeclaring variable named \"" + name + "\"", line_number)
-        self.scope_stack[-1][name] = type
+        scope[name] = type
+        stack = self.bindings.get(name)
+        if stack is None:
+            self.bindings[name] = [type]
+        else:
+            stack.append(type)
 
     def lookup_variable(self, name, line_number):
         """
         Return the type of the variable named 'name', or throw
         a ParseError if the variable is not declared in the scope.
         """
-        # You should traverse through the entire scope stack
-        for scope in reversed(self.scope_stack):
-            if name in scope:
-                return scope[name]
-        raise ParseError("Referencing undefined variable \"" + name + "\"", line_number)
+        stack = self.bindings.get(name)
+        if stack is None:
+            raise ParseError("Referencing undefined variable \"" + name + "\"", line_number)
+        return stack[-1]
 
 class ClassSymbolTable(SymbolTable):
     """
     The class for the symbol table for a class, which stores the interfaces of
     its methods and class variables
+
+    'fields' and 'methods' only hold what the class itself declares. Once
+    every class is declared, GlobalSymbolTable.resolve_hierarchy fills in
+    the flattened tables, which include everything inherited:
+
+        field_layout: list of (class name, field name, type) giving the
+                      slot of every field of an instance, inherited first
+        field_index: field name to the slot of the visible field
+        all_fields: field name to the type of the visible field
+        vtable: list of (class name, MethodDecl) giving the implementation
+                used by each virtual method slot
+        method_index: method name to its vtable slot
+        all_methods: method name to the MethodDecl implementing it
     """
 
-    def __init__(self, class_name, super_class=None):
+    def __init__(self, class_name, super_class=None, extends_line=None):
         super().__init__()
         self.class_name = class_name
         self.super_class = super_class
+        # Line of the extends clause, which errors about the superclass
+        # point at
+        self.extends_line = extends_line
+        self.fields = dict()
         self.methods = dict()
 
+        # Flattened tables, filled in by GlobalSymbolTable.resolve_hierarchy
+        self.field_layout = None
+        self.field_index = None
+        self.all_fields = None
+        self.vtable = None
+        self.method_index = None
+        self.all_methods = None
+
+    def declare_field(self, name, type, line_number):
+        """
+        Declare a new class variable, which is also visible as a variable
+        from within the methods of the class
+        """
+        if name in self.fields:
+            raise ParseError("Redeclaring class variable named \"" + name + "\"", line_number)
+        self.fields[name] = type
+        self.declare_variable(name, type, line_number)
+
     def declare_method(self, method_name, method_node, line_number):
         """
         Declare a new method in this class, checking for duplicates
@@ -60,13 +112,84 @@ class ClassSymbolTable(SymbolTable):
     def lookup_method(self, method_name, line_number):
         """
         Return the MethodNode associated with the method named 'method_name',
-        or throw a ParseError if the method is not declared
+        or throw a ParseError if the method is not declared. Once the class
+        hierarchy is resolved, inherited methods are found as well.
         """
-        method = self.methods[method_name]
+        methods = self.all_methods if self.all_methods is not None else self.methods
+        method = methods.get(method_name)
         if method is None:
-            raise ParseError("Referencing undefined method \"" + method_name + "\"")
+            raise ParseError("Referencing undefined method \"" + method_name + "\"", line_number)
         return method
 
+    def lookup_field(self, field_name, line_number):
+        """
+        Return the type of the class variable named 'field_name', including
+        inherited ones, or throw a ParseError if there is no such field
+        """
+        fields = self.all_fields if self.all_fields is not None else self.fields
+        type = fields.get(field_name)
+        if type is None:
+            raise ParseError("Referencing undefined class variable \"" + field_name + "\"", line_number)
+        return type
+
+    def inherit(self, parent):
+        """
+        Build the flattened tables of this class on top of the (already
+        flattened) tables of its superclass 'parent', or from scratch if
+        'parent' is None
+        """
+        if parent is None:
+            self.field_layout = []
+            self.field_index = dict()
+            self.all_fields = dict()
+            self.vtable = []
+            self.method_index = dict()
+            self.all_methods = dict()
+        else:
+            self.field_layout = list(parent.field_layout)
+            self.field_index = dict(parent.field_index)
+            self.all_fields = dict(parent.all_fields)
+            self.vtable = list(parent.vtable)
+            self.method_index = dict(parent.method_index)
+            self.all_methods = dict(parent.all_methods)
+
+        # Fields declared here get new slots, hiding any inherited field
+        # of the same name
+        for name, type in self.fields.items():
+            self.field_index[name] = len(self.field_layout)
+            self.field_layout.append((self.class_name, name, type))
+            self.all_fields[name] = type
+
+        # Inherited fields are visible from the methods of this class too
+        if parent is not None:
+            for name, type in parent.all_fields.items():
+                if name not in self.fields:
+                    self.declare_variable(name, type, None)
+
+        # Overriding methods reuse the slot of the method they override,
+        # new methods are appended to the vtable
+        for name, method in self.methods.items():
+            index = self.method_index.get(name)
+            if index is None:
+                self.method_index[name] = len(self.vtable)
+                self.vtable.append((self.class_name, method))
+            else:
+                overridden = self.vtable[index][1]
+                if not same_signature(method, overridden):
+                    raise ParseError("Method \"" + name + "\" overrides a method with a different signature", method.coord)
+                self.vtable[index] = (self.class_name, method)
+            self.all_methods[name] = method
+
+def same_signature(m1, m2):
+    """
+    Return whether the two MethodDecl nodes take the same parameter types
+    and return the same type
+    """
+    p1 = m1.params.params if m1.params is not None else []
+    p2 = m2.params.params if m2.params is not None else []
+    return (m1.ret_type is m2.ret_type and len(p1) == len(p2) and
+            all(f1.type is f2.type for f1, f2 in zip(p1, p2)))
+
 class GlobalSymbolTable(SymbolTable):
     """
     The class for the symbol table for the global scope, which
@@ -92,7 +215,39 @@ class GlobalSymbolTable(SymbolTable):
         Return the symbol table for the class named 'class_name', or
         throw a ParseError if the class isn't declared
         """
-        st = self.classes[class_name]
+        st = self.classes.get(class_name)
         if st is None:
             raise ParseError("Referencing undefined class \"" + class_name + "\"", line_number)
         return st
+
+    def resolve_hierarchy(self):
+        """
+        Once every class is declared, build the flattened field and method
+        tables of each class (see ClassSymbolTable), resolving what each
+        class inherits exactly once. Superclasses are resolved before their
+        subclasses, and undefined or cyclic superclasses are reported.
+        """
+        resolved = set()
+        for class_st in self.classes.values():
+            # Walk up until a resolved class or the root of the hierarchy,
+            # then resolve the chain from the top down
+            chain = []
+            on_chain = set()
+            current = class_st
+            while current is not None and current.class_name not in resolved:
+                if current.class_name in on_chain:
+                    raise ParseError("Cyclic inheritance involving class \"" + current.class_name + "\"",
+                                     current.extends_line)
+                chain.append(current)
+                on_chain.add(current.class_name)
+                if current.super_class is None:
+                    current = None
+                else:
+                    current = self.lookup_class(current.super_class, current.extends_line)
+
+            for st in reversed(chain):
+                parent = None
+                if st.super_class is not None:
+                    parent = self.classes[st.super_class]
+                st.inherit(parent)
+                resolved.add(st.class_name)
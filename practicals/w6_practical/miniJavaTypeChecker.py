@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 
+from concurrent.futures import ProcessPoolExecutor
 from miniJavaSymbolTable import SymbolTable, GlobalSymbolTable, ClassSymbolTable, ParseError
 import miniJavaAST as ast
 
+# Canonical types used by the checker. Types are interned by ast.get_type,
+# so these can be compared by identity
+INT = ast.get_type('int')
+BOOLEAN = ast.get_type('boolean')
+ID = ast.get_type('id')
+THIS = ast.get_type('this')
+
 class TypeChecker(object):
     """
     Uses the same visitor pattern as ast.NodeVisitor, but modified to
@@ -30,8 +38,16 @@ class TypeChecker(object):
     NOTE: This Typechecker is as incomplete as the miniJava Parser -- meaning
           lack of features from parsers will impact this typechecker as well!
           (i.e., no method call, can only declare one method at a time, etc...)
+
+    Checking a program happens in two phases: first every class is declared
+    with its fields and method signatures, then the method bodies are
+    checked. With 'jobs' greater than 1, the second phase runs in a pool of
+    that many processes, one class at a time.
     """
 
+    def __init__(self, jobs=1):
+        self.jobs = jobs
+
     def typecheck(self, node, st=None):
         method = 'check_' + node.__class__.__name__
         return getattr(self, method, self.generic_typecheck)(node, st)
@@ -45,11 +61,12 @@ class TypeChecker(object):
     def eq_type(self, t1, t2):
         """
         Helper function to check if two given type node is that of the
-        same type. Precondition is that both t1 and t2 are that of class Type
+        same type. Precondition is that both t1 and t2 are canonical types
+        obtained from ast.get_type, so comparing identities is sufficient
         """
         if not isinstance(t1, ast.Type) or not isinstance(t2, ast.Type):
             raise ParseError("eq_type invoked on non-type objects")
-        return t1.name == t2.name
+        return t1 is t2
 
     def check_AssignStmt(self, node, st):
 
@@ -78,22 +95,27 @@ class TypeChecker(object):
             raise ParseError("Left and right expressions are of different type", node.coord)
 
         if node.op in ['+', '-', '*', '/']:
-            return ast.Type("int")
+            return INT
 
-        return ast.Type("boolean")
-
-    def check_ClassDecl(self, node, st):
+        return BOOLEAN
 
-        # Generate class symbol table
-        class_st = ClassSymbolTable(node.name, node.extend)
+    def declare_class(self, node):
+        """
+        Generate the symbol table of the class declared by ClassDecl 'node',
+        holding its class variables and method signatures, without checking
+        the method bodies yet
+        """
+        if node.extend is not None:
+            class_st = ClassSymbolTable(node.name, node.extend.name, node.extend.coord)
+        else:
+            class_st = ClassSymbolTable(node.name)
 
         # If there is a class variable declared, add to the symbol table
         var = node.var_decl
         if var is not None:
-            class_st.declare_variable(var.name, var.type, var.coord)
+            class_st.declare_field(var.name, var.type, var.coord)
 
-        # If there is a method declared, add to the symbol table and recursively
-        # typecheck the method as well.
+        # If there is a method declared, add to the symbol table.
         # Note that currently, the grammar only specifies a single method
         # per class -- however, this can be extended to support multiple
         # methods. Similar can be said for Program visitor with multiple
@@ -101,6 +123,18 @@ class TypeChecker(object):
         method = node.method_decl
         if method is not None:
             class_st.declare_method(method.name, method, method.coord)
+
+        return class_st
+
+    def check_ClassDecl(self, node, st):
+        """
+        Typecheck the method of the class, using the class symbol table
+        which was declared in the global symbol table 'st' beforehand
+        """
+        class_st = st.lookup_class(node.name, node.coord)
+
+        method = node.method_decl
+        if method is not None:
             self.typecheck(method, class_st)
 
         return class_st
@@ -110,8 +144,10 @@ class TypeChecker(object):
         Returns the type of the constant. If the constant refers to
         some kind of id, then we need to find if the id has been declared.
         """
-        if self.eq_type(node.type, ast.Type('id')):
+        if node.type is ID:
             return st.lookup_variable(node.value, node.coord)
+        if node.type is THIS:
+            return ast.get_type(st.class_name)
         return node.type
 
     def check_DeclStmt(self, node, st):
@@ -134,7 +170,7 @@ class TypeChecker(object):
         """
 
         cond_type = self.typecheck(node.cond, st)
-        if not self.eq_type(ast.Type('boolean'), cond_type):
+        if not self.eq_type(BOOLEAN, cond_type):
             raise ParseError("If statement requires boolean as its condition", node.coord)
 
         if node.true_body is not None:
@@ -146,6 +182,9 @@ class TypeChecker(object):
 
     def check_MethodDecl(self, node, st):
 
+        # Parameters are local to the method, so they go in the method scope
+        st.push_scope()
+
         # Go through the parameters
         if node.params is not None:
             self.typecheck(node.params, st)
@@ -160,8 +199,39 @@ class TypeChecker(object):
             raise ParseError("Mismatch of return type within method \"" +
                              node.name + "\"", node.coord)
 
+        st.pop_scope()
+
         return ret_stmt_type
 
+    def check_MethodCall(self, node, st):
+        """
+        The method must be declared by the class of the object it is called
+        on, or inherited by it, and be given arguments of the types of its
+        parameters. The call has the return type of the method.
+        """
+        obj_type = self.typecheck(node.obj, st)
+        class_st = self.global_st.lookup_class(obj_type.name, node.coord)
+        method = class_st.lookup_method(node.name, node.coord)
+
+        params = method.params.params if method.params is not None else []
+        if len(params) != len(node.args):
+            raise ParseError("Method \"" + node.name + "\" takes " + str(len(params)) +
+                             " arguments but is given " + str(len(node.args)), node.coord)
+        for param, arg in zip(params, node.args):
+            if not self.eq_type(param.type, self.typecheck(arg, st)):
+                raise ParseError("Argument \"" + param.name + "\" of method \"" +
+                                 node.name + "\" is given the wrong type", node.coord)
+
+        return method.ret_type
+
+    def check_ObjInstance(self, node, st):
+        """
+        The class being instantiated must be declared, either in this
+        program or in an imported summary
+        """
+        self.global_st.lookup_class(node.obj, node.coord)
+        return ast.get_type(node.obj)
+
     def check_ParamList(self, node, st):
         """
         Add all of the parameters to the symbol table
@@ -176,18 +246,48 @@ class TypeChecker(object):
         """
         Generate global symbol table. Recursively typecheck its classes and
         add its class symbol table to itself.
+
+        If 'st' is given, it is a global symbol table already holding
+        classes declared elsewhere (see miniJavaSummary), which the classes
+        of this program are added to.
         """
         # Generate global symbol table
-        global_st = GlobalSymbolTable()
-
-        # Iterate through the declared classes, perform typecheck on them
-        # and add them to the global symbol table
-        for (child_name, child) in node.children():
-            class_st = self.typecheck(child, global_st)
+        global_st = st if st is not None else GlobalSymbolTable()
+        self.global_st = global_st
+
+        # Declare every class first, so that the inherited fields and
+        # methods can be resolved once before any method body is checked
+        classes = [child for (child_name, child) in node.children()]
+        for child in classes:
+            class_st = self.declare_class(child)
             global_st.declare_class(class_st.class_name, class_st, child.coord)
 
+        global_st.resolve_hierarchy()
+
+        # Iterate through the declared classes and perform typecheck on them
+        if self.jobs > 1 and len(classes) > 1:
+            self.check_parallel(classes, global_st)
+        else:
+            for child in classes:
+                self.typecheck(child, global_st)
+
         return global_st
 
+    def check_parallel(self, classes, global_st):
+        """
+        Typecheck the bodies of the ClassDecls 'classes' in a process pool.
+        The classes are independent once declared, so each worker only
+        needs its own copy of the global symbol table. The first error in
+        source order is raised, as it would be when checking sequentially.
+        """
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=init_worker,
+                                 initargs=(global_st, )) as pool:
+            errors = list(pool.map(check_class_job, classes))
+
+        for error in errors:
+            if error is not None:
+                raise error
+
     def check_RetStmt(self, node, st):
         return self.typecheck(node.expr, st)
 
@@ -198,7 +298,7 @@ class TypeChecker(object):
         scope to the scope_stack and pop the scope when done.
         """
         st.push_scope()
-        for stmt in node.stmt_lst:
+        for stmt in node.stmt_lst or []:
             self.typecheck(stmt, st)
         st.pop_scope()
 
@@ -225,10 +325,30 @@ class TypeChecker(object):
         """
 
         cond_type = self.typecheck(node.cond, st)
-        if not self.eq_type(ast.Type('boolean'), cond_type):
+        if not self.eq_type(BOOLEAN, cond_type):
             raise ParseError("While statement requires boolean as its condition", node.coord)
 
         if node.body is not None:
             self.typecheck(node.body, st)
 
         return None
+
+# Global symbol table of the program, in TypeChecker.check_parallel workers
+worker_global_st = None
+
+def init_worker(global_st):
+    global worker_global_st
+    worker_global_st = global_st
+
+def check_class_job(node):
+    """
+    Typecheck the methods of ClassDecl 'node' in a worker process. Returns
+    the ParseError raised, if any.
+    """
+    checker = TypeChecker()
+    checker.global_st = worker_global_st
+    try:
+        checker.typecheck(node, worker_global_st)
+    except ParseError as e:
+        return e
+    return None
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import pytest
+from miniJavaParser import MiniJavaParser
+from miniJavaASTDump import ASTDumper, PreorderDumper, TextDumper
+import miniJavaAST as ast
+
+PARSER = MiniJavaParser()
+
+def example():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'example.java'), 'r') as f:
+        return f.read()
+
+@pytest.mark.parametrize('source', ['example', 'operators'])
+def test_text_matches_node_visitor(source, capsys):
+    root = PARSER.parse(example() if source == 'example' else OPERATORS)
+
+    ast.NodeVisitor().visit(root)
+    expected = capsys.readouterr().out
+    assert ' object at ' in expected
+    # NodeVisitor prints the repr of Type nodes, TextDumper their name
+    for name in ('int', 'boolean', 'id', 'this'):
+        expected = expected.replace(str(ast.get_type(name)), name)
+
+    out = io.BytesIO()
+    TextDumper(out).dump(root)
+    assert out.getvalue().decode() == expected
+
+def test_dumpers_are_abstract():
+    with pytest.raises(TypeError):
+        ASTDumper(io.BytesIO())
+    with pytest.raises(TypeError):
+        PreorderDumper(io.BytesIO())
+
+OPERATORS = """
+class Main {
+	public static void main (String[] arg) {
+		int a = 3;
+	}
+}
+
+class A extends B {
+	int i;
+	public int foo(int a, boolean b) {
+		boolean c = a == 1 && !b;
+		while (c) {
+			c = new A().foo(a - 1, this.bar());
+		}
+		return i;
+	}
+}
+"""
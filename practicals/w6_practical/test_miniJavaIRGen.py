@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+import pytest
+from miniJavaParser import MiniJavaParser
+from miniJavaTypeChecker import TypeChecker
+from miniJavaSymbolTable import GlobalSymbolTable
+from miniJavaIRGen import IRGen, field_offset, object_size, VTABLE_OFFSET
+from miniJavaIR import Op, var, const
+import miniJavaAST as ast
+
+PARSER = MiniJavaParser()
+
+TEMPLATE = """
+class Main {
+	public static void main (String[] arg) {
+		int a = 3;
+	}
+}
+
+class A {
+	int i;
+	public int foo(int a, int b) {
+		%s
+		return i;
+	}
+}
+"""
+
+# A class hierarchy, one class per source since the grammar only allows
+# one class besides the main class: B extends A and overrides 'get', C
+# extends B and adds 'foo', and D calls 'foo'
+HIERARCHY = [
+    ('A', """
+	int i;
+	public int get() {
+		return i;
+	}
+"""),
+    ('B extends A', """
+	int j;
+	public int get() {
+		j = i;
+		return j;
+	}
+"""),
+    ('C extends B', """
+	int k;
+	public int foo() {
+		return k;
+	}
+"""),
+    ('D extends C', """
+	int m;
+	public int bar() {
+		return new C().foo();
+	}
+"""),
+]
+
+def class_source(name, body):
+    main = 'Main' + name.split()[0]
+    return ("class %s {\n\tpublic static void main (String[] arg) {\n\t\tint a = 3;\n\t}\n}\n\n"
+            "class %s {%s}\n" % (main, name, body))
+
+def hierarchy():
+    """
+    Typecheck the classes of HIERARCHY, and return the global symbol table
+    along with the root of each source by class name
+    """
+    global_st = GlobalSymbolTable()
+    roots = dict()
+    checker = TypeChecker()
+    for name, body in HIERARCHY:
+        root = PARSER.parse(class_source(name, body))
+        for (child_name, child) in root.children():
+            global_st.declare_class(child.name, checker.declare_class(child), child.coord)
+        roots[name.split()[0]] = root
+    global_st.resolve_hierarchy()
+    return global_st, roots
+
+def method_body(name):
+    """
+    The IR of the body of the single method of class 'name' of HIERARCHY
+    """
+    global_st, roots = hierarchy()
+    gen = IRGen(global_st)
+    gen.generate(roots[name])
+    return body_code(gen.IR_lst)
+
+def parse(body):
+    return PARSER.parse(TEMPLATE % body)
+
+def generate(body):
+    root = parse(body)
+    global_st = TypeChecker().typecheck(root)
+    gen = IRGen(global_st)
+    gen.generate(root)
+    return gen.IR_lst
+
+def body_code(instrs):
+    """
+    The instructions of the body of A.foo, after its BeginFunc
+    """
+    ops = [instr.op for instr in instrs]
+    return instrs[ops.index(Op.BEGINFUNC, ops.index(Op.ENDFUNC)) + 1:]
+
+@pytest.mark.parametrize('op', ['==', '!=', '&&'])
+def test_binop_parses(op):
+    operands = 'c %s c' % op if op == '&&' else 'a %s b' % op
+    root = parse('boolean c = true;\n\t\tboolean d = %s;' % operands)
+    expr = root.class_decl.method_decl.body.stmt_lst[1].expr
+    assert isinstance(expr, ast.BinOp)
+    assert expr.op == op
+
+@pytest.mark.parametrize('op, jump', [('==', Op.IFNE), ('!=', Op.IFEQ)])
+def test_comparison_branches_in_jump(op, jump):
+    code = body_code(generate('if (a %s b) {\n\t\t\ti = 1;\n\t\t} else {\n\t\t\ti = 2;\n\t\t}' % op))
+    assert code[0].op == jump
+    assert Op.BINOP not in [i.op for i in code]
+
+def test_and_short_circuits():
+    code = body_code(generate('if (a == b && a != 1) {\n\t\t\ti = 1;\n\t\t} else {\n\t\t\ti = 2;\n\t\t}'))
+    # Both operands jump to the false branch, the right one is only
+    # evaluated if the left one holds
+    assert [i.op for i in code[:2]] == [Op.IFNE, Op.IFEQ]
+    assert code[0].target == code[1].target
+
+def test_and_value():
+    code = body_code(generate('boolean c = a == b && !(a != 1);'))
+    assert [i.op for i in code[:5]] == [Op.COPY, Op.IFNE, Op.IFNE, Op.COPY, Op.LABEL]
+    assert code[0].a.value == 'false'
+    assert code[3].a.value == 'true'
+
+def test_inherited_fields_come_first():
+    global_st, roots = hierarchy()
+    a = global_st.lookup_class('A', None)
+    d = global_st.lookup_class('D', None)
+    assert object_size(a) == 2
+    assert object_size(d) == 5
+    # The vtable pointer is at offset 0, inherited fields keep their offset
+    assert [field_offset(d, name) for name in ('i', 'j', 'k', 'm')] == [1, 2, 3, 4]
+    assert field_offset(a, 'i') == field_offset(d, 'i')
+
+def test_override_reuses_slot():
+    global_st, roots = hierarchy()
+    a, b, c = [global_st.lookup_class(name, None) for name in 'ABC']
+    assert b.method_index['get'] == a.method_index['get'] == 0
+    assert [cls for cls, method in b.vtable] == ['B']
+    # New methods get the slots after the inherited ones
+    assert c.method_index['foo'] == 1
+    assert [(cls, method.name) for cls, method in c.vtable] == [('B', 'get'), ('C', 'foo')]
+
+def test_field_access_offsets():
+    code = method_body('B')
+    # j = i; return j;
+    load_i, store_j, load_j = [instr for instr in code if instr.op in (Op.LOAD, Op.STORE)]
+    assert (load_i.op, load_i.a, load_i.b) == (Op.LOAD, var('this'), const(1))
+    assert (store_j.op, store_j.dst, store_j.a, store_j.b) == (Op.STORE, var('this'), load_i.dst, const(2))
+    assert (load_j.op, load_j.a, load_j.b) == (Op.LOAD, var('this'), const(2))
+
+def test_method_call_loads_slot():
+    code = method_body('D')
+    vtable, func = [instr for instr in code if instr.op == Op.LOAD]
+    assert vtable.b == const(VTABLE_OFFSET)
+    assert (func.a, func.b) == (vtable.dst, const(1))
+    call = [instr for instr in code if instr.op == Op.ICALL][0]
+    assert call.a == func.dst
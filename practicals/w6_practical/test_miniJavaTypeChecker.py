@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import pytest
+from miniJavaParser import MiniJavaParser
+from miniJavaTypeChecker import TypeChecker
+from miniJavaSymbolTable import ParseError
+import miniJavaAST as ast
+
+PARSER = MiniJavaParser()
+
+DECLARATIONS = """
+class Main {
+	public static void main (String[] arg) {
+		int a = 3;
+	}
+}
+
+class A {
+	int
+	i;
+	public
+	int foo(boolean
+	b) {
+		int
+		c = 1;
+		return c;
+	}
+}
+"""
+
+def test_declarations_keep_the_line_of_their_type():
+    root = PARSER.parse(DECLARATIONS)
+    cls = root.class_decl
+    method = cls.method_decl
+    assert cls.var_decl.type_coord == 9
+    assert method.type_coord == 12
+    assert method.params.params[0].type_coord == 12
+    assert method.body.stmt_lst[0].type_coord == 14
+
+def test_eq_type_rejects_non_types():
+    with pytest.raises(ParseError):
+        TypeChecker().eq_type('int', ast.get_type('int'))
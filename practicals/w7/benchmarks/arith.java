@@ -0,0 +1,20 @@
+public int mix(int n, int seed) {
+	int r = seed;
+	if (n != 0) {
+		int a = seed * 1103515245 + 12345;
+		int b = a / 65536 - a / 3 + n * 7;
+		int c = (a - b) * (b + 3) / 5;
+		r = mix(n - 1, a + b * 3 - c + n / 2);
+	}
+	return r;
+}
+
+public int repeat(int k) {
+	int r = 0;
+	if (k != 0) {
+		r = mix(500, k) + repeat(k - 1);
+	}
+	return r;
+}
+
+int result = repeat(200);
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+from tinyJavaParser import TinyJavaParser
+from tinyJavaTypeChecker import TypeChecker
+from tinyJavaResolver import Resolver
+from tinyJavaIRGen import IRGen
+from tinyJavaExec import Evaluator, ClosureCompiler, global_values
+from tinyJavaVM import VM
+
+def load(path):
+    """
+    Return the resolved AST of the program in 'path'
+    """
+    f = open(path, 'r')
+    data = f.read()
+    f.close()
+    root = TinyJavaParser().parse(data)
+    TypeChecker().typecheck(root)
+    Resolver().resolve(root)
+    return root
+
+def tree(root):
+    evaluator = Evaluator()
+    return global_values(root, evaluator.run(root))
+
+def closures(root):
+    compiler = ClosureCompiler()
+    return global_values(root, compiler.run(root))
+
+def vm(root):
+    generator = IRGen()
+    generator.generate(root)
+    machine = VM(generator.IR_lst)
+    machine.run()
+    return machine.globals_by_name()
+
+# Backends compared, the first one being the reference
+BACKENDS = [('tree', tree), ('closures', closures), ('vm', vm)]
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Compare the tinyJava execution backends on the benchmark programs')
+    argparser.add_argument('FILES', nargs='*', help="Programs to run, every .java file here by default")
+    argparser.add_argument('-n', '--repeat', type=int, default=3, help="Keep the best time of this many runs")
+    args = argparser.parse_args()
+
+    files = args.FILES or sorted(glob.glob(os.path.join(HERE, '*.java')))
+    print("%-12s %-9s %10s %8s" % ('program', 'backend', 'time (s)', 'speedup'))
+    for path in files:
+        root = load(path)
+        expected = None
+        reference = None
+        for name, backend in BACKENDS:
+            best = None
+            for i in range(args.repeat):
+                # Compiling is part of the cost of a backend
+                start = time.perf_counter()
+                values = backend(root)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            if expected is None:
+                expected = values
+                reference = best
+            elif values != expected:
+                print("%s: %s computed %s instead of %s" % (path, name, values, expected))
+                sys.exit(1)
+            print("%-12s %-9s %10.3f %7.2fx" % (os.path.basename(path), name, best, reference / best))
@@ -0,0 +1,15 @@
+public int fib(int n) {
+	int r = n;
+	if (n == 0) {
+		r = 0;
+	} else {
+		if (n == 1) {
+			r = 1;
+		} else {
+			r = fib(n - 1) + fib(n - 2);
+		}
+	}
+	return r;
+}
+
+int result = fib(22);
@@ -0,0 +1,30 @@
+public int twice(int v) {
+	return v + v;
+}
+
+public int clamp(int v, int limit) {
+	int r = v;
+	if (v == limit) {
+		r = 0;
+	}
+	return r;
+}
+
+public int step(int n, int acc) {
+	int r = acc;
+	if (n != 0) {
+		int next = clamp(twice(acc) - twice(n) / 3, 1000) + n;
+		r = step(n - 1, next);
+	}
+	return r;
+}
+
+public int run(int k) {
+	int r = 0;
+	if (k != 0) {
+		r = step(300, k) + run(k - 1);
+	}
+	return r;
+}
+
+int result = run(300);
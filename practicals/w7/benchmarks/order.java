@@ -0,0 +1,17 @@
+int g = 1;
+
+public int bump(int n) {
+	g = g * 3 + n;
+	return n;
+}
+
+public int walk(int n) {
+	int r = 0;
+	if (n != 0) {
+		r = g - bump(n) + walk(n - 1);
+	}
+	return r;
+}
+
+int x = walk(2000);
+int y = g + walk(1000);
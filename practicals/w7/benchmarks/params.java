@@ -0,0 +1,25 @@
+int g = 5;
+
+public int set(int v) {
+	g = v;
+	return v;
+}
+
+public int pick(int p) {
+	if (g != 1) {
+		p = 2;
+	}
+	return p;
+}
+
+public int walk(int n) {
+	int r = 0;
+	if (n != 0) {
+		r = pick(n) + set(n - 1) + walk(n - 1);
+	}
+	return r;
+}
+
+int s = set(3);
+int r = pick(100);
+int t = walk(1500);
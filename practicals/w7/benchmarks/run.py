@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(HERE, '..', 'tinyJava.py')
+
+# Optimization flags each benchmark is run with
+CONFIGS = [
+    ('none', []),
+    ('fold', ['--fold']),
+    ('inline', ['--inline', '20', '--fold', '--peephole']),
+    ('O1', ['-O1']),
+    ('O2', ['-O2']),
+    ('all', ['-O2', '--registers', '8']),
+]
+
+EXECUTED = re.compile(r'\* Executed (\d+) instructions in ([0-9.]+)s')
+
+def run(path, flags):
+    """
+    Run 'path' in the VM with 'flags', returning the printed globals, the
+    number of instructions executed and the time the VM took
+    """
+    out = subprocess.run([sys.executable, COMPILER, '--run', '-v'] + flags + [path],
+                         stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+    steps, elapsed = EXECUTED.search(out).groups()
+    values = [line for line in out.splitlines() if not line.startswith('*')]
+    return values, int(steps), float(elapsed)
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description='Time the tinyJava VM on the benchmark programs')
+    argparser.add_argument('FILES', nargs='*', help="Programs to run, every .java file here by default")
+    argparser.add_argument('-n', '--repeat', type=int, default=3, help="Keep the best time of this many runs")
+    args = argparser.parse_args()
+
+    files = args.FILES or sorted(glob.glob(os.path.join(HERE, '*.java')))
+    print("%-12s %-6s %12s %10s %12s" % ('program', 'flags', 'instructions', 'time (s)', 'instr/s'))
+    for path in files:
+        expected = None
+        for name, flags in CONFIGS:
+            best = None
+            for i in range(args.repeat):
+                values, steps, elapsed = run(path, flags)
+                best = elapsed if best is None else min(best, elapsed)
+            # Optimizations must never change the result
+            if expected is None:
+                expected = values
+            elif values != expected:
+                print("%s: results differ with %s: %s instead of %s" % (path, name, values, expected))
+                sys.exit(1)
+            print("%-12s %-6s %12d %10.3f %12.0f" % (os.path.basename(path), name, steps, best,
+                                                      steps / best if best else 0))
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+import functools
+import io
+import random
+import pytest
+from tinyJavaParser import TinyJavaParser
+from tinyJavaTypeChecker import TypeChecker
+from tinyJavaResolver import Resolver
+from tinyJavaIRGen import IRGen
+from tinyJavaExec import Evaluator, ClosureCompiler, ExecError, global_values
+from tinyJavaVM import VM, VMError
+from tinyJavaCFG import CFG, DUMPS
+from tinyJavaPassManager import (PassManager, optimization_passes, InlinePass, LVNPass, FoldPass,
+                                 SCCPPass, DCEPass, PeepholePass, RegAllocPass)
+
+# Differential tests: every program is run by the Evaluator, which walks
+# the AST, and compiled to IR and run by the VM after each of the pass
+# pipelines below. The global variables must end up the same.
+
+PARSERS = {False: TinyJavaParser(), True: TinyJavaParser(hash_cons=True)}
+
+# Pipelines by name, as (optimization level, extra passes, hash-consing)
+CONFIGS = {
+    'none': (0, [], False),
+    'O1': (1, [], False),
+    'O2': (2, [], False),
+    'O2-regs': (2, [RegAllocPass(3)], False),
+    'inline-sccp': (0, [InlinePass(20), SCCPPass()], False),
+    'lvn-fold-dce': (0, [LVNPass(), FoldPass(), DCEPass(), PeepholePass()], False),
+    'hash-cons': (0, [], True),
+    'hash-cons-O2': (2, [], True),
+}
+
+# Programs which were once miscompiled
+REGRESSIONS = {
+    # SCCP dropped the constant definitions of a parameter reassigned in
+    # one branch of an inlined method
+    'sccp-phi': """
+int g = 5;
+public int set(int v) {
+    g = v;
+    return v;
+}
+public int m(int p) {
+    if (g != 1) {
+        p = 2;
+    } else {
+    }
+    return p;
+}
+int s = set(3);
+int r = m(100);
+""",
+    # The left operand was read after the call on the right changed it
+    'eval-order': """
+int g = 1;
+public int f(int a) {
+    g = 100;
+    return a;
+}
+int x = g - f(5);
+""",
+    # A hash-consed expression reused the register of another method
+    'hash-cons-scope': """
+int c = 0;
+public int foo(int i) {
+    return 1 + 2;
+}
+if (1 + 2 == 3) {
+    c = 7;
+}
+""",
+    # Methods without parameters
+    'no-params': """
+int g = 2;
+public int f() {
+    g = g * 3;
+    return g + 1;
+}
+int a = f() + f();
+""",
+}
+
+# Programs which type check but fail at run time
+RUNTIME_ERRORS = {
+    # 'inner' uses a variable of 'outer' once 'outer' has returned
+    'enclosing-method-returned': """
+public int outer(int a) {
+    int b = a + 1;
+    public int inner(int c) {
+        return b + c;
+    }
+    return inner(a);
+}
+int x = outer(1);
+int y = inner(2);
+""",
+    'uninitialized': """
+int x = x + 1;
+""",
+}
+
+class RandomProgram(object):
+    """
+    Generates a random well-typed program: a few global variables, methods
+    of up to three parameters calling the methods declared before them,
+    and top-level statements. Divisions are only by non-zero constants, so
+    that the programs run to completion.
+    """
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.count = 0
+
+    def fresh(self, prefix):
+        self.count += 1
+        return '%s%d' % (prefix, self.count)
+
+    def expr(self, ints, methods, depth):
+        rng = self.rng
+        c = rng.random()
+        if depth <= 0 or c < 0.3:
+            if ints and rng.random() < 0.6:
+                return rng.choice(ints)
+            return str(rng.randint(0, 9))
+        if c < 0.45 and methods:
+            name, count = rng.choice(methods)
+            args = [self.expr(ints, methods, depth - 1) for i in range(count)]
+            return '%s(%s)' % (name, ', '.join(args))
+        if c < 0.5:
+            return '(%s / %d)' % (self.expr(ints, methods, depth - 1), rng.randint(1, 5))
+        return '(%s %s %s)' % (self.expr(ints, methods, depth - 1), rng.choice('+-*'),
+                               self.expr(ints, methods, depth - 1))
+
+    def cond(self, ints, methods, depth):
+        if self.rng.random() < 0.1:
+            return self.rng.choice(['true', 'false'])
+        return '%s %s %s' % (self.expr(ints, methods, depth), self.rng.choice(['==', '!=']),
+                             self.expr(ints, methods, depth))
+
+    def stmts(self, ints, assignable, methods, depth, count, out, indent):
+        """
+        Append 'count' statements to 'out', and return the int variables
+        in scope after them
+        """
+        rng = self.rng
+        ints = list(ints)
+        for i in range(count):
+            c = rng.random()
+            if c < 0.35:
+                name = self.fresh('v')
+                out.append('%sint %s = %s;' % (indent, name, self.expr(ints, methods, 2)))
+                ints.append(name)
+                assignable = assignable + [name]
+            elif c < 0.7 and assignable:
+                out.append('%s%s = %s;' % (indent, rng.choice(assignable), self.expr(ints, methods, 2)))
+            elif depth > 0:
+                out.append('%sif (%s) {' % (indent, self.cond(ints, methods, 1)))
+                self.stmts(ints, assignable, methods, depth - 1, rng.randint(0, 3), out, indent + '    ')
+                if rng.random() < 0.6:
+                    out.append('%s} else {' % indent)
+                    self.stmts(ints, assignable, methods, depth - 1, rng.randint(0, 3), out, indent + '    ')
+                out.append('%s}' % indent)
+        return ints
+
+    def source(self):
+        rng = self.rng
+        out = []
+        globals = []
+        for i in range(rng.randint(1, 3)):
+            name = self.fresh('g')
+            out.append('int %s = %s;' % (name, self.expr(globals, [], 2)))
+            globals.append(name)
+        methods = []
+        for i in range(rng.randint(0, 4)):
+            name = self.fresh('m')
+            params = [self.fresh('p') for j in range(rng.randint(0, 3))]
+            out.append('public int %s(%s) {' % (name, ', '.join('int ' + p for p in params)))
+            ints = self.stmts(globals + params, globals + params, methods, 2, rng.randint(0, 5), out, '    ')
+            out.append('    return %s;' % self.expr(ints, methods, 2))
+            out.append('}')
+            methods.append((name, len(params)))
+        self.stmts(globals, globals, methods, 2, rng.randint(1, 6), out, '')
+        return '\n'.join(out) + '\n'
+
+def load(src, hash_cons=False):
+    root = PARSERS[hash_cons].parse(src)
+    TypeChecker().typecheck(root)
+    Resolver().resolve(root)
+    return root
+
+@functools.lru_cache(maxsize=None)
+def evaluate(src):
+    """
+    Global variables after running 'src' with the Evaluator, or 'error'
+    """
+    root = load(src)
+    evaluator = Evaluator()
+    try:
+        evaluator.run(root)
+    except ExecError:
+        return 'error'
+    return global_values(root, evaluator.globals)
+
+def compile_and_run(src, config):
+    """
+    Global variables after running 'src' on the VM, compiled with the
+    pipeline named 'config', or 'error'
+    """
+    level, extra, hash_cons = CONFIGS[config]
+    root = load(src, hash_cons)
+    generator = IRGen(fuse_branches=level >= 2)
+    generator.generate(root)
+    manager = PassManager()
+    for item in optimization_passes(level) + extra:
+        manager.add(item)
+    vm = VM(manager.run(generator.IR_lst))
+    try:
+        vm.run()
+    except VMError:
+        return 'error'
+    return vm.globals_by_name()
+
+def check(src, config):
+    expected = evaluate(src)
+    assert compile_and_run(src, config) == expected
+
+@pytest.mark.parametrize('config', sorted(CONFIGS))
+@pytest.mark.parametrize('name', sorted(REGRESSIONS))
+def test_regression(name, config):
+    check(REGRESSIONS[name], config)
+
+@pytest.mark.parametrize('config', sorted(CONFIGS))
+@pytest.mark.parametrize('seed', range(100))
+def test_random_program(seed, config):
+    check(RandomProgram(seed).source(), config)
+
+@pytest.mark.parametrize('config', sorted(CONFIGS))
+@pytest.mark.parametrize('name', sorted(RUNTIME_ERRORS))
+def test_runtime_error(name, config):
+    assert compile_and_run(RUNTIME_ERRORS[name], config) == 'error'
+
+@pytest.mark.parametrize('backend', [Evaluator, ClosureCompiler])
+@pytest.mark.parametrize('name', sorted(RUNTIME_ERRORS))
+def test_runtime_error_exec(name, backend):
+    with pytest.raises(ExecError):
+        backend().run(load(RUNTIME_ERRORS[name]))
+
+@pytest.mark.parametrize('fmt', sorted(DUMPS))
+def test_cfg_dump_shows_dominators(fmt):
+    root = load(REGRESSIONS['sccp-phi'])
+    generator = IRGen()
+    generator.generate(root)
+    out = io.StringIO()
+    DUMPS[fmt](CFG(generator.IR_lst), out)
+    assert ('style=dashed' if fmt == 'dot' else 'idom B') in out.getvalue()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import pytest
+from tinyJavaParser import TinyJavaParser
+from tinyJavaTypeChecker import TypeChecker
+from tinyJavaIncremental import IncrementalTypeChecker
+from tinyJavaSymbolTable import ParseError
+from tinyJavaResolver import Resolver
+from tinyJavaIRGen import IRGen
+from tinyJavaVM import VM
+import tinyJavaAST as ast
+
+PARSER = TinyJavaParser()
+
+RECURSIVE = """
+public int fact(int n) {
+    int r = 1;
+    if (n != 0) {
+        r = n * fact(n - 1);
+    }
+    return r;
+}
+int a = fact(5);
+int b = fact(a);
+"""
+
+FORWARD_CALL = """
+public int f(int n) {
+    return g(n);
+}
+public int g(int n) {
+    return n;
+}
+"""
+
+REDECLARED = """
+public int f(int n) {
+    return n;
+}
+public int f(int n) {
+    return n;
+}
+"""
+
+CALLER = """
+int k = 3;
+public int fact(int n) {
+    int r = 1;
+    if (n != 0) {
+        r = n * fact(n - 1) + k - k;
+    }
+    return r;
+}
+public int twice(int n) {
+    int m = fact(n);
+    return m + m;
+}
+int a = twice(4);
+"""
+
+def parse(src):
+    return PARSER.parse(src)
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_method_may_call_itself(jobs):
+    root = parse(RECURSIVE)
+    TypeChecker(jobs=jobs).typecheck(root)
+    assert root.annotated
+
+def test_incremental_method_may_call_itself():
+    checker = IncrementalTypeChecker()
+    checker.typecheck(parse(RECURSIVE))
+    assert checker.rechecked == ['fact']
+    checker.typecheck(parse(RECURSIVE))
+    assert checker.reused == ['fact']
+
+def test_incremental_reused_methods_are_annotated():
+    checker = IncrementalTypeChecker()
+    checker.typecheck(parse(CALLER))
+    root = parse(CALLER)
+    checker.typecheck(root)
+    assert checker.reused == ['fact', 'twice']
+    assert root.annotated
+
+    Resolver().resolve(root)
+    gen = IRGen(require_annotations=True)
+    gen.generate(root)
+    vm = VM(gen.IR_lst)
+    vm.run()
+    assert vm.globals_by_name() == {'k': 3, 'a': 48}
+
+def test_incremental_only_rechecks_edited_methods():
+    checker = IncrementalTypeChecker()
+    checker.typecheck(parse(CALLER))
+    # Whitespace is part of the text, and lines moving are not
+    edited = CALLER.replace('return m + m;', '\n\nreturn m  +  m;')
+    checker.typecheck(parse(edited))
+    assert checker.rechecked == ['twice']
+    assert checker.reused == ['fact']
+
+def test_incremental_rechecks_callers_of_changed_signature():
+    checker = IncrementalTypeChecker()
+    checker.typecheck(parse(CALLER))
+    edited = CALLER.replace('int n) {\n    int r', 'int n, int unused) {\n    int r')
+    edited = edited.replace('fact(n - 1)', 'fact(n - 1, 0)').replace('fact(n)', 'fact(n, 0)')
+    checker.typecheck(parse(edited))
+    assert checker.rechecked == ['fact', 'twice']
+
+def test_incremental_cache_file(tmp_path):
+    path = str(tmp_path / 'cache')
+    checker = IncrementalTypeChecker()
+    checker.load(path)
+    checker.typecheck(parse(CALLER))
+    checker.save(path)
+
+    checker = IncrementalTypeChecker()
+    checker.load(path)
+    root = parse(CALLER)
+    checker.typecheck(root)
+    assert checker.reused == ['fact', 'twice']
+    assert root.statements.stmt_lst[1].body.stmt_lst[0].ty is ast.get_type('int')
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_method_declared_later_is_undefined(jobs):
+    with pytest.raises(ParseError):
+        TypeChecker(jobs=jobs).typecheck(parse(FORWARD_CALL))
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_method_redeclared(jobs):
+    with pytest.raises(ParseError):
+        TypeChecker(jobs=jobs).typecheck(parse(REDECLARED))
+
+def test_declarations_keep_the_line_of_their_type():
+    root = parse("public\nint f(int\n a) {\n    int\n    x = a;\n    return x;\n}\n")
+    method = root.statements.stmt_lst[0]
+    assert method.type_coord == 2
+    assert method.params[0].type_coord == 2
+    assert method.body.stmt_lst[0].type_coord == 4
+
+def test_eq_type_rejects_non_types():
+    with pytest.raises(ParseError):
+        TypeChecker().eq_type('int', ast.get_type('int'))
+
+def test_redeclared_method_reported_once():
+    checker = TypeChecker(max_errors=10)
+    checker.typecheck(parse(REDECLARED))
+    assert [d.kind for d in checker.diagnostics] == ['redeclared-method']
@@ -4,7 +4,16 @@ import argparse
 from tinyJavaParser import TinyJavaParser
 from tinyJavaSymbolTable import SymbolTable
 from tinyJavaTypeChecker import TypeChecker
+from tinyJavaIncremental import IncrementalTypeChecker
+from tinyJavaResolver import Resolver
 from tinyJavaIRGen import IRGen
+from tinyJavaIR import print_ir
+from tinyJavaCFG import CFG, DUMPS
+from tinyJavaSSA import to_ssa
+from tinyJavaVM import VM, VMError, format_value
+from tinyJavaExec import ClosureCompiler, ExecError, global_values
+from tinyJavaPassManager import PassManager, optimization_passes, InlinePass, LVNPass, FoldPass, \
+    SCCPPass, DCEPass, PeepholePass, RegAllocPass
 
 import tinyJavaAST as ast
 
@@ -21,7 +30,28 @@ if __name__ == "__main__":
     argparser.add_argument('-p', '--parse-only', action='store_true', help="Stop after scanning and parsing the input")
     argparser.add_argument('-t', '--typecheck-only', action='store_true', help="Stop after typechecking")
     argparser.add_argument('-v', '--verbose', action='store_true', help="Provides additional output")
+    argparser.add_argument('-j', '--jobs', type=int, default=1, help="Typecheck method bodies using this many processes")
+    argparser.add_argument('--typecheck-cache', metavar='FILE', help="Only recheck the methods which changed since the run which saved FILE, then save the results of this run to FILE")
+    argparser.add_argument('--max-errors', type=int, metavar='N', help="Report up to N type errors instead of stopping at the first one")
+    argparser.add_argument('--check-annotations', action='store_true', help="Assert that the IR is only generated from a fully typechecked tree")
+    argparser.add_argument('-O', dest='opt_level', type=int, choices=[0, 1, 2], default=0, help="Optimization level: -O1 folds constants and removes dead code, -O2 also inlines, fuses branches, numbers values and propagates constants through SSA")
+    argparser.add_argument('--time-passes', action='store_true', help="Report the time spent in each optimization pass and analysis, and how it changed the IR size")
+    argparser.add_argument('--fuse-branches', action='store_true', help="Compile the comparisons in if conditions into ifEQ/ifNE jumps")
+    argparser.add_argument('--inline', type=int, metavar='N', help="Inline the calls to non-recursive methods of at most N instructions")
+    argparser.add_argument('--lvn', action='store_true', help="Reuse the values already computed in a basic block (local value numbering)")
+    argparser.add_argument('--fold', action='store_true', help="Fold constant expressions and simplify trivial ones in the IR")
+    argparser.add_argument('--sccp', action='store_true', help="Propagate constants and remove unreachable code through SSA form")
+    argparser.add_argument('--dump-ssa', action='store_true', help="Print the optimized IR in SSA form instead of the IR")
+    argparser.add_argument('--dce', action='store_true', help="Remove dead assignments, unreachable blocks and methods never called")
+    argparser.add_argument('--peephole', action='store_true', help="Clean up the jumps and labels of the IR")
+    argparser.add_argument('--registers', type=int, metavar='N', help="Allocate the temporaries onto N registers and spill slots")
+    argparser.add_argument('--dump-cfg', choices=sorted(DUMPS), help="Print the control-flow graph of the IR in this format instead of the IR")
+    argparser.add_argument('--run', action='store_true', help="Execute the IR and print the final value of the global variables instead of the IR")
+    argparser.add_argument('--exec', action='store_true', help="Compile the AST into Python closures and run it, printing the final value of the global variables")
+    argparser.add_argument('--hash-cons', action='store_true', help="Share structurally identical pure expressions in the AST")
     args = argparser.parse_args()
+    if args.typecheck_cache is not None and args.jobs > 1:
+        argparser.error("--typecheck-cache checks methods one at a time, it cannot be used with --jobs")
 
     # Prints additional output if the flag is set
     if args.verbose:
@@ -35,7 +65,7 @@ if __name__ == "__main__":
         print("* Scanning and Parsing...")
 
     # Build and runs the parser to get AST
-    parser = TinyJavaParser()
+    parser = TinyJavaParser(hash_cons=args.hash_cons)
     root = parser.parse(data)
 
     # If user asks to quit after parsing, do so.
@@ -45,12 +75,109 @@ if __name__ == "__main__":
     if args.verbose:
         print("* Typechecking...")
 
-    typechecker = TypeChecker()
-    typechecker.typecheck(root)
+    # With a cache, methods unchanged since the last run are not checked
+    # again (see IncrementalTypeChecker)
+    if args.typecheck_cache is not None:
+        typechecker = IncrementalTypeChecker(max_errors=args.max_errors)
+        typechecker.load(args.typecheck_cache)
+        typechecker.typecheck(root)
+        typechecker.save(args.typecheck_cache)
+        if args.verbose:
+            print("* Rechecked %d method(s), reused %d" % (len(typechecker.rechecked), len(typechecker.reused)))
+    else:
+        typechecker = TypeChecker(jobs=args.jobs, max_errors=args.max_errors)
+        typechecker.typecheck(root)
+
+    # Report every error collected at once, if asked to collect them
+    if typechecker.diagnostics:
+        for diagnostic in typechecker.diagnostics:
+            print(diagnostic)
+        if typechecker.truncated:
+            print("* Stopped after %d errors" % len(typechecker.diagnostics))
+        quit(1)
+
+    if args.typecheck_only:
+        quit()
+
+    if args.verbose:
+        print("* Resolving identifiers...")
+
+    # Annotate identifiers with their frame slots for the later phases
+    resolver = Resolver()
+    resolver.resolve(root)
+
+    if args.exec:
+        if args.verbose:
+            print("* Executing...")
+        try:
+            compiler = ClosureCompiler()
+            compiler.run(root)
+        except ExecError as e:
+            print("Runtime error: " + str(e))
+            quit(1)
+        for name, value in sorted(global_values(root, compiler.globals).items()):
+            print("%s = %s" % (name, format_value(value)))
+        quit()
 
     if args.verbose:
         print("* Generating IR...")
 
-    ir_generator = IRGen()
+    ir_generator = IRGen(require_annotations=args.check_annotations,
+                         fuse_branches=args.fuse_branches or args.opt_level >= 2)
     ir_generator.generate(root)
+
+    manager = PassManager()
+    for item in optimization_passes(args.opt_level):
+        manager.add(item)
+    if args.inline is not None:
+        manager.add(InlinePass(args.inline))
+    if args.lvn:
+        manager.add(LVNPass())
+    if args.fold:
+        manager.add(FoldPass())
+    if args.sccp:
+        manager.add(SCCPPass())
+    if args.dce:
+        manager.add(DCEPass())
+    if args.peephole:
+        manager.add(PeepholePass())
+    if args.registers is not None:
+        allocation = RegAllocPass(args.registers)
+        manager.add(allocation)
+
+    if manager:
+        if args.verbose:
+            print("* Optimizing...")
+        ir_generator.IR_lst = manager.run(ir_generator.IR_lst)
+        if args.verbose or args.time_passes:
+            manager.report()
+        if args.verbose and args.registers is not None:
+            for report in allocation.reports:
+                print("* " + str(report))
+
+    if args.dump_ssa:
+        cfg = CFG(ir_generator.IR_lst)
+        to_ssa(cfg)
+        print_ir(cfg.linearize())
+        quit()
+
+    if args.dump_cfg:
+        DUMPS[args.dump_cfg](CFG(ir_generator.IR_lst))
+        quit()
+
+    if args.run:
+        try:
+            vm = VM(ir_generator.IR_lst)
+            vm.run(profile=args.verbose)
+        except VMError as e:
+            print("Runtime error: " + str(e))
+            quit(1)
+        for name, value in sorted(vm.globals_by_name().items()):
+            print("%s = %s" % (name, format_value(value)))
+        if args.verbose:
+            print("* Executed %d instructions in %.3fs" % (vm.steps, vm.elapsed))
+            for function in vm.functions[1:]:
+                print("* %s: %d calls" % (function.name, function.calls))
+        quit()
+
     ir_generator.print_ir()
@@ -24,6 +24,28 @@ class Node(object):
     # Set of attributes for a given node
     attr_names = ()
 
+    # Structural hash, only set on nodes built through a HashConsTable
+    shash = None
+
+    # Annotations left by the TypeChecker: 'ty' is the type of expressions
+    # and declarations, 'decl' is the node declaring the variable (or the
+    # method) referred to by Constant('id'), AssignStmt and FuncCall
+    ty = None
+    decl = None
+
+    # Line of the type written in a declaration (DeclStmt, Formal and the
+    # return type of MethodDecl). Type nodes are shared by every use of the
+    # type (see get_type), so they carry no line of their own.
+    type_coord = None
+
+    # Left by the parser for the incremental type checker: 'source' is the
+    # text a Program was parsed from, 'span' the (start, end) offsets of the
+    # text of a MethodDecl in it, and 'nested' the MethodDecls nested in its
+    # body, in the order the type checker declares them
+    source = None
+    span = None
+    nested = ()
+
 class AssignStmt(Node):
     def __init__(self, name, expr, coord=None):
         self.name = name
@@ -57,7 +79,7 @@ class BinOp(Node):
 
 class Constant(Node):
     def __init__(self, type, value, coord=None):
-        self.type = Type(type)
+        self.type = get_type(type)
         self.value = value
         self.coord = coord
 
@@ -118,6 +140,7 @@ class IfStmt(Node):
         self.cond = cond
         self.true_body = true_body
         self.false_body = false_body
+        self.coord = coord
 
     def children(self):
         nodelist = []
@@ -144,7 +167,7 @@ class MethodDecl(Node):
         nodelist = []
         if self.ret_type is not None:
             nodelist.append(('ret_type', self.ret_type))
-        for i, param in enumerate(params or []):
+        for i, param in enumerate(self.params or []):
             nodelist.append(('param[%d]' % i, param))
         if self.body is not None:
             nodelist.append(('body', self.body))
@@ -200,4 +223,71 @@ class Type(Node):
         nodelist = []
         return tuple(nodelist)
 
+    def __reduce__(self):
+        # Copies and unpickled types must resolve back to the canonical
+        # object, otherwise identity comparison breaks
+        return (get_type, (self.name, ))
+
     attr_names = ('name', )
+
+# Registry of canonical Type nodes, keyed by the name of the type
+_type_registry = dict()
+
+def get_type(name):
+    """
+    Return the canonical Type node for the type named 'name', creating it
+    on first use. There is exactly one Type object per type name (class
+    types included), so two types are equal if and only if they are the
+    same object.
+    Canonical types have no coord, the line a type is written on is kept in
+    'type_coord' of the declaration using it.
+    """
+    t = _type_registry.get(name)
+    if t is None:
+        t = _type_registry[name] = Type(name)
+    return t
+
+class HashConsTable(object):
+    """
+    Builds pure expression nodes (Constant and BinOp trees without any
+    FuncCall) such that structurally identical subtrees of one statement
+    share one node. Every node built here carries its structural hash in
+    'shash', so two hash-consed nodes of the same statement are
+    structurally equal exactly when they are the same object.
+
+    Subtrees are only shared within a single statement, as later phases
+    annotate the nodes with scope dependent information (type, binding)
+    which is only the same for every occurrence within one statement, and
+    IRGen only reuses the value of a subtree within the statement
+    computing it. Constants on different lines are never shared, so that
+    every node keeps the line it was written on. The parser calls
+    end_statement once each statement has been reduced.
+    """
+
+    def __init__(self):
+        self.table = dict()
+
+    def end_statement(self):
+        self.table.clear()
+
+    def constant(self, type, value, coord=None):
+        key = ('Constant', type, value, coord)
+        node = self.table.get(key)
+        if node is None:
+            node = self.table[key] = Constant(type, value, coord)
+            node.shash = hash(('Constant', type, value))
+        return node
+
+    def binop(self, op, left, right, coord=None):
+        # Anything with a non hash-consed operand (i.e. a FuncCall) is
+        # not a pure expression, so it is built as a regular node
+        if left.shash is None or right.shash is None:
+            return BinOp(op, left, right, coord)
+
+        # The operands already tell apart the lines the subtree is on
+        key = ('BinOp', op, left, right)
+        node = self.table.get(key)
+        if node is None:
+            node = self.table[key] = BinOp(op, left, right, coord)
+            node.shash = hash(('BinOp', op, left.shash, right.shash))
+        return node
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+import sys
+from tinyJavaIR import Op, JUMP_OPS, format_instr
+
+class BasicBlock(object):
+    """
+    A maximal run of instructions which is entered at its first instruction
+    and left after its last one.
+
+        id: number of the block, unique within the CFG
+        start: index of its first instruction in the flat instruction list
+        instrs: instructions of the block
+        preds, succs: predecessor and successor blocks
+        idom: immediate dominator, None for the entry block and for the
+              blocks which cannot be reached
+        dom_children: blocks immediately dominated by this one
+        rpo: position of the block in reverse post-order, or None if it
+             cannot be reached
+    """
+
+    __slots__ = ('id', 'start', 'instrs', 'preds', 'succs', 'idom', 'dom_children', 'rpo')
+
+    def __init__(self, id, start):
+        self.id = id
+        self.start = start
+        self.instrs = []
+        self.preds = []
+        self.succs = []
+        self.idom = None
+        self.dom_children = []
+        self.rpo = None
+
+    @property
+    def name(self):
+        return 'B%d' % self.id
+
+    def __repr__(self):
+        return 'BasicBlock(%s)' % self.name
+
+class Function(object):
+    """
+    Blocks of one unit of code: the body of a method, from its label up to
+    its EndFunc, or the top-level code of the program (name is None). The
+    first block is the entry block.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.blocks = []
+        self.rpo = []
+
+    @property
+    def entry(self):
+        return self.blocks[0]
+
+    def compute_rpo(self):
+        """
+        Number the blocks reachable from the entry in reverse post-order
+        """
+        for block in self.blocks:
+            block.rpo = None
+        order = []
+        visited = set([self.entry.id])
+        stack = [(self.entry, iter(self.entry.succs))]
+        while stack:
+            block, succs = stack[-1]
+            for succ in succs:
+                if succ.id not in visited:
+                    visited.add(succ.id)
+                    stack.append((succ, iter(succ.succs)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+        order.reverse()
+        for i, block in enumerate(order):
+            block.rpo = i
+        self.rpo = order
+        return order
+
+    def compute_dominators(self):
+        """
+        Compute the dominator tree with the iterative algorithm of Cooper,
+        Harvey and Kennedy ("A Simple, Fast Dominance Algorithm")
+        """
+        order = self.compute_rpo()
+        for block in self.blocks:
+            block.idom = None
+            block.dom_children = []
+        entry = self.entry
+        entry.idom = entry
+
+        def intersect(b1, b2):
+            while b1 is not b2:
+                while b1.rpo > b2.rpo:
+                    b1 = b1.idom
+                while b2.rpo > b1.rpo:
+                    b2 = b2.idom
+            return b1
+
+        changed = True
+        while changed:
+            changed = False
+            for block in order[1:]:
+                new_idom = None
+                for pred in block.preds:
+                    if pred.idom is None:
+                        continue
+                    new_idom = pred if new_idom is None else intersect(pred, new_idom)
+                if block.idom is not new_idom:
+                    block.idom = new_idom
+                    changed = True
+
+        entry.idom = None
+        for block in order[1:]:
+            block.idom.dom_children.append(block)
+
+    def dominates(self, a, b):
+        """
+        Return whether block 'a' dominates block 'b'
+        """
+        while b is not None:
+            if b is a:
+                return True
+            b = b.idom
+        return False
+
+class CFG(object):
+    """
+    Control-flow graph of a list of IR instructions, with one Function per
+    method and one for the top-level code. Method bodies are laid out
+    inline in the instruction list, between their label and their EndFunc,
+    and may be nested; each of them gets its own Function all the same.
+
+    Blocks keep the index of their first instruction, so linearize gives
+    the instructions back in their original order, including any changes
+    made to the blocks. The dominator trees are only left out when
+    'dominators' is false; the reverse post-order is always computed.
+    """
+
+    def __init__(self, instrs, dominators=True):
+        self.functions = []
+        self.blocks = []
+        self.build(instrs)
+        for function in self.functions:
+            if dominators:
+                function.compute_dominators()
+            else:
+                function.compute_rpo()
+
+    ################################
+    ## Construction
+    ################################
+
+    def new_block(self, function, start):
+        block = BasicBlock(len(self.blocks), start)
+        self.blocks.append(block)
+        function.blocks.append(block)
+        return block
+
+    def build(self, instrs):
+        main = Function(None)
+        self.functions.append(main)
+
+        # Functions being built, innermost last, and the block each of them
+        # is filling (None after a jump, until the next instruction)
+        stack = [main]
+        current = {main: None}
+        labels = {main: dict()}
+
+        for i, instr in enumerate(instrs):
+            op = instr.op
+            if op == Op.LABEL and i + 1 < len(instrs) and instrs[i + 1].op == Op.BEGINFUNC:
+                # The enclosing code resumes in a new block after the method
+                current[stack[-1]] = None
+                function = Function(instr.target.value)
+                self.functions.append(function)
+                stack.append(function)
+                current[function] = None
+                labels[function] = dict()
+
+            function = stack[-1]
+            block = current[function]
+            if block is None or op == Op.LABEL:
+                if block is None or block.instrs:
+                    block = self.new_block(function, i)
+                    current[function] = block
+            if op == Op.LABEL:
+                labels[function][instr.target] = block
+            block.instrs.append(instr)
+
+            if op in JUMP_OPS:
+                current[function] = None
+            elif op == Op.ENDFUNC:
+                stack.pop()
+
+        if not main.blocks:
+            self.new_block(main, len(instrs))
+
+        for function in self.functions:
+            self.link(function, labels[function])
+
+    def link(self, function, labels):
+        """
+        Add the edges between the blocks of 'function'
+        """
+        blocks = function.blocks
+        for i, block in enumerate(blocks):
+            last = block.instrs[-1] if block.instrs else None
+            succs = []
+            if last is not None and last.op in JUMP_OPS:
+                succs.append(labels[last.target])
+            if last is None or last.op not in (Op.GOTO, Op.ENDFUNC):
+                if i + 1 < len(blocks):
+                    succs.append(blocks[i + 1])
+            for succ in succs:
+                if succ not in block.succs:
+                    block.succs.append(succ)
+                    succ.preds.append(block)
+
+    def linearize(self):
+        """
+        Return the instructions of all blocks, in their original order
+        """
+        instrs = []
+        for block in sorted(self.blocks, key=lambda b: b.start):
+            instrs.extend(block.instrs)
+        return instrs
+
+    ################################
+    ## Dumps
+    ################################
+
+    def dump_text(self, out=None):
+        if out is None:
+            out = sys.stdout
+        lines = []
+        for function in self.functions:
+            lines.append('function %s:' % (function.name or '<main>'))
+            for block in function.blocks:
+                idom = block.idom.name if block.idom is not None else '-'
+                lines.append('  %s: preds [%s] succs [%s] idom %s' % (
+                    block.name,
+                    ', '.join(b.name for b in block.preds),
+                    ', '.join(b.name for b in block.succs),
+                    idom))
+                for instr in block.instrs:
+                    lines.append('  ' + format_instr(instr))
+        out.write('\n'.join(lines) + '\n')
+
+    def dump_dot(self, out=None, dominators=False):
+        """
+        Write the CFG in Graphviz DOT format, along with the dominator tree
+        edges (dashed) if 'dominators' is set
+        """
+        if out is None:
+            out = sys.stdout
+        lines = ['digraph CFG {', '  node [shape=box, fontname="monospace"];']
+        for i, function in enumerate(self.functions):
+            lines.append('  subgraph cluster_%d {' % i)
+            lines.append('    label="%s";' % (function.name or '<main>'))
+            for block in function.blocks:
+                text = [block.name + ':'] + [format_instr(instr).strip() for instr in block.instrs]
+                label = ''.join(t.replace('\\', '\\\\').replace('"', '\\"') + '\\l' for t in text)
+                lines.append('    %s [label="%s"];' % (block.name, label))
+            lines.append('  }')
+        for block in self.blocks:
+            for succ in block.succs:
+                lines.append('  %s -> %s;' % (block.name, succ.name))
+            if dominators and block.idom is not None:
+                lines.append('  %s -> %s [style=dashed, color=gray];' % (block.idom.name, block.name))
+        lines.append('}')
+        out.write('\n'.join(lines) + '\n')
+
+# Dump format names, as accepted by tinyJava.py --dump-cfg. Both formats
+# show the dominator tree along with the CFG.
+DUMPS = {
+    'text': CFG.dump_text,
+    'dot': lambda cfg, out=None: cfg.dump_dot(out, dominators=True),
+}
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+from tinyJavaIR import Op, Kind, JUMP_OPS
+from tinyJavaCFG import CFG
+from tinyJavaLiveness import Liveness
+from tinyJavaPeephole import is_function_label
+
+# Instructions with no effect besides writing their destination
+PURE_OPS = (Op.COPY, Op.BINOP, Op.GETRET)
+
+def may_throw(instr):
+    """
+    Return whether 'instr' may fail at run time, and so has to run even if
+    its result is never read: a division by anything but a non-zero
+    constant
+    """
+    return instr.op == Op.BINOP and instr.opr == '/' and \
+        not (instr.b.kind == Kind.CONST and instr.b.value != 0)
+
+class DeadCodeElimination(object):
+    """
+    Removes the code which has no effect on the result of the program:
+
+        - blocks which control never reaches
+        - assignments to temporaries and variables which are not live
+          afterwards; calls are kept even if their value is not used, as
+          are divisions which may fail
+        - methods which are never called from the top-level code, directly
+          or through other methods, along with the goto jumping over them
+
+    Removing an assignment may make the assignments to its operands dead,
+    so the second step is repeated until nothing changes. Liveness keeps the
+    variables declared at the top level live at the end of the program,
+    since their final values are its result.
+
+        dce = DeadCodeElimination()
+        instrs = dce.optimize(instrs)
+        dce.removed   # number of instructions removed
+        dce.methods   # names of the methods removed
+    """
+
+    def __init__(self):
+        self.removed = 0
+        self.methods = []
+
+    def optimize(self, instrs, cfg=None, liveness=None):
+        """
+        Return the instructions left. The CFG of 'instrs' and its Liveness,
+        with the global variables kept live, are built unless given.
+        """
+        before = len(instrs)
+        cfg = cfg or CFG(instrs, dominators=False)
+        self.remove_unreachable(cfg)
+        liveness = liveness or Liveness(cfg, keep_globals=True)
+        while self.remove_dead_stores(cfg, liveness):
+            liveness = Liveness(cfg, keep_globals=True)
+        instrs = self.remove_methods(cfg.linearize())
+        self.removed += before - len(instrs)
+        return instrs
+
+    ################################
+    ## Methods
+    ################################
+
+    def remove_methods(self, instrs):
+        # Span of the code of each method, and the methods each unit calls
+        # (None being the top-level code)
+        spans = dict()
+        calls = {None: set()}
+        stack = [(None, None)]
+        for i, instr in enumerate(instrs):
+            if is_function_label(instrs, i):
+                stack.append((instr.target.value, i))
+                calls[instr.target.value] = set()
+            elif instr.op == Op.CALL:
+                calls[stack[-1][0]].add(instr.target.value)
+            elif instr.op == Op.ENDFUNC:
+                name, start = stack.pop()
+                spans[name] = (start, i)
+
+        called = set()
+        work = [None]
+        while work:
+            for callee in calls.get(work.pop(), ()):
+                if callee not in called:
+                    called.add(callee)
+                    work.append(callee)
+
+        dead = [False] * len(instrs)
+        targets = [i.target for i in instrs if i.op in JUMP_OPS]
+        for name, (start, end) in sorted(spans.items(), key=lambda s: s[1]):
+            if name in called or dead[start]:
+                continue
+            self.methods.append(name)
+            for i in range(start, end + 1):
+                dead[i] = True
+            # IRGen jumps over the code of the method to the label after it
+            if start > 0 and end + 1 < len(instrs) and instrs[start - 1].op == Op.GOTO and \
+                    instrs[end + 1].op == Op.LABEL and \
+                    instrs[start - 1].target == instrs[end + 1].target and \
+                    targets.count(instrs[end + 1].target) == 1:
+                dead[start - 1] = True
+                dead[end + 1] = True
+        return [instr for i, instr in enumerate(instrs) if not dead[i]]
+
+    ################################
+    ## Blocks and assignments
+    ################################
+
+    def remove_unreachable(self, cfg):
+        for function in cfg.functions:
+            for block in function.blocks:
+                if block.rpo is None:
+                    # Keep the end of the method, so that the CFG stays
+                    # well formed
+                    block.instrs = [i for i in block.instrs if i.op == Op.ENDFUNC]
+
+    def remove_dead_stores(self, cfg, liveness):
+        """
+        Remove the assignments whose destination is not live after them.
+        Returns whether any was removed.
+        """
+        changed = False
+        for block in cfg.blocks:
+            live_after = liveness.live_after(block)
+            instrs = []
+            for instr, live in zip(block.instrs, live_after):
+                if instr.op in PURE_OPS and not live & liveness.bit(instr.dst) and \
+                        not may_throw(instr):
+                    changed = True
+                    continue
+                instrs.append(instr)
+            block.instrs = instrs
+        return changed
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+import sys
+import tinyJavaAST as ast
+
+# Python recursion limit needed by deeply recursive tinyJava programs,
+# since every tinyJava call is a few nested Python calls
+RECURSION_LIMIT = 200000
+
+class ExecError(Exception):
+    """
+    Raised when the program fails at run time
+    """
+    pass
+
+def divide(left, right):
+    """
+    Java int division: truncates towards zero, and throws on division by
+    zero
+    """
+    if right == 0:
+        raise ExecError("Division by zero")
+    q = abs(left) // abs(right)
+    if (left < 0) != (right < 0):
+        q = -q
+    return ((q + 0x80000000) & 0xffffffff) - 0x80000000
+
+def constant_value(node):
+    if node.type is ast.get_type('boolean'):
+        return node.value == 'true'
+    return node.value
+
+def global_values(root, frame):
+    """
+    Return the value in 'frame' of every variable declared at the top level
+    of the Program 'root', by name
+    """
+    values = dict()
+    stmts = root.statements.stmt_lst if root.statements is not None else None
+    for stmt in stmts or []:
+        if isinstance(stmt, ast.DeclStmt):
+            values[stmt.name] = frame[stmt.binding.slot]
+    return values
+
+def run_guarded(body, frame):
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+    try:
+        body(frame)
+    except RecursionError:
+        raise ExecError("Stack overflow")
+    except IndexError:
+        # A nested method used a variable of its enclosing method while no
+        # frame of that method is active
+        raise ExecError("Variable of a method used while that method is not running")
+    except TypeError:
+        raise ExecError("Use of an uninitialized variable")
+    finally:
+        sys.setrecursionlimit(limit)
+
+################################
+## Tree-walking evaluation
+################################
+
+class Evaluator(object):
+    """
+    Executes a resolved AST by walking it, dispatching on the class of
+    every node it visits, the same way TypeChecker does. Variables live in
+    the frames laid out by the Resolver: 'frames' maps every MethodDecl
+    (None for the top-level code) to the stack of its active frames, the
+    innermost one last.
+
+        evaluator = Evaluator()
+        evaluator.run(root)
+        global_values(root, evaluator.globals)
+    """
+
+    def __init__(self):
+        self.frames = dict()
+        self.globals = None
+
+    def run(self, root):
+        self.globals = [None] * root.frame_size
+        self.frames = {None: [self.globals]}
+        run_guarded(self.evaluate, root)
+        return self.globals
+
+    def evaluate(self, node):
+        method = 'eval_' + node.__class__.__name__
+        return getattr(self, method, self.generic_eval)(node)
+
+    def generic_eval(self, node):
+        raise ExecError("Cannot evaluate %s" % node.__class__.__name__)
+
+    def frame(self, binding):
+        return self.frames[binding.frame][-1]
+
+    def eval_AssignStmt(self, node):
+        self.frame(node.binding)[node.binding.slot] = self.evaluate(node.expr)
+
+    def eval_BinOp(self, node):
+        left = self.evaluate(node.left)
+        right = self.evaluate(node.right)
+        op = node.op
+        if op == '+':
+            value = left + right
+        elif op == '-':
+            value = left - right
+        elif op == '*':
+            value = left * right
+        elif op == '/':
+            return divide(left, right)
+        elif op == '==':
+            return left == right
+        else:
+            return left != right
+        return ((value + 0x80000000) & 0xffffffff) - 0x80000000
+
+    def eval_Constant(self, node):
+        if node.type is ast.get_type('id'):
+            return self.frame(node.binding)[node.binding.slot]
+        return constant_value(node)
+
+    def eval_DeclStmt(self, node):
+        if node.expr is not None:
+            self.frame(node.binding)[node.binding.slot] = self.evaluate(node.expr)
+
+    def eval_FuncCall(self, node):
+        method = node.decl
+        frame = [None] * method.frame_size
+        for i, arg in enumerate(node.args or []):
+            frame[i] = self.evaluate(arg)
+        stack = self.frames.setdefault(method, [])
+        stack.append(frame)
+        try:
+            if method.body is not None:
+                self.evaluate(method.body)
+            return self.evaluate(method.ret_stmt)
+        finally:
+            stack.pop()
+
+    def eval_IfStmt(self, node):
+        if self.evaluate(node.cond):
+            if node.true_body is not None:
+                self.evaluate(node.true_body)
+        elif node.false_body is not None:
+            self.evaluate(node.false_body)
+
+    def eval_MethodDecl(self, node):
+        # Methods only run when called
+        pass
+
+    def eval_Program(self, node):
+        if node.statements is not None:
+            self.evaluate(node.statements)
+
+    def eval_RetStmt(self, node):
+        return self.evaluate(node.expr)
+
+    def eval_StmtList(self, node):
+        for stmt in node.stmt_lst or []:
+            self.evaluate(stmt)
+
+################################
+## Closure compilation
+################################
+
+class ClosureCompiler(object):
+    """
+    Compiles a resolved AST once into nested Python closures, then runs
+    them. Every expression becomes a function of the current frame
+    returning its value, and every statement a function of the current
+    frame run for its effects, so running the program involves no more
+    dispatch on node classes.
+
+    Variables of the method being compiled become direct indexing of the
+    current frame. Global variables index the global frame directly, and
+    the variables of an enclosing method index its innermost active
+    frame, which only the methods whose variables are used that way keep
+    track of. Every method becomes a Python function taking its arguments
+    and returning its value, which call sites call directly.
+
+        compiler = ClosureCompiler()
+        compiler.run(root)
+        global_values(root, compiler.globals)
+    """
+
+    def __init__(self):
+        # MethodDecl being compiled, None for the top-level code
+        self.method = None
+        self.globals = []
+        # Stack of active frames of the methods enclosing others which use
+        # their variables
+        self.frames = dict()
+        # One-element list holding the function of each method, filled
+        # once the method is compiled
+        self.functions = dict()
+
+    def run(self, root):
+        body = self.compile(root)
+        self.globals[:] = [None] * root.frame_size
+        for stack in self.frames.values():
+            del stack[:]
+        run_guarded(body, self.globals)
+        return self.globals
+
+    def compile(self, node):
+        method = 'compile_' + node.__class__.__name__
+        return getattr(self, method, self.generic_compile)(node)
+
+    def generic_compile(self, node):
+        raise ExecError("Cannot compile %s" % node.__class__.__name__)
+
+    ################################
+    ## Helper functions
+    ################################
+
+    def function_cell(self, method):
+        return self.functions.setdefault(method, [None])
+
+    def load(self, binding):
+        slot = binding.slot
+        if binding.frame is self.method:
+            return lambda frame: frame[slot]
+        if binding.frame is None:
+            glob = self.globals
+            return lambda frame: glob[slot]
+        stack = self.frames.setdefault(binding.frame, [])
+        return lambda frame: stack[-1][slot]
+
+    def store(self, binding, expr):
+        slot = binding.slot
+        if binding.frame is self.method:
+            def run(frame):
+                frame[slot] = expr(frame)
+        elif binding.frame is None:
+            glob = self.globals
+            def run(frame):
+                glob[slot] = expr(frame)
+        else:
+            stack = self.frames.setdefault(binding.frame, [])
+            def run(frame):
+                stack[-1][slot] = expr(frame)
+        return run
+
+    ################################
+    ## Expressions
+    ################################
+
+    def compile_BinOp(self, node):
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        op = node.op
+        if op == '+':
+            return lambda frame: ((left(frame) + right(frame) + 0x80000000) & 0xffffffff) - 0x80000000
+        if op == '-':
+            return lambda frame: ((left(frame) - right(frame) + 0x80000000) & 0xffffffff) - 0x80000000
+        if op == '*':
+            return lambda frame: ((left(frame) * right(frame) + 0x80000000) & 0xffffffff) - 0x80000000
+        if op == '/':
+            return lambda frame: divide(left(frame), right(frame))
+        if op == '==':
+            return lambda frame: left(frame) == right(frame)
+        return lambda frame: left(frame) != right(frame)
+
+    def compile_Constant(self, node):
+        if node.type is ast.get_type('id'):
+            return self.load(node.binding)
+        value = constant_value(node)
+        return lambda frame: value
+
+    def compile_FuncCall(self, node):
+        if node.decl is None:
+            raise ExecError("Call to unresolved method \"%s\"" % node.name)
+        cell = self.function_cell(node.decl)
+        args = tuple(self.compile(arg) for arg in node.args or [])
+        if not args:
+            return lambda frame: cell[0](())
+        if len(args) == 1:
+            arg = args[0]
+            return lambda frame: cell[0]((arg(frame), ))
+        return lambda frame: cell[0]([arg(frame) for arg in args])
+
+    ################################
+    ## Statements
+    ################################
+
+    def compile_AssignStmt(self, node):
+        return self.store(node.binding, self.compile(node.expr))
+
+    def compile_DeclStmt(self, node):
+        if node.expr is None:
+            return None
+        return self.store(node.binding, self.compile(node.expr))
+
+    def compile_IfStmt(self, node):
+        cond = self.compile(node.cond)
+        true_body = self.compile(node.true_body) if node.true_body is not None else lambda frame: None
+        false_body = self.compile(node.false_body) if node.false_body is not None else None
+        if false_body is None:
+            def run(frame):
+                if cond(frame):
+                    true_body(frame)
+        else:
+            def run(frame):
+                if cond(frame):
+                    true_body(frame)
+                else:
+                    false_body(frame)
+        return run
+
+    def compile_MethodDecl(self, node):
+        saved = self.method
+        self.method = node
+        body = self.compile(node.body) if node.body is not None else None
+        ret = self.compile(node.ret_stmt)
+        self.method = saved
+
+        template = [None] * node.frame_size
+        params = len(node.params or [])
+        # Known once the body, and so the nested methods, are compiled
+        stack = self.frames.get(node)
+
+        if stack is not None:
+            def function(args):
+                frame = template[:]
+                frame[:params] = args
+                stack.append(frame)
+                try:
+                    if body is not None:
+                        body(frame)
+                    return ret(frame)
+                finally:
+                    stack.pop()
+        elif body is not None:
+            def function(args):
+                frame = template[:]
+                frame[:params] = args
+                body(frame)
+                return ret(frame)
+        else:
+            def function(args):
+                frame = template[:]
+                frame[:params] = args
+                return ret(frame)
+
+        self.function_cell(node)[0] = function
+        # Nothing to run where the method is declared
+        return None
+
+    def compile_Program(self, node):
+        self.method = None
+        if node.statements is None:
+            return lambda frame: None
+        return self.compile(node.statements)
+
+    def compile_RetStmt(self, node):
+        return self.compile(node.expr)
+
+    def compile_StmtList(self, node):
+        stmts = tuple(s for s in (self.compile(stmt) for stmt in node.stmt_lst or [])
+                      if s is not None)
+        if not stmts:
+            return lambda frame: None
+        if len(stmts) == 1:
+            return stmts[0]
+
+        def run(frame):
+            for stmt in stmts:
+                stmt(frame)
+        return run
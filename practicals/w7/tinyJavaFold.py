@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+from tinyJavaIR import Op, Kind, Instr, BRANCH_OPS, JUMP_OPS, branch_taken, const
+
+# Range of the Java int type
+INT_MIN = -(1 << 31)
+INT_MAX = (1 << 31) - 1
+
+def to_int32(value):
+    """
+    Wrap 'value' around to a Java int, the way Java arithmetic overflows
+    """
+    value &= 0xffffffff
+    if value > INT_MAX:
+        value -= 1 << 32
+    return value
+
+def is_const(operand, value=None):
+    if operand is None or operand.kind != Kind.CONST:
+        return False
+    return value is None or operand.value == value
+
+def fold_binop(opr, left, right):
+    """
+    Return the constant operand 'left opr right' evaluates to, or None if
+    it cannot be computed at compile time
+    """
+    l = left.value
+    r = right.value
+    if opr == '==':
+        return const('true' if l == r else 'false')
+    if opr == '!=':
+        return const('true' if l != r else 'false')
+    if opr == '+':
+        return const(to_int32(l + r))
+    if opr == '-':
+        return const(to_int32(l - r))
+    if opr == '*':
+        return const(to_int32(l * r))
+    if opr == '/':
+        # Division by zero throws at run time, so it is left as it is
+        if r == 0:
+            return None
+        # Java truncates towards zero
+        q = abs(l) // abs(r)
+        return const(to_int32(q if (l < 0) == (r < 0) else -q))
+    return None
+
+def simplify_binop(opr, left, right):
+    """
+    Return the operand equivalent to 'left opr right' with at most one
+    non constant operand, or None if there is no simpler form. Operands
+    have no side effects, so they can be dropped freely.
+    """
+    if opr == '+':
+        if is_const(left, 0):
+            return right
+        if is_const(right, 0):
+            return left
+    elif opr == '-':
+        if is_const(right, 0):
+            return left
+        if left == right:
+            return const(0)
+    elif opr == '*':
+        if is_const(left, 1):
+            return right
+        if is_const(right, 1):
+            return left
+        if is_const(left, 0) or is_const(right, 0):
+            return const(0)
+    elif opr == '/':
+        if is_const(right, 1):
+            return left
+    elif opr == '==':
+        if left == right:
+            return const('true')
+        if is_const(left, 'true'):
+            return right
+        if is_const(right, 'true'):
+            return left
+    elif opr == '!=':
+        if left == right:
+            return const('false')
+        if is_const(left, 'false'):
+            return right
+        if is_const(right, 'false'):
+            return left
+    return None
+
+class ConstantFolder(object):
+    """
+    Folds constant expressions and simplifies trivial ones (x * 1, x + 0,
+    x - x, x == x, ...) in a list of IR instructions, with the semantics of
+    Java int and boolean arithmetic. A division by zero is never folded, so
+    it still fails at run time.
+
+    Temporaries whose value becomes known are replaced at their uses, and
+    the instructions computing them are removed, as are the conditional
+    jumps on a constant and the copies of a variable to itself. IRGen uses
+    every temporary within the straight-line code of a single statement
+    only; the copies to the few temporaries which other passes (such as
+    inlining) make live across blocks are always kept.
+
+    Use it as:
+
+        folder = ConstantFolder()
+        instrs = folder.fold(instrs)
+        folder.removed   # number of instructions removed
+    """
+
+    def __init__(self):
+        self.removed = 0
+
+    def fold(self, instrs):
+        # Value of each temporary known so far: a constant, a variable or
+        # another temporary
+        values = dict()
+        out = []
+        for instr in instrs:
+            op = instr.op
+            if op == Op.LABEL or op == Op.BEGINFUNC:
+                values.clear()
+
+            # Replace the temporaries with their known values
+            a = instr.a
+            b = instr.b
+            if a is not None and op != Op.BEGINFUNC:
+                a = values.get(a, a) if a.kind == Kind.TEMP else a
+            if b is not None:
+                b = values.get(b, b) if b.kind == Kind.TEMP else b
+
+            if op == Op.BINOP:
+                value = None
+                if is_const(a) and is_const(b):
+                    value = fold_binop(instr.opr, a, b)
+                if value is None:
+                    value = simplify_binop(instr.opr, a, b)
+                if value is not None:
+                    instr = Instr(Op.COPY, instr.dst, value)
+                    op = Op.COPY
+                    a = value
+                    b = None
+            elif op in BRANCH_OPS and is_const(a) and (b is None or is_const(b)):
+                if not branch_taken(instr, a, b):
+                    continue
+                instr = Instr(Op.GOTO, target=instr.target)
+                op = Op.GOTO
+
+            if op == Op.COPY and a == instr.dst:
+                # Assigning a variable to itself
+                continue
+
+            if a is not instr.a or b is not instr.b:
+                instr = Instr(op, instr.dst, a, b, instr.opr, instr.target)
+
+            # Forget the values which this instruction changes
+            dst = instr.dst
+            if dst is not None:
+                for temp in [t for t, v in values.items() if t == dst or v == dst]:
+                    del values[temp]
+            if op == Op.CALL:
+                # The callee may assign to any global variable
+                for temp in [t for t, v in values.items() if v.kind == Kind.VAR]:
+                    del values[temp]
+
+            if op == Op.COPY and dst.kind == Kind.TEMP:
+                values[dst] = a
+            out.append(instr)
+
+        out = self.remove_dead_temps(out)
+        self.removed += len(instrs) - len(out)
+        return out
+
+    def remove_dead_temps(self, instrs):
+        """
+        Remove the copies to temporaries which are not used before being
+        redefined or before the end of their statement
+        """
+        across = self.temps_across_blocks(instrs)
+        out = []
+        for i, instr in enumerate(instrs):
+            if instr.op == Op.COPY and instr.dst.kind == Kind.TEMP and \
+                    instr.dst not in across and not self.used_after(instrs, i + 1, instr.dst):
+                continue
+            out.append(instr)
+        return out
+
+    def temps_across_blocks(self, instrs):
+        """
+        Return the temporaries read before being written in some straight
+        line of code, which may hold a value coming from another one
+        """
+        across = set()
+        written = set()
+        for instr in instrs:
+            if instr.op in (Op.LABEL, Op.BEGINFUNC, Op.ENDFUNC):
+                written.clear()
+            for operand in instr.uses():
+                if operand.kind == Kind.TEMP and operand not in written:
+                    across.add(operand)
+            for operand in instr.defs():
+                if operand.kind == Kind.TEMP:
+                    written.add(operand)
+            if instr.op in JUMP_OPS:
+                written.clear()
+        return across
+
+    def used_after(self, instrs, start, temp):
+        for instr in instrs[start:]:
+            if instr.op in (Op.LABEL, Op.GOTO, Op.BEGINFUNC, Op.ENDFUNC):
+                return False
+            if instr.op != Op.BEGINFUNC and (instr.a == temp or instr.b == temp):
+                return True
+            if instr.dst == temp or instr.op in BRANCH_OPS:
+                return False
+        return False
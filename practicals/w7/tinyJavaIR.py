@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import sys
+from enum import IntEnum
+
+class Op(IntEnum):
+    """
+    Opcodes of the IR instructions, with the fields each one uses and the
+    3AC text it is printed as:
+
+        COPY        dst := a
+        BINOP       dst := a opr b
+        LABEL       target:
+        GOTO        goto target
+        IFNOT       if !(a) goto target
+        BEGINFUNC   BeginFunc           (target: function label,
+                                         a: tuple of the parameter operands)
+        ENDFUNC     EndFunc
+        PUSHPARAM   PushParam a
+        CALL        FuncCall target
+        POPPARAMS   PopParams a
+        RETURN      ret := a
+        GETRET      dst := ret
+        PHI         dst := phi(a...)    (a: tuple with one operand per
+                                         predecessor block, SSA form only)
+        IF          if (a) goto target
+        IFEQ        ifEQ a b goto target
+        IFNE        ifNE a b goto target
+    """
+    COPY = 0
+    BINOP = 1
+    LABEL = 2
+    GOTO = 3
+    IFNOT = 4
+    BEGINFUNC = 5
+    ENDFUNC = 6
+    PUSHPARAM = 7
+    CALL = 8
+    POPPARAMS = 9
+    RETURN = 10
+    GETRET = 11
+    PHI = 12
+    IF = 13
+    IFEQ = 14
+    IFNE = 15
+
+# Conditional jumps, and all the jumps
+BRANCH_OPS = (Op.IFNOT, Op.IF, Op.IFEQ, Op.IFNE)
+JUMP_OPS = (Op.GOTO, Op.IFNOT, Op.IF, Op.IFEQ, Op.IFNE)
+
+# Conditional jump taken exactly when another one is not
+INVERSE = {Op.IFNOT: Op.IF, Op.IF: Op.IFNOT, Op.IFEQ: Op.IFNE, Op.IFNE: Op.IFEQ}
+
+def branch_taken(instr, a, b=None):
+    """
+    Return whether the conditional jump 'instr' jumps when its condition
+    is the constant operand 'a', or when it compares the constant operands
+    'a' and 'b'
+    """
+    if instr.op == Op.IFEQ:
+        return a.value == b.value
+    if instr.op == Op.IFNE:
+        return a.value != b.value
+    return (a.value == 'true') == (instr.op == Op.IF)
+
+class Kind(IntEnum):
+    """
+    Kinds of operands:
+
+        TEMP: compiler temporary, value is its number
+        VAR: source variable, value is its name
+        CONST: literal, value is an int or 'true'/'false'
+        LABEL: jump target, value is a label number or a function name
+        REG: register assigned to a temporary, value is its number
+        SPILL: frame slot of a temporary which did not get a register,
+               value is its number
+    """
+    TEMP = 0
+    VAR = 1
+    CONST = 2
+    LABEL = 3
+    REG = 4
+    SPILL = 5
+
+# Kinds of operands which hold a value that can change
+STORAGE_KINDS = (Kind.TEMP, Kind.VAR, Kind.REG, Kind.SPILL)
+
+class Operand(object):
+    """
+    Operand of an instruction. Variables also carry the Binding given to
+    them by the Resolver, if it ran, so that two variables are the same
+    operand only if they refer to the same declaration. Temporaries and
+    variables get a version number in SSA form.
+    """
+
+    __slots__ = ('kind', 'value', 'binding', 'version', 'ident')
+
+    def __init__(self, kind, value, binding=None, version=None):
+        self.kind = kind
+        self.value = value
+        self.binding = binding
+        self.version = version
+        # What the operand is compared and hashed by
+        if kind == Kind.VAR and binding is not None:
+            self.ident = (int(kind), binding, version)
+        else:
+            self.ident = (int(kind), value, version)
+
+    def base(self):
+        """
+        Return the identity of the operand regardless of its version
+        """
+        return self.ident[:2]
+
+    def with_version(self, version):
+        return Operand(self.kind, self.value, self.binding, version)
+
+    def __eq__(self, other):
+        return isinstance(other, Operand) and self.ident == other.ident
+
+    def __hash__(self):
+        return hash(self.ident)
+
+    def __str__(self):
+        if self.version is not None:
+            return '%s.%d' % (self.with_version(None), self.version)
+        if self.kind == Kind.TEMP:
+            return '_t%d' % self.value
+        if self.kind == Kind.LABEL:
+            return '_L%s' % self.value
+        if self.kind == Kind.REG:
+            return '_r%d' % self.value
+        if self.kind == Kind.SPILL:
+            return '_s%d' % self.value
+        return str(self.value)
+
+    def __repr__(self):
+        return 'Operand(%s, %r)' % (self.kind.name, self.value)
+
+def temp(number):
+    return Operand(Kind.TEMP, number)
+
+def var(name, binding=None):
+    return Operand(Kind.VAR, name, binding)
+
+def const(value):
+    return Operand(Kind.CONST, value)
+
+def label(name):
+    return Operand(Kind.LABEL, name)
+
+def reg(number):
+    return Operand(Kind.REG, number)
+
+def spill(number):
+    return Operand(Kind.SPILL, number)
+
+class Instr(object):
+    """
+    A single IR instruction. Which of the fields are used depends on the
+    opcode (see Op), the others are None.
+    """
+
+    __slots__ = ('op', 'dst', 'a', 'b', 'opr', 'target')
+
+    def __init__(self, op, dst=None, a=None, b=None, opr=None, target=None):
+        self.op = op
+        self.dst = dst
+        self.a = a
+        self.b = b
+        self.opr = opr
+        self.target = target
+
+    def __str__(self):
+        return format_instr(self)
+
+    def __repr__(self):
+        return 'Instr(%s)' % format_instr(self).strip()
+
+    def uses(self):
+        """
+        Return the temporaries and variables read by the instruction
+        """
+        op = self.op
+        if op in (Op.BINOP, Op.IFEQ, Op.IFNE):
+            operands = (self.a, self.b)
+        elif op in (Op.COPY, Op.IFNOT, Op.IF, Op.PUSHPARAM, Op.RETURN):
+            operands = (self.a, )
+        elif op == Op.PHI:
+            operands = self.a
+        else:
+            return []
+        return [o for o in operands if o.kind in STORAGE_KINDS]
+
+    def defs(self):
+        """
+        Return the temporaries and variables written by the instruction
+        """
+        op = self.op
+        if op in (Op.COPY, Op.BINOP, Op.GETRET, Op.PHI):
+            return [self.dst]
+        if op == Op.BEGINFUNC:
+            return list(self.a or ())
+        return []
+
+################################
+## Printing
+################################
+
+def format_instr(instr):
+    """
+    Return the 3AC text of 'instr', indented the way IRGen prints it
+    """
+    op = instr.op
+    if op == Op.LABEL:
+        return '%s:' % instr.target
+    if op == Op.COPY:
+        code = '%s := %s' % (instr.dst, instr.a)
+    elif op == Op.BINOP:
+        code = '%s := %s %s %s' % (instr.dst, instr.a, instr.opr, instr.b)
+    elif op == Op.GOTO:
+        code = 'goto %s' % instr.target
+    elif op == Op.IFNOT:
+        code = 'if !(%s) goto %s' % (instr.a, instr.target)
+    elif op == Op.IF:
+        code = 'if (%s) goto %s' % (instr.a, instr.target)
+    elif op == Op.IFEQ:
+        code = 'ifEQ %s %s goto %s' % (instr.a, instr.b, instr.target)
+    elif op == Op.IFNE:
+        code = 'ifNE %s %s goto %s' % (instr.a, instr.b, instr.target)
+    elif op == Op.BEGINFUNC:
+        code = 'BeginFunc'
+    elif op == Op.ENDFUNC:
+        code = 'EndFunc'
+    elif op == Op.PUSHPARAM:
+        code = 'PushParam %s' % instr.a
+    elif op == Op.CALL:
+        code = 'FuncCall %s' % instr.target.value
+    elif op == Op.POPPARAMS:
+        code = 'PopParams %s' % instr.a
+    elif op == Op.RETURN:
+        code = 'ret := %s' % instr.a
+    elif op == Op.GETRET:
+        code = '%s := ret' % instr.dst
+    elif op == Op.PHI:
+        code = '%s := phi(%s)' % (instr.dst, ', '.join(str(a) for a in instr.a))
+    else:
+        raise ValueError("Unknown opcode %r" % op)
+    return '    ' + code
+
+def print_ir(instrs, out=None):
+    """
+    Write the 3AC text of the list of instructions 'instrs' to 'out'
+    (stdout by default)
+    """
+    if out is None:
+        out = sys.stdout
+    out.write(''.join(format_instr(instr) + '\n' for instr in instrs))
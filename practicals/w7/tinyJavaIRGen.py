@@ -1,14 +1,28 @@
 #!/usr/bin/env python3
 
+from tinyJavaIR import Op, Instr, temp, var, const, label
+import tinyJavaIR as ir
+import tinyJavaAST as ast
+
+# Fused conditional jump taken when each comparison does not hold
+FUSED_BRANCHES = {'==': Op.IFNE, '!=': Op.IFEQ}
+
+def has_call(node):
+    """
+    Return whether the expression 'node' calls a method
+    """
+    if isinstance(node, ast.FuncCall):
+        return True
+    if isinstance(node, ast.BinOp):
+        return has_call(node.left) or has_call(node.right)
+    return False
+
 class IRGen(object):
     """
     Uses the same visitor pattern as TypeChecker. It is modified to
-    generate 3AC (Three Address Code) in a simple string.
-
-    Bare in mind that this is for demonstration purpose only! For your
-    actual project, you would want to generate some sort of objects rather
-    than plain string. However, this should help you think about what you
-    might want/need to do to convert your AST to your IR of choice.
+    generate 3AC (Three Address Code) as a list of tinyJavaIR.Instr
+    objects, so later passes can work on opcodes and operands directly.
+    The usual text form is only built by print_ir.
 
     As mentioned in the tutorial, you are free to choose which IR you
     want to generate. I suggest you look into different optimization,
@@ -17,123 +31,193 @@ class IRGen(object):
     makes sense for Sprint2.
     """
 
-    def __init__(self):
+    # Nodes which the TypeChecker annotates with their type
+    annotated_nodes = ('Constant', 'BinOp', 'FuncCall', 'AssignStmt', 'DeclStmt', 'Formal')
+
+    # Nodes starting a new statement, whose code may run apart from the
+    # code generated before them
+    statement_nodes = ('AssignStmt', 'DeclStmt', 'IfStmt', 'MethodDecl', 'RetStmt', 'StmtList')
+
+    def __init__(self, require_annotations=False, fuse_branches=False):
         """
-        IR_lst: list of IR code
+        IR_lst: list of IR instructions (tinyJavaIR.Instr)
         register_count: integer to keep track of which register to use
         label_count: similar to register_count, but with labels
+        expr_cache: register holding the value of each hash-consed
+                    expression already computed in the current statement
+        require_annotations: assert that the tree was fully annotated by
+                             the TypeChecker before generating code for it
+        fuse_branches: compile the comparisons used as the condition of an
+                       if statement straight into an ifEQ/ifNE jump
         """
         self.IR_lst = []
         self.register_count = 0
         self.label_count = 0
+        self.expr_cache = dict()
+        self.require_annotations = require_annotations
+        self.fuse_branches = fuse_branches
 
     def generate(self, node):
         """
         Similar to 'typecheck' method from TypeChecker object
         """
-        method = 'gen_' + node.__class__.__name__
+        name = node.__class__.__name__
+        if self.require_annotations and name in self.annotated_nodes:
+            assert node.ty is not None, \
+                "%s node at line %s has no type annotation" % (name, node.coord)
+        # The registers of hash-consed expressions are only reused within
+        # the statement computing them
+        if name in self.statement_nodes:
+            self.expr_cache.clear()
+        method = 'gen_' + name
         return getattr(self, method)(node)
 
     ################################
     ## Helper functions
     ################################
 
-    def add_code(self, code):
+    def add_code(self, op, dst=None, a=None, b=None, opr=None, target=None):
         """
-        Add 'code' to the IR_lst with correct spacing
+        Add an instruction to the IR_lst
         """
-        self.IR_lst.append("    " + code)
+        self.IR_lst.append(Instr(op, dst, a, b, opr, target))
 
     def inc_register(self):
         """
-        Increase the register count and return its value for use
+        Increase the register count and return a temporary for use
         """
         self.register_count += 1
-        return self.register_count
+        return temp(self.register_count)
 
     def reset_register(self):
         """
-        Can reset the register_count to reuse them
+        Can reset the register_count to reuse them. Registers cached for
+        hash-consed expressions are about to be reused, so the cache is
+        dropped as well.
         """
         self.register_count = 0
+        self.expr_cache.clear()
 
     def inc_label(self):
         """
-        Increase the label count and return its value for use
+        Increase the label count and return a label for use
         """
         self.label_count += 1
-        return self.label_count
+        return label(self.label_count)
+
+    def mark_label(self, target):
+        """
+        Add label mark to IR_lst. Control may reach it from elsewhere, so
+        the registers of the expressions computed before it are not reused
+        after it.
+        """
+        self.add_code(Op.LABEL, target=target)
+        self.expr_cache.clear()
 
-    def mark_label(self, label):
+    def variable(self, node, name):
         """
-        Add label mark to IR_lst
+        Operand for the variable 'name' referred to or declared by 'node'
         """
-        self.IR_lst.append("_L{}:".format(label))
+        return var(name, getattr(node, 'binding', None))
 
-    def print_ir(self):
+    def gen_operands(self, left, right):
+        """
+        Generate the operands 'left' and 'right' of a binary operation, in
+        that order, and return what holds their values
+        """
+        left = self.generate(left)
+        # A call in the right operand may assign the variable read on the
+        # left, whose value Java reads first
+        if left.kind == ir.Kind.VAR and has_call(right):
+            reg = self.inc_register()
+            self.add_code(Op.COPY, reg, left)
+            left = reg
+        right = self.generate(right)
+        return left, right
+
+    def print_ir(self, out=None):
         """
-        Loop through the generated IR code and print them out to stdout
+        Print the generated IR code out as text, to stdout by default
         """
-        for ir in self.IR_lst:
-            print(ir)
+        ir.print_ir(self.IR_lst, out)
 
     def gen_AssignStmt(self, node):
         expr = self.generate(node.expr)
-        self.add_code("{} := {}".format(node.name, expr))
-        self.register_count = 0
+        self.add_code(Op.COPY, self.variable(node, node.name), expr)
+        self.reset_register()
 
     def gen_BinOp(self, node):
-        # Left operand
-        left = self.generate(node.left)
-        # Right operand
-        right = self.generate(node.right)
+        # A hash-consed node that was already computed within this statement
+        # is the very same subexpression, so its register can be reused
+        if node.shash is not None and node in self.expr_cache:
+            return self.expr_cache[node]
+
+        left, right = self.gen_operands(node.left, node.right)
 
         reg = self.inc_register()
-        self.add_code("{} := {} {} {}".format('_t%d' % reg, left, node.op, right))
+        self.add_code(Op.BINOP, reg, left, right, node.op)
 
-        return '_t%d' % reg
+        if node.shash is not None:
+            self.expr_cache[node] = reg
+
+        return reg
 
     def gen_Constant(self, node):
-        return node.value
+        if node.type.name == 'id':
+            return self.variable(node, node.value)
+        return const(node.value)
 
     def gen_DeclStmt(self, node):
         expr = self.generate(node.expr)
-        self.add_code("{} := {}".format(node.name, expr))
-        self.register_count = 0
+        self.add_code(Op.COPY, self.variable(node, node.name), expr)
+        self.reset_register()
 
     def gen_FuncCall(self, node):
 
         # Push all of the arguments with "PushParam" function
         args = node.children()
         for (i, arg) in args:
-            self.add_code("PushParam %s" % self.generate(arg))
+            self.add_code(Op.PUSHPARAM, a=self.generate(arg))
 
         # Once all of the parameter has been pushed, actually call the function
-        self.add_code("FuncCall %s" % node.name)
+        self.add_code(Op.CALL, target=label(node.name))
 
         # After we're done with the function, remove the spaces reserved
         # for the arguments
-        self.add_code("PopParams %d" % len(args))
+        self.add_code(Op.POPPARAMS, a=const(len(args)))
+
+        # The callee may have assigned to variables used by the cached
+        # expressions, so they have to be recomputed after the call
+        self.expr_cache.clear()
 
         reg = self.inc_register()
-        self.add_code("{} := ret".format('_t%d' % reg))
+        self.add_code(Op.GETRET, reg)
 
-        return '_t%d' % reg
+        return reg
 
     def gen_IfStmt(self, node):
-        cond = self.generate(node.cond)
-
-        fbranch_label = self.inc_label()
-        tbranch_label = self.inc_label()
-
-        # Skip to the false_body if the condition is not met
-        self.add_code("if !({}) goto {}".format(cond, '_L%d' % fbranch_label))
+        cond = node.cond
+        if self.fuse_branches and isinstance(cond, ast.BinOp) and cond.op in FUSED_BRANCHES:
+            # Compare the operands in the jump itself, with the comparison
+            # inverted here rather than negated at run time
+            left, right = self.gen_operands(cond.left, cond.right)
+            fbranch_label = self.inc_label()
+            tbranch_label = self.inc_label()
+            self.add_code(FUSED_BRANCHES[cond.op], a=left, b=right, target=fbranch_label)
+        else:
+            cond = self.generate(cond)
+            fbranch_label = self.inc_label()
+            tbranch_label = self.inc_label()
+
+            # Skip to the false_body if the condition is not met
+            self.add_code(Op.IFNOT, a=cond, target=fbranch_label)
         self.generate(node.true_body)
         # Make sure the statements from false_body is skipped
-        self.add_code("goto _L%d" % tbranch_label)
+        self.add_code(Op.GOTO, target=tbranch_label)
 
         self.mark_label(fbranch_label)
-        self.generate(node.false_body)
+        if node.false_body is not None:
+            self.generate(node.false_body)
         self.mark_label(tbranch_label)
 
     def gen_MethodDecl(self, node):
@@ -141,31 +225,36 @@ class IRGen(object):
         skip_decl = self.inc_label()
 
         # We want to skip the function code until it is called
-        self.add_code("goto _L%d" % skip_decl)
+        self.add_code(Op.GOTO, target=skip_decl)
 
         # Function label
-        self.mark_label(node.name)
+        func_label = label(node.name)
+        self.mark_label(func_label)
 
         # Allocate room for function local variables
-        self.add_code("BeginFunc")
+        params = tuple(self.variable(p, p.name) for p in node.params or [])
+        self.add_code(Op.BEGINFUNC, a=params, target=func_label)
 
         # Actually generate the main body
-        self.generate(node.body)
+        if node.body is not None:
+            self.generate(node.body)
         self.generate(node.ret_stmt)
 
         # Do any cleanup before jumping back
-        self.add_code("EndFunc")
+        self.add_code(Op.ENDFUNC)
 
         self.mark_label(skip_decl)
 
     def gen_Program(self, node):
+        if self.require_annotations:
+            assert getattr(node, 'annotated', False), "Program was not typechecked successfully"
         for (child_name, child) in node.children():
             self.generate(child)
 
     def gen_RetStmt(self, node):
         expr = self.generate(node.expr)
-        self.add_code("ret := {}".format(expr))
+        self.add_code(Op.RETURN, a=expr)
 
     def gen_StmtList(self, node):
-        for stmt in node.stmt_lst:
+        for stmt in node.stmt_lst or []:
             self.generate(stmt)
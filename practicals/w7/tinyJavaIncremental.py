@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import hashlib
+import pickle
+import re
+from tinyJavaTypeChecker import TypeChecker, collect_annotations, apply_annotations
+from tinyJavaLexer import reserved
+
+# Identifiers, as the lexer reads them
+IDENTIFIER = re.compile(r'[a-zA-Z_][a-zA-Z_0-9]*')
+
+def method_names(text):
+    """
+    Return the sorted names the source text of a method may refer to: every
+    identifier in it which is not a reserved word. Scanning the text is much
+    cheaper than walking the tree of the method.
+    """
+    return sorted(set(IDENTIFIER.findall(text)).difference(reserved))
+
+class IncrementalTypeChecker(TypeChecker):
+    """
+    TypeChecker which remembers the methods it checked successfully, and
+    skips checking the body of a method again as long as its fingerprint is
+    unchanged. The fingerprint covers the source text of the method (see
+    MethodDecl.span), and the signature of every method and the type of
+    every variable named in it, as visible where the method is declared.
+    Only the text of each method is hashed and scanned for names, so that
+    finding the methods which changed costs little next to parsing.
+    Methods of trees not built by TinyJavaParser have no text, and are
+    always checked.
+
+    Use one instance across runs, e.g. for every change in an editor:
+
+        checker = IncrementalTypeChecker()
+        checker.typecheck(root)
+        ...
+        checker.typecheck(new_root)
+
+    Diagnostics, symbol tables and annotations are the same as with
+    TypeChecker: methods which failed to check are never remembered, so
+    they are checked (and fail) again, and skipped methods are still
+    declared along with their nested methods, and get the annotations left
+    by their last check.
+    """
+
+    def __init__(self, max_errors=None):
+        super().__init__(max_errors=max_errors)
+
+        # Annotations of the methods checked successfully in the previous
+        # and in the current run (see collect_annotations), by fingerprint
+        self.previous = dict()
+        self.current = dict()
+
+        # Names of the methods checked and skipped during the last run
+        self.rechecked = []
+        self.reused = []
+        self.source = None
+
+    def check_Program(self, node, st=None):
+        # Text the MethodDecl spans of this run index into
+        self.source = node.source
+        self.current = dict()
+        self.rechecked = []
+        self.reused = []
+        global_st = super().check_Program(node, st)
+
+        # Only keep the results that are still relevant
+        self.previous = self.current
+        return global_st
+
+    def load(self, path):
+        """
+        Remember the methods checked by the run which saved 'path', if it
+        holds a usable cache
+        """
+        try:
+            with open(path, 'rb') as f:
+                previous = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+        if isinstance(previous, dict):
+            self.previous = previous
+
+    def save(self, path):
+        """
+        Save the methods checked successfully by the last run to 'path'
+        """
+        with open(path, 'wb') as f:
+            pickle.dump(self.previous, f)
+
+    def fingerprint(self, node, st):
+        """
+        Return the fingerprint of MethodDecl 'node' in the context of the
+        symbol table 'st', or None if its source text is unknown
+        """
+        if self.source is None or node.span is None:
+            return None
+        start, end = node.span
+        text = self.source[start:end]
+
+        deps = []
+        for name in method_names(text):
+            method = st.methods.get(name)
+            if method is not None:
+                params = ','.join(p.type.name for p in method.params or [])
+                deps.append('call %s %s(%s)' % (name, method.ret_type.name, params))
+            stack = st.bindings.get(name)
+            deps.append('var %s %s' % (name, stack[-1][0].name if stack else '-'))
+
+        data = text + '\n' + '\n'.join(deps)
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def check_MethodDecl(self, node, st):
+        key = self.fingerprint(node, st)
+
+        annotations = self.previous.get(key)
+        if annotations is not None:
+            # Replay the declarations the full check would have made. The
+            # parameters only live in the method scope, so there is
+            # nothing to replay for them
+            st.declare_method(node.name, node, node.coord)
+            for nested in node.nested:
+                st.declare_method(nested.name, nested, nested.coord)
+
+            # The fingerprint is unchanged, so the names the method refers
+            # to resolve to declarations of the same type as last time
+            bindings = dict((name, stack[-1]) for name, stack in st.bindings.items())
+            apply_annotations(node, annotations, bindings, st.methods)
+
+            self.current[key] = annotations
+            self.reused.append(node.name)
+            return node.ret_type
+
+        start = len(self.diagnostics)
+        ret_type = super().check_MethodDecl(node, st)
+        if key is not None and len(self.diagnostics) == start:
+            self.current[key] = collect_annotations(node)
+        self.rechecked.append(node.name)
+        return ret_type
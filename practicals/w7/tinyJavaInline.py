@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+from tinyJavaIR import Op, Kind, Instr, temp, label
+from tinyJavaPeephole import is_function_label
+
+class Inliner(object):
+    """
+    Replaces the calls to small methods by a copy of their body:
+
+        PushParam x                 _t5 := x
+        FuncCall _Lfoo              (body of foo, with its parameters and
+        PopParams 1                 variables renamed to _t5, _t6, ...)
+        _t1 := ret                  _t1 := (value foo returned)
+
+    Every copy gets fresh temporaries for the temporaries, parameters and
+    local variables of the method, and fresh labels, so copies never clash
+    with each other or with the code they are inserted in. The variables
+    of other frames are left as they are.
+
+    The call graph of the methods is built from their code, each unit
+    between a method label and its EndFunc being the body of one
+    MethodDecl. A method is only inlined if it is not recursive, directly
+    or through other methods, if it declares no nested method (those may
+    use its frame), and if its body, after inlining the calls it makes
+    itself, has at most 'threshold' instructions. Methods keep their
+    original body for the calls which are not inlined.
+
+        inliner = Inliner(20)
+        instrs = inliner.inline(instrs)
+        inliner.inlined   # number of calls removed by inlining
+    """
+
+    def __init__(self, threshold=20):
+        self.threshold = threshold
+        self.inlined = 0
+
+    def inline(self, instrs):
+        self.find_methods(instrs)
+        self.recursive = self.find_recursive()
+        self.expanded = dict()
+        self.next_temp = max([o.value for i in instrs for o in i.uses() + i.defs()
+                              if o.kind == Kind.TEMP] + [0])
+        self.next_label = max([i.target.value for i in instrs
+                               if i.op == Op.LABEL and isinstance(i.target.value, int)] + [0])
+        out = self.expand(instrs)
+        self.inlined += sum(1 for i in instrs if i.op == Op.CALL) - sum(1 for i in out if i.op == Op.CALL)
+        return out
+
+    ################################
+    ## Call graph
+    ################################
+
+    def find_methods(self, instrs):
+        """
+        Find the body and parameters of every method, the methods each unit
+        calls (None being the top-level code), and the methods declaring
+        nested ones
+        """
+        self.bodies = dict()
+        self.params = dict()
+        self.calls = {None: set()}
+        self.nesting = set()
+        stack = [(None, None)]
+        for i, instr in enumerate(instrs):
+            if is_function_label(instrs, i):
+                name = instr.target.value
+                self.nesting.add(stack[-1][0])
+                self.calls[name] = set()
+                stack.append((name, i + 2))
+                self.params[name] = tuple(instrs[i + 1].a or ())
+            elif instr.op == Op.CALL:
+                self.calls[stack[-1][0]].add(instr.target.value)
+            elif instr.op == Op.ENDFUNC:
+                name, start = stack.pop()
+                self.bodies[name] = instrs[start:i]
+
+    def find_recursive(self):
+        """
+        Return the names of the methods which can end up calling themselves
+        """
+        recursive = set()
+        for name in self.bodies:
+            seen = set()
+            work = list(self.calls[name])
+            while work:
+                callee = work.pop()
+                if callee == name:
+                    recursive.add(name)
+                    break
+                if callee not in seen:
+                    seen.add(callee)
+                    work.extend(self.calls.get(callee, ()))
+        return recursive
+
+    def can_inline(self, name):
+        if name not in self.bodies or name in self.recursive or name in self.nesting:
+            return False
+        return len(self.expanded_body(name)) <= self.threshold
+
+    def expanded_body(self, name):
+        """
+        Return the body of method 'name' with the calls it makes inlined
+        """
+        body = self.expanded.get(name)
+        if body is None:
+            body = self.expanded[name] = self.expand(self.bodies[name])
+        return body
+
+    ################################
+    ## Inlining
+    ################################
+
+    def expand(self, instrs):
+        out = []
+        # Positions in 'out' of the parameters pushed and not popped yet
+        pushes = []
+        i = 0
+        while i < len(instrs):
+            instr = instrs[i]
+            op = instr.op
+            if op == Op.PUSHPARAM:
+                pushes.append(len(out))
+            elif op == Op.POPPARAMS:
+                if instr.a.value:
+                    del pushes[-instr.a.value:]
+            elif op == Op.CALL and i + 1 < len(instrs) and instrs[i + 1].op == Op.POPPARAMS and \
+                    self.can_inline(instr.target.value):
+                name = instr.target.value
+                args = pushes[len(pushes) - len(self.params[name]):]
+                del pushes[len(pushes) - len(args):]
+                ret = None
+                i += 2
+                if i < len(instrs) and instrs[i].op == Op.GETRET:
+                    ret = instrs[i].dst
+                    i += 1
+                self.instantiate(name, out, args, ret)
+                continue
+            out.append(instr)
+            i += 1
+        return out
+
+    def instantiate(self, name, out, args, ret):
+        """
+        Append a copy of the body of method 'name' to 'out', turning the
+        pushes of its arguments, at positions 'args' of 'out', into copies
+        to its parameters, and storing the value it returns into 'ret'
+        """
+        renames = dict()
+
+        def rename(operand):
+            if operand is None:
+                return None
+            new = renames.get(operand)
+            if new is not None:
+                return new
+            if operand.kind == Kind.TEMP or (operand.kind == Kind.VAR and
+                                            operand.binding is not None and
+                                            operand.binding.frame is not None and
+                                            operand.binding.frame.name == name):
+                self.next_temp += 1
+                new = renames[operand] = temp(self.next_temp)
+                return new
+            if operand.kind == Kind.LABEL and isinstance(operand.value, int):
+                self.next_label += 1
+                new = renames[operand] = label(self.next_label)
+                return new
+            return operand
+
+        for param, index in zip(self.params[name], args):
+            out[index] = Instr(Op.COPY, rename(param), out[index].a)
+
+        for instr in self.expanded_body(name):
+            if instr.op == Op.RETURN:
+                if ret is not None:
+                    out.append(Instr(Op.COPY, ret, rename(instr.a)))
+                continue
+            out.append(Instr(instr.op, rename(instr.dst), rename(instr.a), rename(instr.b),
+                             instr.opr, rename(instr.target)))
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+from tinyJavaIR import Op, Kind, Instr
+from tinyJavaCFG import CFG
+from tinyJavaLiveness import Liveness
+
+# Operators whose operands can be swapped
+COMMUTATIVE = ('+', '*', '==', '!=')
+
+def read_before_written(instrs, start, operand):
+    """
+    Return whether 'operand' is read by instrs[start:] before being
+    written again
+    """
+    for instr in instrs[start:]:
+        if operand in instr.uses():
+            return True
+        if operand in instr.defs():
+            return False
+    return False
+
+class LocalValueNumbering(object):
+    """
+    Local value numbering over the basic blocks of the IR. Every value
+    computed in a block gets a number, and operands holding the same value
+    share it. An operation on the same operator and value numbers as an
+    earlier one is redundant:
+
+        _t1 := a * b                _t1 := a * b
+        x := _t1                    x := _t1
+        _t1 := a * b        =>
+        _t2 := _t1 + c              _t2 := x + c
+
+    Assigning a variable gives it a new value number, so the operations
+    on its old value are no longer matched. A FuncCall is a barrier: the
+    callee may assign any variable it can see, so nothing computed before
+    it is reused after it.
+
+    A redundant operation into a temporary which is not used outside of
+    its block is removed, its uses reading an operand which still holds
+    the value instead. If all of those are assigned before the last use,
+    a copy of the value into the temporary is inserted before the first
+    of them. Other redundant operations become copies.
+
+        lvn = LocalValueNumbering()
+        instrs = lvn.optimize(instrs)
+        lvn.removed   # number of instructions eliminated
+        lvn.reused    # number of operations turned into copies
+    """
+
+    def __init__(self):
+        self.removed = 0
+        self.reused = 0
+
+    def optimize(self, instrs, cfg=None, liveness=None):
+        """
+        Return the optimized instructions. The CFG and Liveness of 'instrs'
+        are built unless given.
+        """
+        cfg = cfg or CFG(instrs, dominators=False)
+        liveness = liveness or Liveness(cfg)
+        for block in cfg.blocks:
+            block.instrs = self.number_block(block.instrs, liveness.decode(liveness.live_out[block.id]))
+        return cfg.linearize()
+
+    def number_block(self, instrs, live_out):
+        # Value number of each operand, and the operands holding each
+        # value number
+        numbers = dict()
+        holders = dict()
+        # Value number of each (operator, value number, value number)
+        table = dict()
+        # Temporaries whose computation was removed, and their value number
+        removed = dict()
+        next_number = [0]
+
+        def fresh():
+            next_number[0] += 1
+            return next_number[0]
+
+        def number(operand):
+            n = numbers.get(operand)
+            if n is None:
+                n = numbers[operand] = fresh()
+                holders[n] = [operand]
+            return n
+
+        def substitute(operand):
+            if operand is not None and not isinstance(operand, tuple) and operand in removed:
+                return holders[removed[operand]][0]
+            return operand
+
+        def materialize(out, i, n=None):
+            """
+            Give back their computation to the removed temporaries still
+            read after instruction i (those of value number n only, if
+            given), before their value is lost
+            """
+            for t, m in list(removed.items()):
+                if (n is None or m == n) and read_before_written(instrs, i, t):
+                    out.append(Instr(Op.COPY, t, holders[m][0]))
+                    holders[m].append(t)
+                    numbers[t] = m
+                    del removed[t]
+
+        out = []
+        for i, instr in enumerate(instrs):
+            op = instr.op
+            if op != Op.BEGINFUNC:
+                a = substitute(instr.a)
+                b = substitute(instr.b)
+                if a is not instr.a or b is not instr.b:
+                    instr = Instr(op, instr.dst, a, b, instr.opr, instr.target)
+
+            if op == Op.CALL:
+                materialize(out, i + 1)
+                numbers.clear()
+                holders.clear()
+                table.clear()
+                out.append(instr)
+                continue
+
+            # Value numbers of the operands, before the instruction changes
+            # them
+            if op == Op.BINOP:
+                left = number(instr.a)
+                right = number(instr.b)
+                if instr.opr in COMMUTATIVE and right < left:
+                    left, right = right, left
+                key = (instr.opr, left, right)
+            elif op == Op.COPY:
+                n = number(instr.a)
+
+            # Assigning an operand the value it already holds
+            if op == Op.BINOP and table.get(key) is not None and numbers.get(instr.dst) == table[key] or \
+                    op == Op.COPY and numbers.get(instr.dst) == n:
+                self.removed += 1
+                continue
+
+            dsts = instr.defs()
+            for dst in dsts:
+                removed.pop(dst, None)
+                old = numbers.pop(dst, None)
+                if old is not None:
+                    holders[old].remove(dst)
+                    if not holders[old]:
+                        # dst held the last copy of the value
+                        holders[old].append(dst)
+                        materialize(out, i + 1, old)
+                        holders[old].remove(dst)
+
+            if op == Op.BINOP:
+                n = table.get(key)
+                if n is not None and holders.get(n):
+                    dst = instr.dst
+                    if dst.kind == Kind.TEMP and not self.live_at_end(instrs, i, dst, live_out):
+                        removed[dst] = n
+                        self.removed += 1
+                        continue
+                    instr = Instr(Op.COPY, dst, holders[n][0])
+                    self.reused += 1
+                else:
+                    n = table[key] = fresh()
+                numbers[instr.dst] = n
+                holders.setdefault(n, []).append(instr.dst)
+            elif op == Op.COPY:
+                numbers[instr.dst] = n
+                holders[n].append(instr.dst)
+            else:
+                for dst in dsts:
+                    n = numbers[dst] = fresh()
+                    holders[n] = [dst]
+            out.append(instr)
+        return out
+
+    def live_at_end(self, instrs, i, operand, live_out):
+        """
+        Return whether the value instrs[i] assigns to 'operand' may still be
+        read once the block is left
+        """
+        for instr in instrs[i + 1:]:
+            if operand in instr.defs():
+                return False
+        return operand in live_out
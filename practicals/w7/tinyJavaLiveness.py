@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+from tinyJavaIR import Op, Kind
+
+def is_local(operand, function):
+    """
+    Return whether the variable 'operand' lives in the frame of 'function'
+    (a CFG Function). Variables which were not resolved are assumed not to.
+    """
+    binding = operand.binding
+    if binding is None:
+        return False
+    frame = binding.frame
+    return (frame.name if frame is not None else None) == function.name
+
+class Liveness(object):
+    """
+    Backward liveness analysis of the temporaries and variables of every
+    Function of a CFG.
+
+    Besides the operands an instruction reads, a FuncCall reads every
+    variable, since the callee may refer to any variable it can see, and
+    the variables outside of the frame of a method are live when it
+    returns. With 'keep_globals', the variables declared at the top level
+    are live at the end of the program too, as its result.
+
+    Sets are kept as bit sets (Python ints) over the operands of the CFG,
+    using the numbering in 'index':
+
+        index[operand]: bit of the operand
+        operands[bit]: operand of that bit
+        live_in[block.id], live_out[block.id]: operands live on entry to
+                                               and on exit from the block
+        call_uses[block.id]: variables read by a FuncCall in the block
+    """
+
+    def __init__(self, cfg, keep_globals=False):
+        self.cfg = cfg
+        self.keep_globals = keep_globals
+        self.index = dict()
+        self.operands = []
+        self.live_in = dict()
+        self.live_out = dict()
+        self.call_uses = dict()
+        for function in cfg.functions:
+            self.analyze(function)
+
+    def bit(self, operand):
+        i = self.index.get(operand)
+        if i is None:
+            i = len(self.operands)
+            self.index[operand] = i
+            self.operands.append(operand)
+        return 1 << i
+
+    def mask(self, operands):
+        bits = 0
+        for operand in operands:
+            bits |= self.bit(operand)
+        return bits
+
+    def decode(self, bits):
+        """
+        Return the set of operands in bit set 'bits'
+        """
+        result = set()
+        operands = self.operands
+        i = 0
+        while bits:
+            if bits & 1:
+                result.add(operands[i])
+            bits >>= 1
+            i += 1
+        return result
+
+    def analyze(self, function):
+        # Every variable referred to in the function, and those of them
+        # living outside of its frame
+        all_vars = 0
+        outer_vars = 0
+        global_vars = 0
+        for block in function.blocks:
+            for instr in block.instrs:
+                for operand in instr.uses() + instr.defs():
+                    if operand.kind == Kind.VAR:
+                        bit = self.bit(operand)
+                        all_vars |= bit
+                        if not is_local(operand, function):
+                            outer_vars |= bit
+                        if operand.binding is None or operand.binding.depth == 0:
+                            global_vars |= bit
+
+        # Upward exposed uses and definitions of each block
+        gen = dict()
+        kill = dict()
+        for block in function.blocks:
+            self.call_uses[block.id] = all_vars
+            g, k = self.transfer(block, 0, 0)
+            gen[block.id] = g
+            kill[block.id] = k
+
+        if function.name is not None:
+            exit_live = outer_vars
+        else:
+            exit_live = global_vars if self.keep_globals else 0
+        live_in = self.live_in
+        live_out = self.live_out
+        for block in function.blocks:
+            live_in[block.id] = 0
+            live_out[block.id] = 0
+
+        # Visit the blocks in post-order, so that most successors are done
+        # before their predecessors
+        order = list(reversed(function.rpo))
+        order += [b for b in function.blocks if b.rpo is None]
+        changed = True
+        while changed:
+            changed = False
+            for block in order:
+                out = 0
+                if block.instrs and block.instrs[-1].op == Op.ENDFUNC or \
+                        function.name is None and not block.succs:
+                    out = exit_live
+                for succ in block.succs:
+                    out |= live_in[succ.id]
+                new_in = gen[block.id] | (out & ~kill[block.id])
+                live_out[block.id] = out
+                if new_in != live_in[block.id]:
+                    live_in[block.id] = new_in
+                    changed = True
+
+    def transfer(self, block, gen, kill):
+        """
+        Return the (gen, kill) bit sets of the instructions of 'block',
+        followed by code with the given (gen, kill) bit sets
+        """
+        for instr in reversed(block.instrs):
+            d = self.mask(instr.defs())
+            u = self.uses(block, instr)
+            gen = (gen & ~d) | u
+            kill = (kill | d) & ~u
+        return gen, kill
+
+    def uses(self, block, instr):
+        u = self.mask(instr.uses())
+        if instr.op == Op.CALL:
+            u |= self.call_uses[block.id]
+        return u
+
+    def live_after(self, block):
+        """
+        Return the list of the operands live after each instruction of
+        'block', as bit sets
+        """
+        result = [0] * len(block.instrs)
+        live = self.live_out[block.id]
+        for i in range(len(block.instrs) - 1, -1, -1):
+            instr = block.instrs[i]
+            result[i] = live
+            live = (live & ~self.mask(instr.defs())) | self.uses(block, instr)
+        return result
@@ -17,10 +17,13 @@ class TinyJavaParser:
     # Let the parser know that symbol "program" is the starting point
     start = 'program'
 
-    def __init__(self):
+    def __init__(self, hash_cons=False):
         """
-        Builds the Lexer and Parser
+        Builds the Lexer and Parser. If 'hash_cons' is set, pure expression
+        nodes are built through an ast.HashConsTable so that identical
+        subexpressions share one node.
         """
+        self.hash_cons = ast.HashConsTable() if hash_cons else None
         self.tokens = tokens
         self.lexer = TinyJavaLexer()
         self.lexer.build()
@@ -28,9 +31,23 @@ class TinyJavaParser:
 
     def parse(self, data):
         """
-        Returns the root (Program) node of the AST, after parsing the file
+        Returns the root (Program) node of the AST, after parsing the file.
+        Line numbers start over for every file parsed.
         """
-        return self.parser.parse(data)
+        self.lexer.lexer.lineno = 1
+        # Methods parsed so far which are not nested in another one yet
+        self.methods = []
+        return self.parser.parse(data, lexer=self.lexer.lexer)
+
+    def new_constant(self, type, value, coord):
+        if self.hash_cons is not None:
+            return self.hash_cons.constant(type, value, coord)
+        return ast.Constant(type, value, coord)
+
+    def new_binop(self, op, left, right, coord):
+        if self.hash_cons is not None:
+            return self.hash_cons.binop(op, left, right, coord)
+        return ast.BinOp(op, left, right, coord)
 
     ################################
     ## Program (starting point)
@@ -41,6 +58,7 @@ class TinyJavaParser:
         program : stmts_or_empty
         '''
         p[0] = ast.Program(p[1], p.lineno(1))
+        p[0].source = p.lexer.lexdata
 
     ################################
     ## Statements
@@ -77,12 +95,15 @@ class TinyJavaParser:
              | method_decl
         '''
         p[0] = p[1]
+        if self.hash_cons is not None:
+            self.hash_cons.end_statement()
 
     def p_decl_statement(self, p):
         '''
         decl_stmt : type ID EQ expr SEMICOL
         '''
         p[0] = ast.DeclStmt(p[2], p[1], p[4], p.lineno(2))
+        p[0].type_coord = p.lineno(1)
 
     def p_assignment_statement(self, p):
         '''
@@ -107,6 +128,8 @@ class TinyJavaParser:
         ret_stmt : RETURN expr SEMICOL
         '''
         p[0] = ast.RetStmt(p[2], p.lineno(1))
+        if self.hash_cons is not None:
+            self.hash_cons.end_statement()
 
     ################################
     ## Method Declarations
@@ -117,6 +140,17 @@ class TinyJavaParser:
         method_decl : PUBLIC type ID method_param LBRACE stmts_or_empty ret_stmt RBRACE
         '''
         p[0] = ast.MethodDecl(p[3], p[2], p[4], p[6], p[7], p.lineno(1))
+        p[0].type_coord = p.lineno(2)
+        p[0].span = (p.lexpos(1), p.lexpos(8) + 1)
+
+        # The methods parsed since this one started are nested in it, and
+        # the methods nested in those were already taken by them
+        nested = []
+        while self.methods and self.methods[-1].span[0] > p[0].span[0]:
+            inner = self.methods.pop()
+            nested[0:0] = [inner] + inner.nested
+        p[0].nested = nested
+        self.methods.append(p[0])
 
     def p_method_param(self, p):
         '''
@@ -129,7 +163,8 @@ class TinyJavaParser:
         formals_or_empty : formal_lst
                          | empty
         '''
-        if len(p) == 1:
+        # 'empty' gives None, while methods always get a list
+        if p[1] is None:
             p[0] = []
         else:
             p[0] = p[1]
@@ -149,6 +184,7 @@ class TinyJavaParser:
         formal : type ID
         '''
         p[0] = ast.Formal(p[2], p[1], p.lineno(2))
+        p[0].type_coord = p.lineno(1)
 
     ################################
     ## Expressions
@@ -189,7 +225,7 @@ class TinyJavaParser:
              | expr EQOP expr
              | expr NEQ expr
         '''
-        p[0] = ast.BinOp(p[2], p[1], p[3], p.lineno(1))
+        p[0] = self.new_binop(p[2], p[1], p[3], p.lineno(1))
 
     def p_expr_group(self, p):
         '''
@@ -201,20 +237,20 @@ class TinyJavaParser:
         '''
         expr : NUMBER
         '''
-        p[0] = ast.Constant('int', p[1], p.lineno(1))
+        p[0] = self.new_constant('int', p[1], p.lineno(1))
 
     def p_expr_bool(self, p):
         '''
         expr : TRUE
              | FALSE
         '''
-        p[0] = ast.Constant('boolean', p[1], p.lineno(1))
+        p[0] = self.new_constant('boolean', p[1], p.lineno(1))
 
     def p_expr_id(self, p):
         '''
         expr : ID
         '''
-        p[0] = ast.Constant('id', p[1], p.lineno(1))
+        p[0] = self.new_constant('id', p[1], p.lineno(1))
 
     ################################
     ## Types
@@ -225,7 +261,10 @@ class TinyJavaParser:
         type : base_type
              | ID
         '''
-        p[0] = ast.Type(p[1], p.lineno(1))
+        # Types are interned, so their line goes to the declaration using
+        # them through the line of this symbol
+        p[0] = ast.get_type(p[1])
+        p.set_lineno(0, p.lineno(1))
 
     def p_base_type(self, p):
         '''
@@ -233,6 +272,7 @@ class TinyJavaParser:
                   | BOOLEAN
         '''
         p[0] = p[1]
+        p.set_lineno(0, p.lineno(1))
 
     ################################
     ## Misc
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+from tinyJavaCFG import CFG
+from tinyJavaLiveness import Liveness
+from tinyJavaFold import ConstantFolder
+from tinyJavaLVN import LocalValueNumbering
+from tinyJavaSSA import to_ssa, from_ssa, SCCP
+from tinyJavaDCE import DeadCodeElimination
+from tinyJavaPeephole import Peephole
+from tinyJavaInline import Inliner
+from tinyJavaRegAlloc import LinearScan
+
+# Largest number of rounds a group of passes is repeated for
+MAX_ROUNDS = 10
+
+def snapshot(instrs):
+    """
+    Return a value equal for two instruction lists exactly when they hold
+    the same instructions
+    """
+    return [(i.op, i.dst, i.a, i.b, i.opr, i.target) for i in instrs]
+
+################################
+## Analyses
+################################
+
+class Analyses(object):
+    """
+    Analyses of one list of instructions, computed on first use and kept
+    until the instructions change:
+
+        cfg: CFG, with the reverse post-order of its blocks
+        dominators: the same CFG, once its dominator trees are computed
+        liveness: Liveness of the cfg, with the global variables live at
+                  the end of the program
+
+    'times' holds the time spent computing each of them.
+    """
+
+    # Analyses each analysis is computed from
+    depends = {'cfg': (), 'dominators': ('cfg', ), 'liveness': ('cfg', )}
+
+    def __init__(self, instrs):
+        self.instrs = instrs
+        self.results = dict()
+        self.times = dict()
+
+    def get(self, name):
+        result = self.results.get(name)
+        if result is None:
+            for dependency in self.depends[name]:
+                self.get(dependency)
+            start = time.perf_counter()
+            result = self.results[name] = getattr(self, 'compute_' + name)()
+            self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+        return result
+
+    def compute_cfg(self):
+        return CFG(self.instrs, dominators=False)
+
+    def compute_dominators(self):
+        cfg = self.results['cfg']
+        for function in cfg.functions:
+            function.compute_dominators()
+        return cfg
+
+    def compute_liveness(self):
+        return Liveness(self.results['cfg'], keep_globals=True)
+
+################################
+## Passes
+################################
+
+class Pass(object):
+    """
+    Base class of the passes run by the PassManager. A pass declares the
+    analyses it needs in 'requires', and gets them already computed for
+    the instructions it is given. It returns the new instructions, and
+    may describe what it did in 'detail'.
+
+    The analyses are dropped once a pass returns different instructions.
+    Passes which may leave the CFG they are given changed even then (such
+    as going through SSA form) set 'mutates', so that the analyses are
+    always dropped after they run.
+    """
+
+    name = None
+    requires = ()
+    mutates = False
+
+    def __init__(self):
+        self.detail = ''
+
+    def run(self, instrs, analyses):
+        return instrs
+
+class FoldPass(Pass):
+    name = 'fold'
+
+    def run(self, instrs, analyses):
+        folder = ConstantFolder()
+        instrs = folder.fold(instrs)
+        self.detail = "%d folded away" % folder.removed
+        return instrs
+
+class LVNPass(Pass):
+    name = 'lvn'
+    requires = ('cfg', 'liveness')
+
+    def run(self, instrs, analyses):
+        lvn = LocalValueNumbering()
+        instrs = lvn.optimize(instrs, analyses.get('cfg'), analyses.get('liveness'))
+        self.detail = "%d removed, %d reused" % (lvn.removed, lvn.reused)
+        return instrs
+
+class SCCPPass(Pass):
+    name = 'sccp'
+    requires = ('dominators', 'liveness')
+    mutates = True
+
+    def run(self, instrs, analyses):
+        cfg = analyses.get('dominators')
+        to_ssa(cfg, analyses.get('liveness'))
+        sccp = SCCP(cfg)
+        sccp.rewrite()
+        from_ssa(cfg)
+        self.detail = "%d removed" % sccp.removed
+        return cfg.linearize()
+
+class DCEPass(Pass):
+    name = 'dce'
+    requires = ('cfg', 'liveness')
+
+    def run(self, instrs, analyses):
+        dce = DeadCodeElimination()
+        instrs = dce.optimize(instrs, analyses.get('cfg'), analyses.get('liveness'))
+        self.detail = "%d methods removed" % len(dce.methods)
+        return instrs
+
+class PeepholePass(Pass):
+    name = 'peephole'
+
+    def run(self, instrs, analyses):
+        peephole = Peephole()
+        instrs = peephole.optimize(instrs)
+        self.detail = "%d rounds" % peephole.rounds
+        return instrs
+
+class InlinePass(Pass):
+    name = 'inline'
+
+    def __init__(self, threshold):
+        Pass.__init__(self)
+        self.threshold = threshold
+
+    def run(self, instrs, analyses):
+        inliner = Inliner(self.threshold)
+        instrs = inliner.inline(instrs)
+        self.detail = "%d calls inlined" % inliner.inlined
+        return instrs
+
+class RegAllocPass(Pass):
+    name = 'registers'
+
+    def __init__(self, num_registers):
+        Pass.__init__(self)
+        self.num_registers = num_registers
+        self.reports = []
+
+    def run(self, instrs, analyses):
+        allocator = LinearScan(self.num_registers)
+        instrs = allocator.allocate(instrs)
+        self.reports = allocator.reports
+        self.detail = "%d spill slots" % sum(r.spills for r in self.reports)
+        return instrs
+
+class PassGroup(object):
+    """
+    Passes run over and over, in order, until a whole round of them
+    leaves the instructions unchanged or 'max_rounds' rounds ran
+    """
+
+    def __init__(self, passes, max_rounds=MAX_ROUNDS):
+        self.passes = passes
+        self.max_rounds = max_rounds
+
+################################
+## Pass manager
+################################
+
+class PassStats(object):
+    """
+    What the runs of one pass (or the computations of one analysis) cost
+    and did:
+
+        runs: number of times it ran
+        changes: number of runs which changed the instructions
+        time: total time spent, in seconds
+        delta: total change in the number of instructions
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.runs = 0
+        self.changes = 0
+        self.time = 0.0
+        self.delta = 0
+        self.detail = ''
+
+class PassManager(object):
+    """
+    Runs a pipeline of passes and groups of passes over the IR, computing
+    the analyses the passes require and caching them until a pass changes
+    the instructions. Statistics are kept per pass and per analysis.
+
+        manager = PassManager()
+        manager.add(InlinePass(20))
+        manager.add(PassGroup([FoldPass(), DCEPass(), PeepholePass()]))
+        instrs = manager.run(instrs)
+        manager.report()
+    """
+
+    def __init__(self):
+        self.pipeline = []
+        self.stats = dict()
+        self.order = []
+        self.analyses = None
+
+    def add(self, item):
+        """
+        Add a Pass or a PassGroup at the end of the pipeline
+        """
+        self.pipeline.append(item)
+
+    def __len__(self):
+        return len(self.pipeline)
+
+    def stat(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = PassStats(name)
+            self.order.append(name)
+        return stats
+
+    def run(self, instrs):
+        self.analyses = Analyses(instrs)
+        for item in self.pipeline:
+            if isinstance(item, PassGroup):
+                for i in range(item.max_rounds):
+                    changed = False
+                    for p in item.passes:
+                        instrs, pass_changed = self.run_pass(p, instrs)
+                        changed = changed or pass_changed
+                    if not changed:
+                        break
+            else:
+                instrs, changed = self.run_pass(item, instrs)
+        self.collect_analysis_times()
+        return instrs
+
+    def run_pass(self, p, instrs):
+        """
+        Run pass 'p' over 'instrs'. Returns the new instructions and
+        whether they differ from 'instrs'.
+        """
+        for name in p.requires:
+            self.analyses.get(name)
+
+        stats = self.stat(p.name)
+        before = snapshot(instrs)
+        start = time.perf_counter()
+        new = p.run(instrs, self.analyses)
+        stats.time += time.perf_counter() - start
+        stats.runs += 1
+        stats.detail = p.detail
+
+        changed = snapshot(new) != before
+        if changed:
+            stats.changes += 1
+            stats.delta += len(new) - len(instrs)
+        if changed or (p.mutates and self.analyses.results):
+            self.collect_analysis_times()
+            self.analyses = Analyses(new)
+        return new, changed
+
+    def collect_analysis_times(self):
+        for name, elapsed in self.analyses.times.items():
+            stats = self.stat('(' + name + ')')
+            stats.runs += 1
+            stats.time += elapsed
+        self.analyses.times.clear()
+
+    def report(self, out=None):
+        """
+        Print the statistics of every pass and analysis, in the order they
+        first ran
+        """
+        if out is None:
+            out = sys.stdout
+        out.write("* %-12s %5s %8s %10s %8s  %s\n" % ('pass', 'runs', 'changed', 'time (s)', 'delta', 'last run'))
+        for name in self.order:
+            s = self.stats[name]
+            out.write("* %-12s %5d %8d %10.4f %+8d  %s\n" % (s.name, s.runs, s.changes, s.time, s.delta, s.detail))
+
+################################
+## Optimization levels
+################################
+
+def optimization_passes(level):
+    """
+    Return the pipeline of optimization level 'level' (0, 1 or 2) as a
+    list of passes and groups
+    """
+    if level <= 0:
+        return []
+    if level == 1:
+        return [PassGroup([FoldPass(), DCEPass(), PeepholePass()])]
+    return [InlinePass(20),
+            PassGroup([LVNPass(), FoldPass(), SCCPPass(), DCEPass(), PeepholePass()])]
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+from tinyJavaIR import Op, Instr, BRANCH_OPS, JUMP_OPS, INVERSE
+
+def is_function_label(instrs, i):
+    """
+    Return whether instruction i of 'instrs' is the label of a method.
+    Calls refer to those by name, so they are never removed or merged.
+    """
+    return instrs[i].op == Op.LABEL and i + 1 < len(instrs) and instrs[i + 1].op == Op.BEGINFUNC
+
+class Peephole(object):
+    """
+    Cleans up the jumps and labels of a list of IR instructions:
+
+        - labels following each other are merged into the first one
+        - jumps to a goto jump straight to its target instead
+        - a conditional jump over a goto becomes a single inverted
+          conditional jump (if !(c) goto L1; goto L2; L1: becomes
+          if (c) goto L2; L1:)
+        - jumps to the instruction following them are removed, as are
+          conditional jumps to where the goto following them jumps
+        - code following a goto up to the next label is removed, since
+          nothing can reach it
+        - labels which no jump refers to are removed
+
+    The rules are applied over and over until none of them changes
+    anything. Method labels are always kept.
+
+        peephole = Peephole()
+        instrs = peephole.optimize(instrs)
+        peephole.removed   # number of instructions removed
+    """
+
+    def __init__(self):
+        self.removed = 0
+        self.rounds = 0
+
+    def optimize(self, instrs):
+        before = len(instrs)
+        instrs = list(instrs)
+        changed = True
+        while changed:
+            self.rounds += 1
+            changed = False
+            for rule in (self.merge_labels, self.thread_jumps, self.invert_branches,
+                         self.remove_next_jumps, self.remove_unreachable, self.remove_labels):
+                instrs, rule_changed = rule(instrs)
+                changed = changed or rule_changed
+        self.removed += before - len(instrs)
+        return instrs
+
+    ################################
+    ## Helper functions
+    ################################
+
+    def retarget(self, instr, target):
+        return Instr(instr.op, instr.dst, instr.a, instr.b, instr.opr, target)
+
+    def labels_at(self, instrs, i):
+        """
+        Return the labels starting at instruction i, up to the next
+        instruction which is not a label
+        """
+        labels = []
+        while i < len(instrs) and instrs[i].op == Op.LABEL:
+            labels.append(instrs[i].target)
+            i += 1
+        return labels, i
+
+    ################################
+    ## Rules
+    ################################
+
+    def merge_labels(self, instrs):
+        renames = dict()
+        out = []
+        for i, instr in enumerate(instrs):
+            if instr.op == Op.LABEL and out and out[-1].op == Op.LABEL and \
+                    not is_function_label(instrs, i):
+                renames[instr.target] = out[-1].target
+                continue
+            out.append(instr)
+        if not renames:
+            return instrs, False
+        return [self.retarget(i, renames.get(i.target, i.target)) if i.op in JUMP_OPS else i
+                for i in out], True
+
+    def thread_jumps(self, instrs):
+        # Target of the goto found right at each label, if any
+        gotos = dict()
+        i = 0
+        while i < len(instrs):
+            labels, j = self.labels_at(instrs, i)
+            if labels:
+                if j < len(instrs) and instrs[j].op == Op.GOTO:
+                    for target in labels:
+                        gotos[target] = instrs[j].target
+                i = j
+            else:
+                i += 1
+
+        # Where each chain of gotos ends, stopping at loops
+        ends = dict()
+        for start in gotos:
+            if start in ends:
+                continue
+            chain = [start]
+            seen = set(chain)
+            target = start
+            while target in gotos and gotos[target] not in seen and target not in ends:
+                target = gotos[target]
+                chain.append(target)
+                seen.add(target)
+            end = ends.get(target, target)
+            for label in chain:
+                ends[label] = end
+
+        changed = False
+        out = []
+        for instr in instrs:
+            if instr.op in JUMP_OPS and instr.target in ends:
+                target = ends[instr.target]
+                if target != instr.target:
+                    instr = self.retarget(instr, target)
+                    changed = True
+            out.append(instr)
+        return out, changed
+
+    def invert_branches(self, instrs):
+        changed = False
+        out = []
+        i = 0
+        while i < len(instrs):
+            instr = instrs[i]
+            if instr.op in BRANCH_OPS and i + 2 < len(instrs) and instrs[i + 1].op == Op.GOTO:
+                labels, j = self.labels_at(instrs, i + 2)
+                if instr.target in labels:
+                    out.append(Instr(INVERSE[instr.op], a=instr.a, b=instr.b, target=instrs[i + 1].target))
+                    changed = True
+                    i += 2
+                    continue
+            out.append(instr)
+            i += 1
+        return out, changed
+
+    def remove_next_jumps(self, instrs):
+        changed = False
+        out = []
+        for i, instr in enumerate(instrs):
+            if instr.op in JUMP_OPS:
+                labels, j = self.labels_at(instrs, i + 1)
+                # Conditions have no side effects, so they can go too
+                if instr.target in labels or (instr.op in BRANCH_OPS and j == i + 1 and
+                                              j < len(instrs) and instrs[j].op == Op.GOTO and
+                                              instrs[j].target == instr.target):
+                    changed = True
+                    continue
+            out.append(instr)
+        return out, changed
+
+    def remove_unreachable(self, instrs):
+        changed = False
+        out = []
+        dead = False
+        for instr in instrs:
+            if instr.op in (Op.LABEL, Op.ENDFUNC):
+                dead = False
+            if dead:
+                changed = True
+                continue
+            out.append(instr)
+            if instr.op == Op.GOTO:
+                dead = True
+        return out, changed
+
+    def remove_labels(self, instrs):
+        referenced = set(i.target for i in instrs if i.op in JUMP_OPS)
+        out = [instr for i, instr in enumerate(instrs)
+               if instr.op != Op.LABEL or instr.target in referenced or is_function_label(instrs, i)]
+        return out, len(out) != len(instrs)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+from tinyJavaIR import Kind, Instr, temp, reg, spill
+from tinyJavaCFG import CFG
+from tinyJavaLiveness import Liveness
+
+class Interval(object):
+    """
+    Live range of one temporary, as positions in the linear order of the
+    instructions of its Function. An instruction at index i reads its
+    operands at position 2 * i and writes its result at 2 * i + 1, so a
+    temporary read for the last time by an instruction can share a
+    register with the one it writes.
+
+        location: REG or SPILL operand the temporary is assigned to
+    """
+
+    __slots__ = ('temp', 'start', 'end', 'location')
+
+    def __init__(self, temp, start):
+        self.temp = temp
+        self.start = start
+        self.end = start
+        self.location = None
+
+    def extend(self, pos):
+        if pos < self.start:
+            self.start = pos
+        if pos > self.end:
+            self.end = pos
+
+class AllocationReport(object):
+    """
+    Outcome of the allocation of one Function:
+
+        name: name of the method, None for the top-level code
+        temps: number of distinct temporaries IRGen used
+        webs: number of independent live ranges those were split into
+        pressure: largest number of temporaries live at the same time
+        registers: number of registers used
+        spills: number of spill slots used
+    """
+
+    def __init__(self, name, temps, webs, pressure, registers, spills):
+        self.name = name
+        self.temps = temps
+        self.webs = webs
+        self.pressure = pressure
+        self.registers = registers
+        self.spills = spills
+
+    def __str__(self):
+        return "%s: %d temporaries, %d live ranges, peak pressure %d, %d registers, %d spill slots" % (
+            self.name or '<main>', self.temps, self.webs, self.pressure, self.registers, self.spills)
+
+class LinearScan(object):
+    """
+    Maps the temporaries of the IR onto 'num_registers' registers with the
+    linear scan algorithm of Poletto and Sarkar, and onto spill slots once
+    the registers run out. Temporaries are replaced by REG and SPILL
+    operands; variables are left alone. Like variables, registers and
+    spill slots belong to the frame of their Function, so their values are
+    kept across calls.
+
+    IRGen reuses the same temporary names in every statement, so first
+    every definition of a temporary which is not live across blocks gets
+    a temporary of its own. Each of them is then allocated separately.
+
+        allocator = LinearScan(4)
+        instrs = allocator.allocate(instrs)
+        allocator.reports   # one AllocationReport per Function
+    """
+
+    def __init__(self, num_registers=8):
+        self.num_registers = num_registers
+        self.reports = []
+
+    def allocate(self, instrs):
+        instrs, temp_counts = self.split_webs(instrs)
+
+        cfg = CFG(instrs)
+        liveness = Liveness(cfg)
+        locations = dict()
+        self.reports = []
+        for function in cfg.functions:
+            intervals = self.build_intervals(function, liveness)
+            registers, spills = self.scan(intervals)
+            for interval in intervals:
+                locations[interval.temp] = interval.location
+            self.reports.append(AllocationReport(function.name, temp_counts.get(function.name, 0),
+                                                 len(intervals), self.pressure(intervals),
+                                                 registers, spills))
+
+        return [self.rewrite(instr, locations) for instr in instrs]
+
+    ################################
+    ## Live ranges
+    ################################
+
+    def split_webs(self, instrs):
+        """
+        Return a copy of 'instrs' in which every temporary is defined once
+        per block at most, along with the number of distinct temporaries
+        of each Function before splitting them
+        """
+        cfg = CFG(instrs)
+        liveness = Liveness(cfg)
+        next_temp = [0]
+
+        def fresh():
+            next_temp[0] += 1
+            return temp(next_temp[0])
+
+        renamed = dict()
+        temp_counts = dict()
+        for function in cfg.functions:
+            # Temporaries live across blocks keep a single name
+            across = dict()
+            for block in function.blocks:
+                for operand in liveness.decode(liveness.live_in[block.id]):
+                    if operand.kind == Kind.TEMP and operand not in across:
+                        across[operand] = fresh()
+
+            names = set()
+            for block in function.blocks:
+                current = dict(across)
+                for instr in block.instrs:
+                    a = instr.a
+                    b = instr.b
+                    dst = instr.dst
+                    for operand in instr.uses():
+                        if operand.kind == Kind.TEMP:
+                            names.add(operand)
+                            if operand not in current:
+                                # Read before being written: undefined
+                                current[operand] = fresh()
+                    if a is not None and not isinstance(a, tuple) and a.kind == Kind.TEMP:
+                        a = current[a]
+                    if b is not None and b.kind == Kind.TEMP:
+                        b = current[b]
+                    if dst is not None and dst.kind == Kind.TEMP:
+                        names.add(dst)
+                        current[dst] = across.get(dst) or fresh()
+                        dst = current[dst]
+                    renamed[id(instr)] = Instr(instr.op, dst, a, b, instr.opr, instr.target)
+            temp_counts[function.name] = len(names)
+
+        return [renamed[id(instr)] for instr in instrs], temp_counts
+
+    def build_intervals(self, function, liveness):
+        """
+        Return the live Interval of every temporary of 'function', sorted
+        by start position
+        """
+        intervals = dict()
+
+        def extend(operand, pos):
+            interval = intervals.get(operand)
+            if interval is None:
+                intervals[operand] = Interval(operand, pos)
+            else:
+                interval.extend(pos)
+
+        index = 0
+        for block in function.blocks:
+            first = index
+            last = index + len(block.instrs) - 1
+            for operand in liveness.decode(liveness.live_in[block.id]):
+                if operand.kind == Kind.TEMP:
+                    extend(operand, 2 * first)
+            for operand in liveness.decode(liveness.live_out[block.id]):
+                if operand.kind == Kind.TEMP:
+                    extend(operand, 2 * last + 1)
+            for instr in block.instrs:
+                for operand in instr.uses():
+                    if operand.kind == Kind.TEMP:
+                        extend(operand, 2 * index)
+                for operand in instr.defs():
+                    if operand.kind == Kind.TEMP:
+                        extend(operand, 2 * index + 1)
+                index += 1
+
+        return sorted(intervals.values(), key=lambda i: (i.start, i.end))
+
+    def pressure(self, intervals):
+        """
+        Return the largest number of intervals overlapping at any position
+        """
+        events = []
+        for interval in intervals:
+            events.append((interval.start, 1))
+            events.append((interval.end + 1, -1))
+        events.sort()
+        live = 0
+        peak = 0
+        for pos, delta in events:
+            live += delta
+            if live > peak:
+                peak = live
+        return peak
+
+    ################################
+    ## Allocation
+    ################################
+
+    def scan(self, intervals):
+        """
+        Assign a location to every interval in 'intervals', sorted by start
+        position. Returns the number of registers and spill slots used.
+        """
+        free = list(range(self.num_registers - 1, -1, -1))
+        active = []
+        spilled = []
+        used = set()
+        for interval in intervals:
+            # Release the registers of the intervals which ended
+            still_active = []
+            for other in active:
+                if other.end < interval.start:
+                    free.append(other.location.value)
+                else:
+                    still_active.append(other)
+            active = still_active
+
+            if free:
+                free.sort(reverse=True)
+                interval.location = reg(free.pop())
+                used.add(interval.location.value)
+                active.append(interval)
+                continue
+
+            # Spill whichever interval ends last
+            victim = max(active, key=lambda i: i.end) if active else None
+            if victim is not None and victim.end > interval.end:
+                interval.location = victim.location
+                active.remove(victim)
+                active.append(interval)
+                spilled.append(victim)
+            else:
+                spilled.append(interval)
+
+        return len(used), self.assign_slots(spilled)
+
+    def assign_slots(self, intervals):
+        """
+        Give every spilled interval a slot, reusing the slots of the
+        intervals which ended. Returns the number of slots used.
+        """
+        free = []
+        active = []
+        count = 0
+        for interval in sorted(intervals, key=lambda i: i.start):
+            still_active = []
+            for other in active:
+                if other.end < interval.start:
+                    free.append(other.location.value)
+                else:
+                    still_active.append(other)
+            active = still_active
+            if free:
+                free.sort(reverse=True)
+                interval.location = spill(free.pop())
+            else:
+                interval.location = spill(count)
+                count += 1
+            active.append(interval)
+        return count
+
+    def rewrite(self, instr, locations):
+        def location(operand):
+            if operand is not None and not isinstance(operand, tuple) and operand.kind == Kind.TEMP:
+                return locations[operand]
+            return operand
+        return Instr(instr.op, location(instr.dst), location(instr.a), location(instr.b),
+                     instr.opr, instr.target)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+from tinyJavaSymbolTable import SymbolTable
+import tinyJavaAST as ast
+
+class Binding(object):
+    """
+    A resolved variable declaration.
+
+        name: name of the variable
+        type: declared Type of the variable
+        depth: depth of the scope declaring it (0 for the global scope)
+        slot: index of the variable within its frame
+        frame: MethodDecl whose frame holds the variable, or None if it
+               lives in the global frame
+    """
+
+    __slots__ = ('name', 'type', 'depth', 'slot', 'frame')
+
+    def __init__(self, name, type, depth, slot, frame):
+        self.name = name
+        self.type = type
+        self.depth = depth
+        self.slot = slot
+        self.frame = frame
+
+    def __repr__(self):
+        return "Binding(%s, %s, depth=%d, slot=%d)" % (self.name, self.type.name, self.depth, self.slot)
+
+class Resolver(object):
+    """
+    Resolves every identifier to its declaration once, after type checking,
+    and stores the result on the AST so later phases can index frames
+    directly instead of looking names up again:
+
+        DeclStmt.binding, Formal.binding: Binding they declare
+        AssignStmt.binding, Constant('id').binding: Binding they refer to
+        MethodDecl.frame_size: number of slots needed by the method frame
+        Program.frame_size: number of slots needed by the global frame
+
+    Every method gets its own frame, with its parameters in the first
+    slots. Variables of nested scopes get the slots following those of the
+    enclosing scope, and the slots are reused once the scope is closed.
+
+    This pass uses the same visitor pattern as TypeChecker, and assumes the
+    tree has been typechecked already. References annotated with their
+    declaration by the TypeChecker take the binding of that declaration
+    rather than looking the name up again.
+    """
+
+    def __init__(self):
+        # MethodDecl of the frame being allocated (None for the globals),
+        # next free slot in that frame and the size of the frame so far
+        self.frame = None
+        self.next_slot = 0
+        self.frame_size = 0
+
+    def resolve(self, node, st=None):
+        method = 'resolve_' + node.__class__.__name__
+        return getattr(self, method, self.generic_resolve)(node, st)
+
+    def generic_resolve(self, node, st=None):
+        for (child_name, child) in node.children():
+            self.resolve(child, st)
+
+    ################################
+    ## Helper functions
+    ################################
+
+    def declare(self, node, st):
+        """
+        Allocate the next slot of the current frame for the variable
+        declared by 'node' (a DeclStmt or a Formal)
+        """
+        binding = Binding(node.name, node.type, len(st.scope_stack) - 1,
+                          self.next_slot, self.frame)
+        self.next_slot += 1
+        if self.next_slot > self.frame_size:
+            self.frame_size = self.next_slot
+
+        st.declare_variable(node.name, binding, node.coord)
+        node.binding = binding
+
+    def push_scope(self, st):
+        st.push_scope()
+        return self.next_slot
+
+    def pop_scope(self, st, saved_slot):
+        """
+        Close the innermost scope, making its slots available again
+        """
+        st.pop_scope()
+        self.next_slot = saved_slot
+
+    def lookup(self, node, name, st):
+        if node.decl is not None:
+            return node.decl.binding
+        return st.lookup_variable(name, node.coord)
+
+    def resolve_AssignStmt(self, node, st):
+        node.binding = self.lookup(node, node.name, st)
+        self.resolve(node.expr, st)
+
+    def resolve_BinOp(self, node, st):
+        self.resolve(node.left, st)
+        self.resolve(node.right, st)
+
+    def resolve_Constant(self, node, st):
+        if node.type is ast.get_type('id'):
+            node.binding = self.lookup(node, node.value, st)
+
+    def resolve_DeclStmt(self, node, st):
+        # Mirrors TypeChecker, which declares the variable before checking
+        # its initializer
+        self.declare(node, st)
+        if node.expr is not None:
+            self.resolve(node.expr, st)
+
+    def resolve_Formal(self, node, st):
+        self.declare(node, st)
+
+    def resolve_FuncCall(self, node, st):
+        for arg in node.args or []:
+            self.resolve(arg, st)
+
+    def resolve_IfStmt(self, node, st):
+        self.resolve(node.cond, st)
+        for body in (node.true_body, node.false_body):
+            if body is not None:
+                saved_slot = self.push_scope(st)
+                self.resolve(body, st)
+                self.pop_scope(st, saved_slot)
+
+    def resolve_MethodDecl(self, node, st):
+        # Start a fresh frame for the method
+        saved_frame = (self.frame, self.next_slot, self.frame_size)
+        self.frame = node
+        self.next_slot = 0
+        self.frame_size = 0
+
+        st.push_scope()
+        for param in node.params or []:
+            self.resolve(param, st)
+        if node.body is not None:
+            self.resolve(node.body, st)
+        self.resolve(node.ret_stmt, st)
+        st.pop_scope()
+
+        node.frame_size = self.frame_size
+        self.frame, self.next_slot, self.frame_size = saved_frame
+
+    def resolve_Program(self, node, st=None):
+        st = SymbolTable()
+        self.frame = None
+        self.next_slot = 0
+        self.frame_size = 0
+
+        self.resolve(node.statements, st)
+
+        node.frame_size = self.frame_size
+        return st
+
+    def resolve_RetStmt(self, node, st):
+        self.resolve(node.expr, st)
+
+    def resolve_StmtList(self, node, st):
+        for stmt in node.stmt_lst or []:
+            self.resolve(stmt, st)
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+
+from tinyJavaIR import Op, Kind, Instr, STORAGE_KINDS, BRANCH_OPS, branch_taken
+from tinyJavaLiveness import Liveness
+from tinyJavaFold import fold_binop
+
+################################
+## SSA construction
+################################
+
+def copy_instrs(cfg):
+    """
+    Give every block of 'cfg' its own copy of its instructions, so that they
+    can be rewritten without changing the list the CFG was built from
+    """
+    for block in cfg.blocks:
+        block.instrs = [Instr(i.op, i.dst, i.a, i.b, i.opr, i.target) for i in block.instrs]
+
+def dominance_frontiers(function):
+    """
+    Return the dominance frontier of every reachable block of 'function',
+    as a dict from block id to a list of blocks
+    """
+    frontiers = dict((block.id, []) for block in function.rpo)
+    for block in function.rpo:
+        preds = [p for p in block.preds if p.rpo is not None]
+        if len(preds) < 2:
+            continue
+        for pred in preds:
+            runner = pred
+            while runner is not block.idom:
+                if block not in frontiers[runner.id]:
+                    frontiers[runner.id].append(block)
+                runner = runner.idom
+    return frontiers
+
+def ssa_candidates(cfg):
+    """
+    Return, for every Function of 'cfg', the identities of the operands it
+    may rename: its temporaries, and the variables no other Function
+    assigns to. A call can then never change the value of a renamed
+    variable, and keeping the variables the other Functions only read in
+    their original frame slot after SSA destruction stays correct.
+    """
+    owners = dict()
+    for function in cfg.functions:
+        for block in function.blocks:
+            for instr in block.instrs:
+                for operand in instr.defs():
+                    owners.setdefault(operand.base(), set()).add(function)
+
+    candidates = dict()
+    for function in cfg.functions:
+        names = set()
+        for block in function.blocks:
+            for instr in block.instrs:
+                for operand in instr.uses() + instr.defs():
+                    base = operand.base()
+                    if operand.kind == Kind.TEMP or owners.get(base, set()) <= set([function]):
+                        names.add(base)
+        candidates[function] = names
+    return candidates
+
+def to_ssa(cfg, liveness=None):
+    """
+    Rewrite the instructions of 'cfg' into pruned SSA form, with the phi
+    placement of Cytron et al. and dominance frontiers computed as Cooper,
+    Harvey and Kennedy do. Uses which no definition reaches get version 0,
+    the value on entry.
+
+    Versions are numbered across the whole CFG, so that the temporaries of
+    different Functions never share an SSA name. The Liveness of 'cfg' is
+    computed unless given.
+    """
+    liveness = liveness or Liveness(cfg)
+    copy_instrs(cfg)
+    candidates = ssa_candidates(cfg)
+    counters = dict()
+    for function in cfg.functions:
+        names = candidates[function]
+        place_phis(function, names, liveness)
+        rename(function, names, counters)
+
+def place_phis(function, names, liveness):
+    frontiers = dominance_frontiers(function)
+
+    # Blocks defining each renamed operand
+    def_blocks = dict()
+    operands = dict()
+    for block in function.rpo:
+        for instr in block.instrs:
+            for operand in instr.defs():
+                base = operand.base()
+                if base in names:
+                    def_blocks.setdefault(base, []).append(block)
+                    operands[base] = operand
+
+    for base, blocks in def_blocks.items():
+        bit = liveness.bit(operands[base])
+        has_phi = set()
+        work = list(blocks)
+        while work:
+            block = work.pop()
+            for frontier in frontiers[block.id]:
+                if frontier.id in has_phi or not liveness.live_in[frontier.id] & bit:
+                    continue
+                has_phi.add(frontier.id)
+                args = tuple(operands[base] for pred in frontier.preds)
+                phi = Instr(Op.PHI, operands[base], args)
+                # Phis go right after the label of the block
+                at = 1 if frontier.instrs and frontier.instrs[0].op == Op.LABEL else 0
+                frontier.instrs.insert(at, phi)
+                work.append(frontier)
+
+def rename(function, names, counters):
+    stacks = dict()
+
+    def current(operand):
+        if operand is None or isinstance(operand, tuple) or operand.kind not in STORAGE_KINDS:
+            return operand
+        base = operand.base()
+        if base not in names:
+            return operand
+        stack = stacks.get(base)
+        return operand.with_version(stack[-1] if stack else 0)
+
+    def define(operand, pushed):
+        base = operand.base()
+        if base not in names:
+            return operand
+        version = counters.get(base, 0) + 1
+        counters[base] = version
+        stacks.setdefault(base, []).append(version)
+        pushed.append(base)
+        return operand.with_version(version)
+
+    # Walk the dominator tree in pre-order, undoing the definitions of a
+    # block once its subtree is done
+    work = [(function.entry, None)]
+    while work:
+        block, pushed = work.pop()
+        if pushed is not None:
+            for base in pushed:
+                stacks[base].pop()
+            continue
+
+        pushed = []
+        for instr in block.instrs:
+            if instr.op != Op.PHI:
+                if instr.op == Op.BEGINFUNC:
+                    instr.a = tuple(define(p, pushed) for p in instr.a or ())
+                    continue
+                instr.a = current(instr.a)
+                instr.b = current(instr.b)
+            if instr.dst is not None:
+                instr.dst = define(instr.dst, pushed)
+
+        for succ in block.succs:
+            index = succ.preds.index(block)
+            for instr in succ.instrs:
+                if instr.op == Op.PHI:
+                    args = list(instr.a)
+                    args[index] = current(args[index])
+                    instr.a = tuple(args)
+
+        work.append((block, pushed))
+        for child in reversed(block.dom_children):
+            work.append((child, None))
+
+def from_ssa(cfg):
+    """
+    Leave SSA form: drop the phis and the versions. No copy is inserted for
+    the phis, so this is only correct as long as every definition of an
+    operand merged by a phi is still there, and as long as the live ranges
+    of the versions of an operand do not overlap. to_ssa only gives new
+    versions to the existing definitions, and SCCP only replaces uses by
+    constants, keeping the definitions of the operands phis merge, so both
+    hold; a pass propagating copies or moving definitions would have to
+    turn the phis into copies in the predecessors instead.
+    """
+    def strip(operand):
+        if operand is None or isinstance(operand, tuple) or operand.version is None:
+            return operand
+        return operand.with_version(None)
+
+    for block in cfg.blocks:
+        instrs = []
+        for instr in block.instrs:
+            if instr.op == Op.PHI:
+                continue
+            instr.dst = strip(instr.dst)
+            instr.b = strip(instr.b)
+            if instr.op == Op.BEGINFUNC:
+                instr.a = tuple(strip(p) for p in instr.a or ())
+            else:
+                instr.a = strip(instr.a)
+            instrs.append(instr)
+        block.instrs = instrs
+
+################################
+## Sparse conditional constant propagation
+################################
+
+# Lattice value of the operands which are not constant
+BOTTOM = object()
+
+def count_instrs(block):
+    """
+    Number of instructions of 'block' which remain after SSA destruction
+    """
+    return sum(1 for instr in block.instrs if instr.op != Op.PHI)
+
+class SCCP(object):
+    """
+    Sparse conditional constant propagation (Wegman and Zadeck) over a CFG
+    in SSA form. Operands never assigned yet are missing from 'values';
+    the others map to a constant operand or to BOTTOM.
+
+    Rewriting the CFG then replaces the uses of constants, turns the
+    conditional jumps on a constant into a goto or drops them, and empties
+    the blocks which can never run, such as the body of an if statement
+    whose condition is always false. The definitions of constant
+    temporaries are removed too, unless a phi merges the temporary:
+    from_ssa drops the phis, so the value has to be in the temporary when
+    control reaches the phi.
+
+        sccp = SCCP(cfg)
+        sccp.rewrite()
+        sccp.removed   # number of instructions removed
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.values = dict()
+        self.executable = set()
+        self.edges = set()
+        self.removed = 0
+        for function in cfg.functions:
+            self.analyze(function)
+
+    def value(self, operand):
+        if operand.kind == Kind.CONST:
+            return operand
+        if operand.version is None or operand.version == 0:
+            return BOTTOM
+        return self.values.get(operand.ident)
+
+    def meet(self, old, new):
+        if old is None:
+            return new
+        if new is None or old is BOTTOM or old == new:
+            return old
+        return BOTTOM
+
+    def analyze(self, function):
+        # Instructions using each SSA operand
+        users = dict()
+        for block in function.blocks:
+            for instr in block.instrs:
+                for operand in instr.uses():
+                    if operand.version:
+                        users.setdefault(operand.ident, []).append((block, instr))
+
+        flow = [(None, function.entry)]
+        ssa = []
+        while flow or ssa:
+            if flow:
+                pred, block = flow.pop()
+                if (pred, block) in self.edges:
+                    continue
+                self.edges.add((pred, block))
+                first_visit = block not in self.executable
+                self.executable.add(block)
+                for instr in block.instrs:
+                    if instr.op == Op.PHI or first_visit:
+                        self.visit(block, instr, flow, ssa, users)
+                # Conditional jumps add their own edges when visited
+                last = block.instrs[-1] if block.instrs else None
+                if first_visit and (last is None or last.op not in BRANCH_OPS):
+                    for succ in block.succs:
+                        flow.append((block, succ))
+            else:
+                block, instr = ssa.pop()
+                if block in self.executable:
+                    self.visit(block, instr, flow, ssa, users)
+
+    def visit(self, block, instr, flow, ssa, users):
+        op = instr.op
+        if op == Op.PHI:
+            new = None
+            for pred, arg in zip(block.preds, instr.a):
+                if (pred, block) in self.edges:
+                    new = self.meet(new, self.value(arg))
+        elif op == Op.COPY:
+            new = self.value(instr.a)
+        elif op == Op.BINOP:
+            left = self.value(instr.a)
+            right = self.value(instr.b)
+            if left is BOTTOM or right is BOTTOM:
+                new = BOTTOM
+            elif left is None or right is None:
+                new = None
+            else:
+                new = fold_binop(instr.opr, left, right) or BOTTOM
+        elif op in (Op.GETRET, Op.BEGINFUNC):
+            new = BOTTOM
+        elif op in BRANCH_OPS:
+            for succ in self.successors(block, instr):
+                flow.append((block, succ))
+            return
+        else:
+            return
+
+        for dst in instr.defs():
+            if dst.version is None:
+                continue
+            old = self.values.get(dst.ident)
+            merged = self.meet(old, new)
+            if merged is not old:
+                self.values[dst.ident] = merged
+                for user in users.get(dst.ident, []):
+                    ssa.append(user)
+
+    def target_block(self, block, target):
+        for succ in block.succs:
+            if succ.instrs and succ.instrs[0].op == Op.LABEL and succ.instrs[0].target == target:
+                return succ
+        return None
+
+    def successors(self, block, instr):
+        """
+        Return the successors of 'block', ending with the conditional jump
+        'instr', that control can reach given the current lattice values
+        """
+        conds = self.conditions(instr)
+        taken = self.target_block(block, instr.target)
+        if None in conds:
+            return []
+        if BOTTOM in conds:
+            return block.succs
+        if branch_taken(instr, *conds):
+            return [taken]
+        return [s for s in block.succs if s is not taken]
+
+    def conditions(self, instr):
+        """
+        Return the lattice values of the operands the conditional jump
+        'instr' tests
+        """
+        if instr.b is None:
+            return (self.value(instr.a), )
+        return (self.value(instr.a), self.value(instr.b))
+
+    ################################
+    ## Rewriting
+    ################################
+
+    def rewrite(self):
+        # Operands merged by a phi: from_ssa drops the phis, so the value
+        # reaching the phi has to stay in the operand
+        self.merged = set(instr.dst.base() for block in self.cfg.blocks
+                          for instr in block.instrs if instr.op == Op.PHI)
+        for block in self.cfg.blocks:
+            before = count_instrs(block)
+            if block not in self.executable:
+                # Keep the end of the method, so that the CFG stays well
+                # formed
+                block.instrs = [i for i in block.instrs if i.op == Op.ENDFUNC]
+            else:
+                block.instrs = self.rewrite_block(block)
+            self.removed += before - count_instrs(block)
+
+        # Phis only keep the arguments of the predecessors still reachable
+        for block in self.cfg.blocks:
+            live_preds = [p for p in block.preds if (p, block) in self.edges]
+            if len(live_preds) == len(block.preds):
+                continue
+            for instr in block.instrs:
+                if instr.op == Op.PHI:
+                    instr.a = tuple(a for p, a in zip(block.preds, instr.a) if (p, block) in self.edges)
+            for pred in block.preds:
+                if pred not in live_preds:
+                    pred.succs.remove(block)
+            block.preds = live_preds
+
+    def rewrite_block(self, block):
+        instrs = []
+        for instr in block.instrs:
+            op = instr.op
+            if op == Op.BEGINFUNC:
+                instrs.append(instr)
+                continue
+
+            if op in BRANCH_OPS:
+                conds = self.conditions(instr)
+                if BOTTOM not in conds and None not in conds:
+                    if not branch_taken(instr, *conds):
+                        continue
+                    instr = Instr(Op.GOTO, target=instr.target)
+                    instrs.append(instr)
+                    continue
+
+            if op == Op.PHI:
+                instr.a = tuple(self.replace(a) for a in instr.a)
+            else:
+                instr.a = self.replace(instr.a)
+                instr.b = self.replace(instr.b)
+
+            dst = instr.dst
+            if dst is not None and op in (Op.COPY, Op.BINOP, Op.PHI):
+                value = self.value(dst)
+                if value is not None and value is not BOTTOM:
+                    if dst.kind == Kind.TEMP and dst.base() not in self.merged:
+                        # Every use now reads the constant directly
+                        continue
+                    if op == Op.BINOP:
+                        instr = Instr(Op.COPY, dst, value)
+            instrs.append(instr)
+        return instrs
+
+    def replace(self, operand):
+        if operand is None or operand.kind not in STORAGE_KINDS:
+            return operand
+        value = self.value(operand)
+        if value is None or value is BOTTOM:
+            return operand
+        return value
@@ -5,18 +5,30 @@ class ParseError(Exception): pass
 class SymbolTable(object):
     """
     Base symbol table class
+
+    Besides the stack of scopes, every name currently in scope maps to the
+    stack of its bindings (innermost last), so a lookup is a single dict
+    probe regardless of how deeply scopes are nested. Each scope dict on
+    the scope stack doubles as the undo log of the names it declared, so
+    popping a scope only touches those names.
     """
 
     def __init__(self):
         self.methods = dict()
         self.scope_stack = [dict()]
+        self.bindings = dict()
 
     def push_scope(self):
         self.scope_stack.append(dict())
 
     def pop_scope(self):
         assert len(self.scope_stack) > 1
-        self.scope_stack.pop()
+        bindings = self.bindings
+        for name in self.scope_stack.pop():
+            stack = bindings[name]
+            stack.pop()
+            if not stack:
+                del bindings[name]
 
     def declare_method(self, method_name, method_node, line_number):
         """
@@ -35,22 +47,37 @@ class SymbolTable(object):
             raise ParseError("Referencing undefined method \"" + method_name + "\"")
         return self.methods[method_name]
 
-    def declare_variable(self, name, type, line_number):
+    def declare_variable(self, name, type, line_number, decl=None):
         """
-        Add a new variable.
+        Add a new variable, optionally along with the node declaring it.
         Need to do duplicate variable declaration error checking.
         """
-        if name in self.scope_stack[-1]:
+        scope = self.scope_stack[-1]
+        if name in scope:
             raise ParseError("Redeclaring variable named \"" + name + "\"", line_number)
-        self.scope_stack[-1][name] = type
+        scope[name] = type
+        stack = self.bindings.get(name)
+        if stack is None:
+            self.bindings[name] = [(type, decl)]
+        else:
+            stack.append((type, decl))
 
     def lookup_variable(self, name, line_number):
         """
         Return the type of the variable named 'name', or throw
         a ParseError if the variable is not declared in the scope.
         """
-        # You should traverse through the entire scope stack
-        for scope in reversed(self.scope_stack):
-            if name in scope:
-                return scope[name]
-        raise ParseError("Referencing undefined variable \"" + name + "\"", line_number)
+        stack = self.bindings.get(name)
+        if stack is None:
+            raise ParseError("Referencing undefined variable \"" + name + "\"", line_number)
+        return stack[-1][0]
+
+    def lookup_binding(self, name, line_number):
+        """
+        Return the (type, declaring node) pair of the variable named 'name',
+        or throw a ParseError if the variable is not declared in the scope.
+        """
+        stack = self.bindings.get(name)
+        if stack is None:
+            raise ParseError("Referencing undefined variable \"" + name + "\"", line_number)
+        return stack[-1]
@@ -1,9 +1,77 @@
 #!/usr/bin/env python3
 
+from concurrent.futures import ProcessPoolExecutor
 from tinyJavaSymbolTable import SymbolTable, ParseError
 import tinyJavaAST as ast
 
+# Canonical types used by the checker. Types are interned by ast.get_type,
+# so these can be compared by identity
+INT = ast.get_type('int')
+BOOLEAN = ast.get_type('boolean')
+ID = ast.get_type('id')
+
+# Type of erroneous expressions when collecting errors. It is equal to any
+# other type, so that one error does not cause more errors further up.
+ERROR = ast.get_type('<error>')
+
+class Diagnostic(object):
+    """
+    A type error recorded by TypeChecker when collecting errors.
+
+        kind: short name of the check that failed, e.g. 'assign-mismatch'
+        message: human readable description
+        line: line number of the offending node, if known
+        names: names of the variables/methods involved
+        expected, actual: the types involved in a mismatch, if any
+    """
+
+    __slots__ = ('kind', 'message', 'line', 'names', 'expected', 'actual')
+
+    def __init__(self, kind, message, line, names=(), expected=None, actual=None):
+        self.kind = kind
+        self.message = message
+        self.line = line
+        self.names = tuple(names)
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        text = "line %s: %s" % (self.line, self.message)
+        if self.expected is not None and self.actual is not None:
+            text += " (expected %s, got %s)" % (self.expected.name, self.actual.name)
+        return text
+
+class TooManyErrors(ParseError):
+    """
+    Raised internally once TypeChecker has collected max_errors errors
+    """
+    pass
+
 class TypeChecker(object):
+    """
+    With 'jobs' greater than 1, the program is checked in two phases:
+    the top-level statements are checked in order while only collecting
+    the signatures of the top-level methods, then the method bodies are
+    checked in a pool of 'jobs' processes (see check_parallel).
+
+    By default, the first type error raises a ParseError. If 'max_errors'
+    is set, errors are recorded in 'diagnostics' instead and checking
+    carries on, until 'max_errors' errors have been found ('truncated' is
+    then set). Erroneous expressions get the type ERROR, which matches any
+    type, and an undefined name is only reported once per method, so that
+    one mistake is reported once rather than at every use.
+
+    Types and declarations are stored on the tree as it is checked, so later
+    passes need not look them up again (see ast.Node.ty and ast.Node.decl).
+    Program.annotated is set once the whole tree is checked without errors.
+    """
+
+    def __init__(self, jobs=1, max_errors=None):
+        self.jobs = jobs
+        self.max_errors = max_errors
+        self.diagnostics = []
+        self.truncated = False
+        self.undefined = set()
 
     def typecheck(self, node, st=None):
         method = 'check_' + node.__class__.__name__
@@ -19,20 +87,83 @@ class TypeChecker(object):
     def eq_type(self, t1, t2):
         """
         Helper function to check if two given type node is that of the
-        same type. Precondition is that both t1 and t2 are that of class Type
+        same type. Precondition is that both t1 and t2 are canonical types
+        obtained from ast.get_type, so comparing identities is sufficient.
+        ERROR is equal to every type.
         """
         if not isinstance(t1, ast.Type) or not isinstance(t2, ast.Type):
             raise ParseError("eq_type invoked on non-type objects")
-        return t1.name == t2.name
+        return t1 is t2 or t1 is ERROR or t2 is ERROR
+
+    ################################
+    ## Error reporting
+    ################################
+
+    def error(self, kind, message, line, names=(), expected=None, actual=None):
+        """
+        Report a type error: raise a ParseError, or record a Diagnostic when
+        collecting errors. Returns ERROR, as the type of the erroneous
+        expression.
+        """
+        if self.max_errors is None:
+            raise ParseError(message, line)
+        self.diagnostics.append(Diagnostic(kind, message, line, names, expected, actual))
+        if len(self.diagnostics) >= self.max_errors:
+            raise TooManyErrors("Too many errors", line)
+        return ERROR
+
+    def lookup_variable(self, st, node, name):
+        """
+        Return the type of the variable 'name' referred to by 'node', and
+        record its declaration on 'node'
+        """
+        try:
+            type, node.decl = st.lookup_binding(name, node.coord)
+            return type
+        except ParseError as e:
+            if self.max_errors is None:
+                raise
+            if name not in self.undefined:
+                self.undefined.add(name)
+                self.error('undefined-variable', e.args[0], node.coord, (name, ))
+            return ERROR
+
+    def declare_variable(self, st, name, type, line, decl=None):
+        try:
+            st.declare_variable(name, type, line, decl)
+        except ParseError as e:
+            if self.max_errors is None:
+                raise
+            self.error('redeclared-variable', e.args[0], line, (name, ))
+
+    def lookup_method(self, st, name, line):
+        try:
+            return st.lookup_method(name, line)
+        except ParseError as e:
+            if self.max_errors is None:
+                raise
+            if name not in self.undefined:
+                self.undefined.add(name)
+                self.error('undefined-method', e.args[0], line, (name, ))
+            return None
+
+    def declare_method(self, st, name, method, line):
+        try:
+            st.declare_method(name, method, line)
+        except ParseError as e:
+            if self.max_errors is None:
+                raise
+            self.error('redeclared-method', e.args[0], line, (name, ))
 
     def check_AssignStmt(self, node, st):
 
-        var_type = st.lookup_variable(node.name, node.coord)
+        var_type = self.lookup_variable(st, node, node.name)
+        node.ty = var_type
         expr_type = self.typecheck(node.expr, st)
         if not self.eq_type(var_type, expr_type):
-            raise ParseError("Variable \"" + node.name + "\" has the type",
-                             var_type.name, "but is being assigned the type",
-                             expr_type.name)
+            self.error('assign-mismatch', "Variable \"" + node.name + "\" has the type " +
+                       var_type.name + " but is being assigned the type " +
+                       expr_type.name, node.coord, (node.name, ), var_type, expr_type)
 
         return expr_type
 
@@ -49,55 +180,66 @@ class TypeChecker(object):
         left_type = self.typecheck(node.left, st)
         right_type = self.typecheck(node.right, st)
         if not self.eq_type(left_type, right_type):
-            raise ParseError("Left and right expressions are of different type", node.coord)
+            self.error('operand-mismatch', "Left and right expressions are of different type",
+                       node.coord, (node.op, ), left_type, right_type)
 
         if node.op in ['+', '-', '*', '/']:
-            return ast.Type("int")
+            node.ty = INT
+        else:
+            node.ty = BOOLEAN
 
-        return ast.Type("boolean")
+        return node.ty
 
     def check_Constant(self, node, st):
         """
         Returns the type of the constant. If the constant refers to
         some kind of id, then we need to find if the id has been declared.
         """
-        if self.eq_type(node.type, ast.Type('id')):
-            return st.lookup_variable(node.value, node.coord)
-        return node.type
-
-    def check_DeclStmt(self, node, st):
-        st.declare_variable(node.name, node.type, node.coord)
-        if node.expr is not None:
-            expr_type = self.typecheck(node.expr, st)
-            if not self.eq_type(expr_type, node.type):
-                raise ParseError("Mismatch of declaration type", node.coord)
-
-        return node.type
+        if node.type is ID:
+            node.ty = self.lookup_variable(st, node, node.value)
+        else:
+            node.ty = node.type
+        return node.ty
 
     def check_DeclStmt(self, node, st):
-        st.declare_variable(node.name, node.type, node.coord)
+        node.ty = node.type
+        self.declare_variable(st, node.name, node.type, node.coord, node)
         if node.expr is not None:
             expr_type = self.typecheck(node.expr, st)
             if not self.eq_type(expr_type, node.type):
-                raise ParseError("Mismatch of declaration type", node.coord)
+                self.error('decl-mismatch', "Mismatch of declaration type", node.coord,
+                           (node.name, ), node.type, expr_type)
 
         return node.type
 
     def check_Formal(self, node, st):
-        st.declare_variable(node.name, node.type, node.coord)
+        node.ty = node.type
+        self.declare_variable(st, node.name, node.type, node.coord, node)
         return node.type
 
     def check_FuncCall(self, node, st):
-        method = st.lookup_method(node.name ,node.coord)
-
-        if len(method.params or []) != len(node.args or []):
-            raise ParseError("Argument length mismatch with method", node.coord)
-
-        for i, arg in enumerate(node.args or []):
-            arg_type = self.typecheck(arg)
-            if not self.eq_type(arg_type, method.params[i].type):
-                raise ParseError("Argument type mismatch with method parameter", node.coord)
-
+        method = self.lookup_method(st, node.name, node.coord)
+        args = node.args or []
+
+        if method is None:
+            # Still check the arguments for errors of their own
+            for arg in args:
+                self.typecheck(arg, st)
+            node.ty = ERROR
+            return ERROR
+
+        params = method.params or []
+        if len(params) != len(args):
+            self.error('arg-count', "Argument length mismatch with method", node.coord, (node.name, ))
+
+        for i, arg in enumerate(args):
+            arg_type = self.typecheck(arg, st)
+            if i < len(params) and not self.eq_type(arg_type, params[i].type):
+                self.error('arg-type', "Argument type mismatch with method parameter",
+                           node.coord, (node.name, params[i].name), params[i].type, arg_type)
+
+        node.decl = method
+        node.ty = method.ret_type
         return method.ret_type
 
     def check_IfStmt(self, node, st):
@@ -111,8 +253,9 @@ class TypeChecker(object):
         """
 
         cond_type = self.typecheck(node.cond, st)
-        if not self.eq_type(ast.Type('boolean'), cond_type):
-            raise ParseError("If statement requires boolean as its condition", node.coord)
+        if not self.eq_type(BOOLEAN, cond_type):
+            self.error('condition-type', "If statement requires boolean as its condition",
+                       node.coord, (), BOOLEAN, cond_type)
 
         if node.true_body is not None:
             st.push_scope()
@@ -127,12 +270,20 @@ class TypeChecker(object):
 
     def check_MethodDecl(self, node, st):
 
+        # Undefined names are reported once per method
+        saved_undefined = self.undefined
+        self.undefined = set()
+
+        # Declare the method before its body, so that it may call itself
+        self.declare_method(st, node.name, node, node.coord)
+
+        # Parameters are local to the method, so they go in the method scope
+        st.push_scope()
+
         # Go through the parameters
         for param in node.params:
             self.typecheck(param, st)
 
-        st.push_scope()
-
         # Go through the method body and type check each statements
         if node.body is not None:
             self.typecheck(node.body, st)
@@ -141,12 +292,11 @@ class TypeChecker(object):
         # of the method
         ret_stmt_type = self.typecheck(node.ret_stmt, st)
         if not self.eq_type(ret_stmt_type, node.ret_type):
-            raise ParseError("Mismatch of return type within method \"" +
-                             node.name + "\"", node.coord)
+            self.error('return-mismatch', "Mismatch of return type within method \"" +
+                       node.name + "\"", node.coord, (node.name, ), node.ret_type, ret_stmt_type)
 
         st.pop_scope()
-
-        st.declare_method(node.name, node, node.coord)
+        self.undefined = saved_undefined
 
         return ret_stmt_type
 
@@ -157,7 +307,7 @@ class TypeChecker(object):
         # Alternatively, you could have a separate check method for
         # "Formal" class, instead of declaring them as a variable here.
         for param in node.params:
-            st.declare_variable(param.name, param.type, param.coord)
+            self.declare_variable(st, param.name, param.type, param.coord, param)
         return None
 
     def check_Program(self, node, st=None):
@@ -167,10 +317,88 @@ class TypeChecker(object):
         """
         # Generate global symbol table
         global_st = SymbolTable()
+        self.diagnostics = []
+        self.truncated = False
+        self.undefined = set()
+
+        try:
+            if self.jobs > 1:
+                self.check_parallel(node.statements, global_st)
+            else:
+                self.typecheck(node.statements, global_st)
+        except TooManyErrors:
+            self.truncated = True
+
+        node.annotated = not self.diagnostics
+        return global_st
+
+    def check_parallel(self, node, st):
+        """
+        Typecheck the top-level StmtList 'node' in two phases.
 
-        self.typecheck(node.statements, global_st)
+        Phase one checks the top-level statements in order, but only
+        declares the methods (and the methods nested in them), recording
+        the variables and methods visible to each. Phase two checks the
+        method bodies in a process pool, each against what was visible to
+        it.
 
-        return global_st
+        Errors are merged in source order, a method body coming before the
+        declaration of the method itself, so the error raised (or the
+        diagnostics collected) are the same as when checking sequentially.
+        """
+        # Errors found, keyed by (statement index, phase, order found)
+        errors = []
+        jobs = []
+        # Declarations visible to each job, to resolve its annotations
+        visible = []
+        for i, stmt in enumerate(node.stmt_lst or []):
+            start = len(self.diagnostics)
+            try:
+                if isinstance(stmt, ast.MethodDecl):
+                    bindings = dict((name, stack[-1]) for name, stack in st.bindings.items())
+                    variables = dict((name, b[0]) for name, b in bindings.items())
+                    methods = dict(st.methods)
+                    stubs = dict((name, signature(m)) for name, m in methods.items())
+                    jobs.append((i, stmt, variables, stubs, self.max_errors))
+                    visible.append((bindings, methods))
+                    # The job declares the method and its nested methods
+                    # again, and reports any conflict in the same order as
+                    # when checking sequentially
+                    for method in [stmt] + nested_methods(stmt):
+                        if method.name not in st.methods:
+                            st.declare_method(method.name, method, method.coord)
+                else:
+                    self.typecheck(stmt, st)
+            except ParseError as e:
+                # Either the first error, or the error budget ran out.
+                # Whatever follows is not checked sequentially either.
+                if not isinstance(e, TooManyErrors):
+                    errors.append(((i, 1, 0), e))
+                break
+            finally:
+                for j, d in enumerate(self.diagnostics[start:]):
+                    errors.append(((i, 1, j), d))
+
+        if jobs:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                results = pool.map(check_method_job, jobs)
+                for job, (bindings, methods), result in zip(jobs, visible, results):
+                    diagnostics, error, annotations = result
+                    for j, d in enumerate(diagnostics):
+                        errors.append(((job[0], 0, j), d))
+                    if error is not None:
+                        errors.append(((job[0], 0, len(diagnostics)), error))
+                    apply_annotations(job[1], annotations, bindings, methods)
+
+        errors.sort(key=lambda e: e[0])
+        if self.max_errors is None:
+            if errors:
+                raise errors[0][1]
+            return
+
+        self.diagnostics = [d for key, d in errors[:self.max_errors]]
+        if len(self.diagnostics) >= self.max_errors:
+            raise TooManyErrors("Too many errors", None)
 
     def check_RetStmt(self, node, st):
         return self.typecheck(node.expr, st)
@@ -179,7 +407,7 @@ class TypeChecker(object):
         """
         Iterate through all the statements and perform typecheck on them.
         """
-        for stmt in node.stmt_lst:
+        for stmt in node.stmt_lst or []:
             self.typecheck(stmt, st)
 
         # List itself does not have any type
@@ -187,3 +415,99 @@ class TypeChecker(object):
 
     def check_Type(self, node, st):
         return node
+
+def nested_methods(method):
+    """
+    Return the MethodDecls nested in MethodDecl 'method', in the order
+    TypeChecker declares them (a method is declared before its body)
+    """
+    nested = []
+    stack = [method]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.MethodDecl) and node is not method:
+            nested.append(node)
+        for (child_name, child) in reversed(node.children()):
+            stack.append(child)
+    return nested
+
+def signature(method):
+    """
+    Return a copy of MethodDecl 'method' without its body, which is all
+    check_FuncCall needs and is cheaper to send to another process
+    """
+    return ast.MethodDecl(method.name, method.ret_type, method.params, None, None, method.coord)
+
+def check_method_job(job):
+    """
+    Phase two of TypeChecker.check_parallel, run in a worker process:
+    typecheck one method body. Returns the diagnostics collected, the
+    ParseError raised, if any, and the annotations left on the method.
+    """
+    index, method, variables, methods, max_errors = job
+    st = SymbolTable()
+    for name, type in variables.items():
+        st.declare_variable(name, type, None)
+    st.methods = methods
+    checker = TypeChecker(max_errors=max_errors)
+    error = None
+    try:
+        checker.typecheck(method, st)
+    except TooManyErrors:
+        pass
+    except ParseError as e:
+        error = e
+    return checker.diagnostics, error, collect_annotations(method)
+
+def preorder(root):
+    """
+    Return the nodes of the tree rooted at 'root' in pre-order
+    """
+    nodes = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        for (child_name, child) in reversed(node.children()):
+            stack.append(child)
+    return nodes
+
+def collect_annotations(method):
+    """
+    Return the annotations left on the tree of 'method' by a worker, as a
+    list of (type, declaration reference) in pre-order. Declarations are
+    referred to by their pre-order index when inside 'method', and by name
+    otherwise.
+    """
+    nodes = preorder(method)
+    index = dict((id(node), i) for i, node in enumerate(nodes))
+    annotations = []
+    for node in nodes:
+        decl = node.decl
+        if decl is not None:
+            i = index.get(id(decl))
+            decl = ('local', i) if i is not None else ('outer', decl.name)
+        elif node.ty is not None and (isinstance(node, ast.AssignStmt) or
+                                      (isinstance(node, ast.Constant) and node.type is ID)):
+            # Variables declared outside of the method
+            decl = ('outer', node.name if isinstance(node, ast.AssignStmt) else node.value)
+        annotations.append((node.ty, decl))
+    return annotations
+
+def apply_annotations(method, annotations, bindings, methods):
+    """
+    Copy the annotations from collect_annotations onto the tree of 'method',
+    given the variable 'bindings' and 'methods' visible to it
+    """
+    nodes = preorder(method)
+    for node, (ty, decl) in zip(nodes, annotations):
+        node.ty = ty
+        if decl is None:
+            continue
+        kind, ref = decl
+        if kind == 'local':
+            node.decl = nodes[ref]
+        elif isinstance(node, ast.FuncCall):
+            node.decl = methods[ref]
+        elif ref in bindings:
+            node.decl = bindings[ref][1]
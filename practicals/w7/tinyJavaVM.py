@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+
+import time
+from tinyJavaIR import Op, Kind
+
+# VM opcodes. Operands are slot numbers in the frame of the running method
+# unless stated otherwise.
+MOV = 0         # MOV d a           frame[d] = frame[a]
+ADD = 1         # ADD d a b
+SUB = 2
+MUL = 3
+DIV = 4
+EQ = 5
+NE = 6
+JMP = 7         # JMP pc
+JF = 8          # JF a pc           jump if frame[a] is false
+JT = 9          # JT a pc           jump if frame[a] is true
+PUSH = 10       # PUSH a
+CALL = 11       # CALL f            f: index in VM.functions
+POP = 12        # POP n             n: number of parameters
+RET = 13        # RET a             set the return value
+GETRET = 14     # GETRET d
+ENDFUNC = 15    # ENDFUNC           return to the caller
+LOADG = 16      # LOADG d g         frame[d] = globals[g]
+STOREG = 17     # STOREG g a        globals[g] = frame[a]
+LOADO = 18      # LOADO d f s       frame[d] = innermost frame of f[s]
+STOREO = 19     # STOREO f s a
+HALT = 20
+JEQ = 21        # JEQ a b pc        jump if frame[a] == frame[b]
+JNE = 22        # JNE a b pc        jump if frame[a] != frame[b]
+
+BINOPS = {'+': ADD, '-': SUB, '*': MUL, '/': DIV, '==': EQ, '!=': NE}
+
+class VMError(Exception):
+    """
+    Raised when the program fails at run time (division by zero, use of an
+    uninitialized variable or of a variable of a method which is not
+    running) or when the IR cannot be loaded
+    """
+    pass
+
+class VMFunction(object):
+    """
+    A unit of code loaded in the VM: the top-level code (index 0) or a
+    method.
+
+        name: method name, None for the top-level code
+        entry: index of its first instruction
+        template: initial frame, holding the constants in their slots
+        params: slots of the parameters, in order
+        calls: number of times it was called (when profiling)
+    """
+
+    __slots__ = ('name', 'entry', 'template', 'params', 'calls', 'slots')
+
+    def __init__(self, name):
+        self.name = name
+        self.entry = 0
+        self.template = None
+        self.params = ()
+        self.calls = 0
+        # Slot of each operand of the unit
+        self.slots = dict()
+
+def to_value(constant):
+    value = constant.value
+    if value == 'true':
+        return True
+    if value == 'false':
+        return False
+    return value
+
+class VM(object):
+    """
+    Executes a list of IR instructions, as produced by IRGen and the
+    optimization passes, after the Resolver ran.
+
+    Loading translates the IR into an array of tuples with integer opcodes
+    (see above), with every label resolved to an instruction index and
+    every operand to a frame slot. Each unit of code (the top-level code
+    and every method) gets a frame holding its variables (in the slots
+    the Resolver gave them), its temporaries, registers and spill slots,
+    and its constants. The frame of the top-level code holds the global
+    variables.
+
+    Methods read the global variables and the variables of the methods
+    enclosing them with explicit LOADG/LOADO instructions, and write them
+    with STOREG/STOREO. The variables of an enclosing method are those of
+    its innermost active frame.
+
+        vm = VM(instrs)
+        vm.run()
+        vm.globals_by_name()   # {name: value} of the global variables
+    """
+
+    def __init__(self, instrs):
+        self.functions = []
+        self.code = []
+        self.global_names = dict()
+        self.steps = 0
+        self.elapsed = 0.0
+        self.load(instrs)
+
+    ################################
+    ## Loading
+    ################################
+
+    def load(self, instrs):
+        main = VMFunction(None)
+        self.functions.append(main)
+        by_name = dict()
+        # Frame sizes, from the variable slots seen in each unit
+        frame_sizes = {None: 0}
+        for instr in instrs:
+            for operand in instr.uses() + instr.defs():
+                binding = operand.binding if operand.kind == Kind.VAR else None
+                if operand.kind == Kind.VAR and binding is None:
+                    raise VMError("Variable \"%s\" was not resolved" % operand.value)
+                if binding is not None:
+                    frame = binding.frame.name if binding.frame is not None else None
+                    frame_sizes[frame] = max(frame_sizes.get(frame, 0), binding.slot + 1)
+                    if frame is None and binding.depth == 0:
+                        self.global_names[binding.slot] = binding.name
+
+        # Pass one: units, and the slots of their temporaries and constants
+        unit_of = []
+        stack = [main]
+        for i, instr in enumerate(instrs):
+            if instr.op == Op.LABEL and i + 1 < len(instrs) and instrs[i + 1].op == Op.BEGINFUNC:
+                function = VMFunction(instr.target.value)
+                by_name[function.name] = len(self.functions)
+                self.functions.append(function)
+                stack.append(function)
+            unit_of.append(stack[-1])
+            if instr.op == Op.ENDFUNC:
+                stack.pop()
+        self.by_name = by_name
+
+        for function in self.functions:
+            function.template = [None] * frame_sizes.get(function.name, 0)
+            # Two scratch slots for the variables of other frames
+            function.slots['scratch'] = (len(function.template), len(function.template) + 1)
+            function.template += [None, None]
+
+        # Pass two: translate the instructions
+        labels = dict()
+        fixups = []
+        code = self.code
+        for i, instr in enumerate(instrs):
+            function = unit_of[i]
+            op = instr.op
+            if op == Op.LABEL:
+                labels[instr.target] = len(code)
+                if i + 1 < len(instrs) and instrs[i + 1].op == Op.BEGINFUNC:
+                    function.entry = len(code)
+                continue
+            if op == Op.BEGINFUNC:
+                function.params = tuple(self.local_slot(function, p) for p in instr.a or ())
+                continue
+
+            # Variables of other frames go through the scratch slots
+            loads = []
+            scratch = list(function.slots['scratch'])
+
+            def src(operand):
+                if operand.kind == Kind.VAR and not self.is_local(function, operand):
+                    slot = scratch.pop(0)
+                    loads.append(self.load_instr(slot, operand))
+                    return slot
+                return self.local_slot(function, operand)
+
+            store = None
+            if op in (Op.COPY, Op.BINOP, Op.GETRET):
+                dst = instr.dst
+                if dst.kind == Kind.VAR and not self.is_local(function, dst):
+                    d = function.slots['scratch'][0]
+                    store = self.store_instr(dst, d)
+                else:
+                    d = self.local_slot(function, dst)
+
+            if op == Op.COPY:
+                translated = (MOV, d, src(instr.a))
+            elif op == Op.BINOP:
+                translated = (BINOPS[instr.opr], d, src(instr.a), src(instr.b))
+            elif op == Op.GETRET:
+                translated = (GETRET, d)
+            elif op == Op.GOTO:
+                translated = [JMP, None]
+                fixups.append((translated, 1, instr.target))
+            elif op in (Op.IFNOT, Op.IF):
+                translated = [JF if op == Op.IFNOT else JT, src(instr.a), None]
+                fixups.append((translated, 2, instr.target))
+            elif op in (Op.IFEQ, Op.IFNE):
+                translated = [JEQ if op == Op.IFEQ else JNE, src(instr.a), src(instr.b), None]
+                fixups.append((translated, 3, instr.target))
+            elif op == Op.PUSHPARAM:
+                translated = (PUSH, src(instr.a))
+            elif op == Op.CALL:
+                translated = [CALL, None]
+                fixups.append((translated, 1, ('call', instr.target.value)))
+            elif op == Op.POPPARAMS:
+                translated = (POP, to_value(instr.a))
+            elif op == Op.RETURN:
+                translated = (RET, src(instr.a))
+            elif op == Op.ENDFUNC:
+                translated = (ENDFUNC, )
+            else:
+                raise VMError("Cannot execute instruction \"%s\"" % str(instr).strip())
+
+            code.extend(loads)
+            code.append(translated)
+            if store is not None:
+                code.append(store)
+
+        code.append((HALT, ))
+
+        for translated, index, target in fixups:
+            if isinstance(target, tuple):
+                if target[1] not in by_name:
+                    raise VMError("Call to unknown method \"%s\"" % target[1])
+                translated[index] = by_name[target[1]]
+            else:
+                translated[index] = labels[target]
+        self.code = [tuple(c) for c in code]
+
+    def is_local(self, function, operand):
+        frame = operand.binding.frame
+        return (frame.name if frame is not None else None) == function.name
+
+    def local_slot(self, function, operand):
+        """
+        Return the slot of 'operand' in the frame of 'function', allocating
+        one for temporaries and constants
+        """
+        if operand.kind == Kind.VAR:
+            return operand.binding.slot
+        key = (int(operand.kind), operand.value)
+        slot = function.slots.get(key)
+        if slot is None:
+            slot = len(function.template)
+            function.slots[key] = slot
+            function.template.append(to_value(operand) if operand.kind == Kind.CONST else None)
+        return slot
+
+    def load_instr(self, slot, operand):
+        frame = operand.binding.frame
+        if frame is None:
+            return (LOADG, slot, operand.binding.slot)
+        return (LOADO, slot, self.by_name[frame.name], operand.binding.slot)
+
+    def store_instr(self, operand, slot):
+        frame = operand.binding.frame
+        if frame is None:
+            return (STOREG, operand.binding.slot, slot)
+        return (STOREO, self.by_name[frame.name], operand.binding.slot, slot)
+
+    ################################
+    ## Execution
+    ################################
+
+    def run(self, profile=False):
+        """
+        Run the program from its first instruction until it ends. Returns
+        the frame of the top-level code, which holds the global variables.
+        """
+        code = self.code
+        functions = self.functions
+        glob = list(functions[0].template)
+        frame = glob
+        # Innermost frame of each unit, for LOADO/STOREO
+        display = [[] for f in functions]
+        display[0].append(glob)
+        params = []
+        calls = []
+        ret = None
+        pc = 0
+        steps = 0
+        start = time.perf_counter()
+
+        try:
+            while True:
+                ins = code[pc]
+                op = ins[0]
+                pc += 1
+                steps += 1
+                if op == MOV:
+                    frame[ins[1]] = frame[ins[2]]
+                elif op == ADD:
+                    frame[ins[1]] = ((frame[ins[2]] + frame[ins[3]] + 0x80000000) & 0xffffffff) - 0x80000000
+                elif op == JF:
+                    if not frame[ins[1]]:
+                        pc = ins[2]
+                elif op == EQ:
+                    frame[ins[1]] = frame[ins[2]] == frame[ins[3]]
+                elif op == SUB:
+                    frame[ins[1]] = ((frame[ins[2]] - frame[ins[3]] + 0x80000000) & 0xffffffff) - 0x80000000
+                elif op == MUL:
+                    frame[ins[1]] = ((frame[ins[2]] * frame[ins[3]] + 0x80000000) & 0xffffffff) - 0x80000000
+                elif op == JMP:
+                    pc = ins[1]
+                elif op == JNE:
+                    if frame[ins[1]] != frame[ins[2]]:
+                        pc = ins[3]
+                elif op == JEQ:
+                    if frame[ins[1]] == frame[ins[2]]:
+                        pc = ins[3]
+                elif op == PUSH:
+                    params.append(frame[ins[1]])
+                elif op == CALL:
+                    function = functions[ins[1]]
+                    new = function.template[:]
+                    n = len(function.params)
+                    if n:
+                        for slot, value in zip(function.params, params[-n:]):
+                            new[slot] = value
+                    calls.append((pc, frame, ins[1]))
+                    display[ins[1]].append(new)
+                    frame = new
+                    pc = function.entry
+                    if profile:
+                        function.calls += 1
+                elif op == POP:
+                    if ins[1]:
+                        del params[-ins[1]:]
+                elif op == RET:
+                    ret = frame[ins[1]]
+                elif op == GETRET:
+                    frame[ins[1]] = ret
+                elif op == ENDFUNC:
+                    pc, frame, index = calls.pop()
+                    display[index].pop()
+                elif op == LOADG:
+                    frame[ins[1]] = glob[ins[2]]
+                elif op == STOREG:
+                    glob[ins[1]] = frame[ins[2]]
+                elif op == NE:
+                    frame[ins[1]] = frame[ins[2]] != frame[ins[3]]
+                elif op == DIV:
+                    left = frame[ins[2]]
+                    right = frame[ins[3]]
+                    if right == 0:
+                        raise VMError("Division by zero")
+                    q = abs(left) // abs(right)
+                    if (left < 0) != (right < 0):
+                        q = -q
+                    frame[ins[1]] = ((q + 0x80000000) & 0xffffffff) - 0x80000000
+                elif op == JT:
+                    if frame[ins[1]]:
+                        pc = ins[2]
+                elif op == LOADO:
+                    frame[ins[1]] = display[ins[2]][-1][ins[3]]
+                elif op == STOREO:
+                    display[ins[1]][-1][ins[2]] = frame[ins[3]]
+                elif op == HALT:
+                    break
+                else:
+                    raise VMError("Unknown opcode %d at %d" % (op, pc - 1))
+        except (IndexError, TypeError):
+            # The type checker lets two kinds of programs through which fail
+            # here: a nested method using a variable of its enclosing method
+            # when that method is not running, and arithmetic on a variable
+            # read before it is initialized
+            if code[pc - 1][0] in (LOADO, STOREO):
+                raise VMError("Variable of a method used while that method is not running")
+            raise VMError("Use of an uninitialized variable")
+
+        self.steps += steps
+        self.elapsed += time.perf_counter() - start
+        self.globals = glob
+        return glob
+
+    def globals_by_name(self):
+        """
+        Return the final value of every global variable declared at the top
+        level, by name
+        """
+        return dict((name, self.globals[slot]) for slot, name in sorted(self.global_names.items()))
+
+def format_value(value):
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    return str(value)